@@ -4,9 +4,10 @@ import random
 import re
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
 from threading import Event
-from typing import Any, List, Dict, Tuple, Optional, Union, Set
+from typing import Any, List, Dict, Tuple, Optional, Union, Set, Callable
 from urllib.parse import urlparse, parse_qs, unquote
 
 import pytz
@@ -24,6 +25,10 @@ from app.log import logger
 from app.modules.qbittorrent import Qbittorrent
 from app.modules.transmission import Transmission
 from app.plugins import _PluginBase
+from app.plugins.brushflow.columnar import TorrentColumns, benchmark, columnar_available, evaluate_delete_mask, \
+    evaluate_proxy_pre_delete_mask
+from app.plugins.brushflow.matcher import TitleMatcher
+from app.plugins.brushflow.taskstore import BrushTaskStore
 from app.schemas import NotificationType, TorrentInfo, MediaType
 from app.schemas.types import EventType
 from app.utils.http import RequestUtils
@@ -68,6 +73,7 @@ class BrushConfig:
         self.save_path = config.get("save_path")
         self.clear_task = config.get("clear_task", False)
         self.archive_task = config.get("archive_task", False)
+        self.benchmark_delete = config.get("benchmark_delete", False)
         self.delete_except_tags = config.get("delete_except_tags")
         self.except_subscribe = config.get("except_subscribe", True)
         self.brush_sequential = config.get("brush_sequential", False)
@@ -248,6 +254,38 @@ class BrushConfig:
         return self.__str__()
 
 
+class DownloaderSnapshot:
+    """
+    下载器状态快照，在有效期内复用下载数量、传输速度等查询结果，减少刷流周期内对下载器的重复请求
+    """
+
+    def __init__(self, ttl: float = 30):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._values: Dict[str, Tuple[float, Any]] = {}
+
+    def get(self, key: str, loader: Callable[[], Any]) -> Any:
+        """
+        获取快照数据，快照不存在或已过期时通过loader重新获取，loader返回None时不缓存
+        """
+        with self._lock:
+            cached = self._values.get(key)
+            if cached and time.time() - cached[0] < self.ttl:
+                return cached[1]
+        value = loader()
+        if value is not None:
+            with self._lock:
+                self._values[key] = (time.time(), value)
+        return value
+
+    def invalidate(self):
+        """
+        使快照失效，下载器状态发生变化（如添加了新种子）后调用
+        """
+        with self._lock:
+            self._values.clear()
+
+
 class BrushFlow(_PluginBase):
     # region 全局定义
 
@@ -258,7 +296,7 @@ class BrushFlow(_PluginBase):
     # 插件图标
     plugin_icon = "brush.jpg"
     # 插件版本
-    plugin_version = "3.8"
+    plugin_version = "3.8.6"
     # 插件作者
     plugin_author = "jxxghp,InfinityPacer"
     # 作者主页
@@ -283,10 +321,22 @@ class BrushFlow(_PluginBase):
     _task_brush_enable = False
     # 订阅缓存信息
     _subscribe_infos = None
+    # 订阅标题匹配器，订阅标题变化时重建
+    _subscribe_matcher = None
+    # 刷流任务存储
+    _task_store = None
+    # 下载器状态快照
+    _downloader_snapshot = DownloaderSnapshot()
     # Brush定时
     _brush_interval = 10
     # Check定时
     _check_interval = 5
+    # 站点种子并发获取线程数
+    _fetch_workers = 5
+    # 单个站点获取种子超时时间（秒）
+    _fetch_timeout = 120
+    # 检查种子数达到该数量时，使用列式删种规则评估
+    _columnar_threshold = 500
     # 退出事件
     _event = Event()
     _scheduler = None
@@ -301,6 +351,8 @@ class BrushFlow(_PluginBase):
         self.torrents = TorrentsChain()
         self.subscribeoper = SubscribeOper()
         self._task_brush_enable = False
+        self._task_store = BrushTaskStore(db_path=self.get_data_path() / "tasks.db")
+        self.__migrate_legacy_tasks()
 
         if not config:
             logger.info("站点刷流任务出错，无法获取插件配置")
@@ -362,6 +414,12 @@ class BrushFlow(_PluginBase):
         if not brush_config.brushsites:
             logger.info(f"站点刷流Brush定时服务停止，没有配置站点")
 
+        # 删种规则性能测试
+        if brush_config.benchmark_delete:
+            brush_config.benchmark_delete = False
+            self.__update_config()
+            threading.Thread(target=self.__benchmark_delete_rules, name="brushflow-benchmark", daemon=True).start()
+
         # 如果开启&存在站点时，才需要启用后台任务
         self._task_brush_enable = brush_config.enabled and brush_config.brushsites
 
@@ -1581,6 +1639,27 @@ class BrushFlow(_PluginBase):
                                             }
                                         ]
                                     },
+                                    {
+                                        'component': 'VRow',
+                                        'content': [
+                                            {
+                                                'component': 'VCol',
+                                                'props': {
+                                                    'cols': 12,
+                                                    'md': 4
+                                                },
+                                                'content': [
+                                                    {
+                                                        'component': 'VSwitch',
+                                                        'props': {
+                                                            'model': 'benchmark_delete',
+                                                            'label': '删种规则性能测试',
+                                                        }
+                                                    }
+                                                ]
+                                            }
+                                        ]
+                                    },
                                     {
                                         'component': 'VRow',
                                         "content": [
@@ -1840,6 +1919,7 @@ class BrushFlow(_PluginBase):
             "onlyonce": False,
             "clear_task": False,
             "archive_task": False,
+            "benchmark_delete": False,
             "delete_except_tags": f"{settings.TORRENT_TAG},H&R" if settings.TORRENT_TAG else "H&R",
             "except_subscribe": True,
             "brush_sequential": False,
@@ -1856,7 +1936,7 @@ class BrushFlow(_PluginBase):
 
     def get_page(self) -> List[dict]:
         # 种子明细
-        torrents = self.get_data("torrents") or {}
+        torrents = self._task_store.load(BrushTaskStore.TORRENTS, track=False)
 
         if not torrents:
             return [
@@ -1973,8 +2053,11 @@ class BrushFlow(_PluginBase):
         with lock:
             logger.info(f"开始执行刷流任务 ...")
 
-            torrent_tasks: Dict[str, dict] = self.get_data("torrents") or {}
-            torrents_size = self.__calculate_seeding_torrents_size(torrent_tasks=torrent_tasks)
+            # 每个刷流周期从最新的下载器状态开始
+            self._downloader_snapshot.invalidate()
+
+            torrent_tasks: Dict[str, dict] = self._task_store.load(BrushTaskStore.TORRENTS)
+            torrents_size = self._task_store.seeding_size()
 
             # 判断能否通过保种体积前置条件
             size_condition_passed, reason = self.__evaluate_size_condition_for_brush(torrents_size=torrents_size)
@@ -2005,28 +2088,75 @@ class BrushFlow(_PluginBase):
 
             logger.info(f"即将针对站点 {', '.join(site.name for site in site_infos)} 开始刷流")
 
-            # 获取订阅标题
-            subscribe_titles = self.__get_subscribe_titles()
+            # 获取订阅标题匹配器
+            subscribe_matcher = self.__get_subscribe_matcher()
+
+            # 并发获取所有站点的种子，后续仍按站点顺序串行处理，保证体积统计准确
+            site_torrents = self.__fetch_sites_torrents(site_infos=site_infos)
 
             # 处理所有站点
             for site in site_infos:
                 # 如果站点刷流没有正确响应，说明没有通过前置条件，其他站点也不需要继续刷流了
-                if not self.__brush_site_torrents(siteid=site.id, torrent_tasks=torrent_tasks,
+                if not self.__brush_site_torrents(siteid=site.id, torrents=site_torrents.get(site.id),
+                                                  torrent_tasks=torrent_tasks,
                                                   statistic_info=statistic_info,
-                                                  subscribe_titles=subscribe_titles):
+                                                  subscribe_matcher=subscribe_matcher):
                     logger.info(f"站点 {site.name} 刷流中途结束，停止后续刷流")
                     break
                 else:
                     logger.info(f"站点 {site.name} 刷流完成")
 
             # 保存数据
-            self.save_data("torrents", torrent_tasks)
+            self._task_store.save(BrushTaskStore.TORRENTS, torrent_tasks)
             # 保存统计数据
             self.save_data("statistic", statistic_info)
             logger.info(f"刷流任务执行完成")
 
-    def __brush_site_torrents(self, siteid, torrent_tasks: Dict[str, dict], statistic_info: Dict[str, int],
-                              subscribe_titles: Set[str]) -> bool:
+    def __fetch_sites_torrents(self, site_infos: list) -> Dict[int, List[TorrentInfo]]:
+        """
+        并发获取站点种子，单个站点超时或出错不影响其他站点
+        """
+        site_torrents: Dict[int, List[TorrentInfo]] = {}
+        if not site_infos:
+            return site_torrents
+
+        start_times: Dict[int, float] = {}
+
+        def fetch_site(_site) -> List[TorrentInfo]:
+            start_times[_site.id] = time.time()
+            logger.info(f"开始获取站点 {_site.name} 的新种子 ...")
+            return self.torrents.browse(domain=_site.domain) or []
+
+        executor = ThreadPoolExecutor(max_workers=min(len(site_infos), self._fetch_workers),
+                                      thread_name_prefix="BrushFlowFetch")
+        try:
+            pending = {executor.submit(fetch_site, site): site for site in site_infos}
+            while pending:
+                if self._event.is_set():
+                    logger.info("站点刷流服务停止，取消获取站点种子")
+                    break
+                done, _ = wait(pending.keys(), timeout=1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    site = pending.pop(future)
+                    try:
+                        site_torrents[site.id] = future.result()
+                    except Exception as e:
+                        logger.error(f"站点 {site.name} 获取种子失败：{str(e)}")
+                # 超时的站点不再等待，后台线程结束后结果直接丢弃
+                now = time.time()
+                for future, site in list(pending.items()):
+                    start_time = start_times.get(site.id)
+                    if start_time and now - start_time > self._fetch_timeout:
+                        pending.pop(future)
+                        future.cancel()
+                        logger.warn(f"站点 {site.name} 获取种子超时（{self._fetch_timeout} 秒），本次跳过")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        return site_torrents
+
+    def __brush_site_torrents(self, siteid, torrents: Optional[List[TorrentInfo]], torrent_tasks: Dict[str, dict],
+                              statistic_info: Dict[str, int], subscribe_matcher: TitleMatcher) -> bool:
         """
         针对站点进行刷流
         """
@@ -2035,8 +2165,6 @@ class BrushFlow(_PluginBase):
             logger.warn(f"站点不存在：{siteid}")
             return True
 
-        logger.info(f"开始获取站点 {siteinfo.name} 的新种子 ...")
-        torrents = self.torrents.browse(domain=siteinfo.domain)
         if not torrents:
             logger.info(f"站点 {siteinfo.name} 没有获取到种子")
             return True
@@ -2048,7 +2176,8 @@ class BrushFlow(_PluginBase):
 
         # 排除包含订阅的种子
         if brush_config.except_subscribe:
-            torrents = self.__filter_torrents_contains_subscribe(torrents=torrents, subscribe_titles=subscribe_titles)
+            torrents = self.__filter_torrents_contains_subscribe(torrents=torrents,
+                                                                 subscribe_matcher=subscribe_matcher)
 
         # 按发布日期降序排列
         torrents.sort(key=lambda x: x.pubdate or '', reverse=True)
@@ -2083,6 +2212,8 @@ class BrushFlow(_PluginBase):
 
             # 添加下载任务
             hash_string = self.__download(torrent=torrent)
+            # 添加种子后下载器状态已变化，使快照失效
+            self._downloader_snapshot.invalidate()
             if not hash_string:
                 logger.warn(f"{torrent.title} 添加刷流任务失败！")
                 continue
@@ -2328,8 +2459,8 @@ class BrushFlow(_PluginBase):
 
         with lock:
             logger.info("开始检查刷流下载任务 ...")
-            torrent_tasks: Dict[str, dict] = self.get_data("torrents") or {}
-            unmanaged_tasks: Dict[str, dict] = self.get_data("unmanaged") or {}
+            torrent_tasks: Dict[str, dict] = self._task_store.load(BrushTaskStore.TORRENTS)
+            unmanaged_tasks: Dict[str, dict] = self._task_store.load(BrushTaskStore.UNMANAGED)
 
             downloader = self.__get_downloader(brush_config.downloader)
             if not downloader:
@@ -2418,8 +2549,6 @@ class BrushFlow(_PluginBase):
 
             self.__update_and_save_statistic_info(torrent_tasks)
 
-            self.save_data("torrents", torrent_tasks)
-
             logger.info("刷流下载任务检查完成")
 
     def __update_torrent_tasks_state(self, torrents: List[Any], torrent_tasks: Dict[str, dict]):
@@ -2502,8 +2631,8 @@ class BrushFlow(_PluginBase):
                     logger.info(f"站点 {torrent_task.get('site_name')}，"
                                 f"刷流任务种子移除：{torrent_task.get('title')}|{torrent_task.get('description')}")
 
-        self.save_data("torrents", torrent_tasks)
-        self.save_data("unmanaged", unmanaged_tasks)
+        self._task_store.save(BrushTaskStore.TORRENTS, torrent_tasks)
+        self._task_store.save(BrushTaskStore.UNMANAGED, unmanaged_tasks)
 
         # 发送汇总消息
         if added_tasks:
@@ -2610,6 +2739,10 @@ class BrushFlow(_PluginBase):
         brush_config = self.__get_brush_config()
         delete_hashes = []
 
+        # 种子较多时，先列式评估出满足删除条件的种子，仅对这些种子逐个生成删除原因
+        delete_candidates = self.__prefilter_torrents_by_columns(torrents=torrents, torrent_tasks=torrent_tasks,
+                                                                 evaluate=evaluate_delete_mask)
+
         for torrent in torrents:
             torrent_hash = self.__get_hash(torrent)
             torrent_task = torrent_tasks.get(torrent_hash, None)
@@ -2620,12 +2753,17 @@ class BrushFlow(_PluginBase):
             torrent_title = torrent_task.get("title", "")
             torrent_desc = torrent_task.get("description", "")
 
-            torrent_info = self.__get_torrent_info(torrent)
+            if delete_candidates is not None and torrent_hash not in delete_candidates:
+                # 列式评估不满足删除条件，仅生成不删除的原因
+                should_delete, reason = False, self.__get_undeleted_reason(site_name=site_name,
+                                                                           torrent_task=torrent_task)
+            else:
+                torrent_info = self.__get_torrent_info(torrent)
 
-            # 删除种子的具体实现可能会根据实际情况略有不同
-            should_delete, reason = self.__evaluate_conditions_for_delete(site_name=site_name,
-                                                                          torrent_info=torrent_info,
-                                                                          torrent_task=torrent_task)
+                # 删除种子的具体实现可能会根据实际情况略有不同
+                should_delete, reason = self.__evaluate_conditions_for_delete(site_name=site_name,
+                                                                              torrent_info=torrent_info,
+                                                                              torrent_task=torrent_task)
             if should_delete:
                 delete_hashes.append(torrent_hash)
                 reason = "触发动态删除阈值，" + reason if proxy_delete else reason
@@ -2645,6 +2783,9 @@ class BrushFlow(_PluginBase):
         brush_config = self.__get_brush_config()
         delete_hashes = []
 
+        delete_candidates = self.__prefilter_torrents_by_columns(torrents=torrents, torrent_tasks=torrent_tasks,
+                                                                 evaluate=evaluate_proxy_pre_delete_mask)
+
         for torrent in torrents:
             torrent_hash = self.__get_hash(torrent)
             torrent_task = torrent_tasks.get(torrent_hash, None)
@@ -2660,11 +2801,14 @@ class BrushFlow(_PluginBase):
             torrent_title = torrent_task.get("title", "")
             torrent_desc = torrent_task.get("description", "")
 
-            torrent_info = self.__get_torrent_info(torrent)
+            if delete_candidates is not None and torrent_hash not in delete_candidates:
+                should_delete, reason = False, "未能满足动态删除设置的前置删除条件"
+            else:
+                torrent_info = self.__get_torrent_info(torrent)
 
-            # 删除种子的具体实现可能会根据实际情况略有不同
-            should_delete, reason = self.__evaluate_proxy_pre_conditions_for_delete(site_name=site_name,
-                                                                                    torrent_info=torrent_info)
+                # 删除种子的具体实现可能会根据实际情况略有不同
+                should_delete, reason = self.__evaluate_proxy_pre_conditions_for_delete(site_name=site_name,
+                                                                                        torrent_info=torrent_info)
             if should_delete:
                 delete_hashes.append(torrent_hash)
                 self.__send_delete_message(site_name=site_name, torrent_title=torrent_title, torrent_desc=torrent_desc,
@@ -2692,7 +2836,12 @@ class BrushFlow(_PluginBase):
             return []
 
         # 获取种子信息Map
-        torrent_info_map = {self.__get_hash(torrent): self.__get_torrent_info(torrent=torrent) for torrent in torrents}
+        if self.__use_columnar(torrents=torrents):
+            torrent_info_map = TorrentColumns(torrents=torrents, torrent_tasks=torrent_tasks,
+                                              downloader=brush_config.downloader).info_map()
+        else:
+            torrent_info_map = {self.__get_hash(torrent): self.__get_torrent_info(torrent=torrent)
+                                for torrent in torrents}
 
         # 计算当前总做种体积
         total_torrent_size = self.__calculate_seeding_torrents_size(torrent_tasks=torrent_tasks)
@@ -2815,6 +2964,83 @@ class BrushFlow(_PluginBase):
         # 返回所有需要删除的种子的哈希列表
         return need_delete_hashes
 
+    def __use_columnar(self, torrents: List[Any]) -> bool:
+        """
+        是否使用列式删种规则评估
+        """
+        return columnar_available() and len(torrents) >= self._columnar_threshold
+
+    def __prefilter_torrents_by_columns(self, torrents: List[Any], torrent_tasks: Dict[str, dict],
+                                        evaluate: Callable) -> Optional[Set[str]]:
+        """
+        列式评估删种规则，返回满足删除条件的种子hash，不满足列式评估条件时返回None，即全部逐个种子评估
+        """
+        if not self.__use_columnar(torrents=torrents):
+            return None
+        start_time = time.time()
+        try:
+            columns = TorrentColumns(torrents=torrents, torrent_tasks=torrent_tasks,
+                                     downloader=self.__get_brush_config().downloader)
+            delete_hashes = set(columns.hashes_of(evaluate(columns, self.__get_brush_config)))
+        except Exception as e:
+            logger.error(f"列式评估删种规则失败，改为逐个种子评估：{str(e)}")
+            return None
+        logger.debug(f"列式评估删种规则完成，种子数 {len(torrents)}，满足删除条件 {len(delete_hashes)}，"
+                     f"耗时 {(time.time() - start_time) * 1000:.0f} 毫秒")
+        return delete_hashes
+
+    def __get_undeleted_reason(self, site_name: str, torrent_task: dict) -> str:
+        """
+        列式评估不满足删除条件的种子的不删除原因，与__evaluate_conditions_for_delete一致
+        """
+        if not torrent_task.get("hit_and_run", False):
+            return "未能满足设置的删除条件"
+        brush_config = self.__get_brush_config(sitename=site_name)
+        if brush_config.hr_seed_time or brush_config.seed_ratio:
+            return "H&R种子，未能满足设置的H&R删除条件"
+        return "H&R种子（未设置H&R条件），未能满足设置的删除条件"
+
+    def __benchmark_delete_rules(self):
+        """
+        删种规则性能测试，使用下载器中的刷流种子，对比逐个种子评估与列式评估的耗时
+        """
+        if not columnar_available():
+            logger.warn("删种规则性能测试需要安装numpy")
+            return
+        brush_config = self.__get_brush_config()
+        downloader = self.__get_downloader(brush_config.downloader)
+        if not downloader:
+            logger.warn("删种规则性能测试无法获取下载器实例")
+            return
+        torrents, error = downloader.get_torrents()
+        if error:
+            logger.warn("删种规则性能测试连接下载器出错")
+            return
+        torrent_tasks: Dict[str, dict] = self._task_store.load(BrushTaskStore.TORRENTS)
+        torrents = [torrent for torrent in torrents if self.__get_hash(torrent) in torrent_tasks]
+        if not torrents:
+            logger.warn("删种规则性能测试没有找到刷流种子")
+            return
+
+        def __should_delete(torrent: Any) -> bool:
+            torrent_task = torrent_tasks.get(self.__get_hash(torrent))
+            should_delete, _ = self.__evaluate_conditions_for_delete(site_name=torrent_task.get("site_name", ""),
+                                                                     torrent_info=self.__get_torrent_info(torrent),
+                                                                     torrent_task=torrent_task)
+            return should_delete
+
+        try:
+            result = benchmark(torrents=torrents, torrent_tasks=torrent_tasks, downloader=brush_config.downloader,
+                               get_config=self.__get_brush_config, should_delete=__should_delete)
+        except Exception as e:
+            logger.error(f"删种规则性能测试失败：{str(e)}")
+            return
+        message = (f"种子数 {result['torrents']}，满足删除条件 {result['delete']}，"
+                   f"逐个种子评估 {result['scalar']:.2f} 毫秒，列式评估 {result['columnar']:.2f} 毫秒，"
+                   f"评估结果不一致 {result['mismatch']} 个")
+        logger.info(f"删种规则性能测试完成：{message}")
+        self.systemmessage.put(message, title="刷流删种规则性能测试")
+
     def __update_undeleted_torrents_missing_in_downloader(self, torrent_tasks, torrent_check_hashes, torrents):
         """
         处理已经被删除，但是任务记录中还没有被标记删除的种子
@@ -2893,40 +3119,17 @@ class BrushFlow(_PluginBase):
         """
         更新并保存统计信息
         """
-        total_count, total_uploaded, total_downloaded, total_deleted = 0, 0, 0, 0
-        active_uploaded, active_downloaded, active_count, total_unarchived = 0, 0, 0, 0
+        # 先保存刷流任务，仅写入发生变化的任务，再由存储直接汇总统计
+        self._task_store.save(BrushTaskStore.TORRENTS, torrent_tasks)
 
         statistic_info = self.__get_statistic_info()
-        archived_tasks = self.get_data("archived") or {}
-        combined_tasks = {**torrent_tasks, **archived_tasks}
-
-        for task in combined_tasks.values():
-            if task.get("deleted", False):
-                total_deleted += 1
-            total_downloaded += task.get("downloaded", 0)
-            total_uploaded += task.get("uploaded", 0)
-
-        # 计算torrent_tasks中未标记为删除的活跃任务的统计信息，及待归档的任务数
-        for task in torrent_tasks.values():
-            if not task.get("deleted", False):
-                active_uploaded += task.get("uploaded", 0)
-                active_downloaded += task.get("downloaded", 0)
-                active_count += 1
-            else:
-                total_unarchived += 1
-
-        # 更新统计信息
-        total_count = len(combined_tasks)
-        statistic_info.update({
-            "uploaded": total_uploaded,
-            "downloaded": total_downloaded,
-            "deleted": total_deleted,
-            "unarchived": total_unarchived,
-            "count": total_count,
-            "active": active_count,
-            "active_uploaded": active_uploaded,
-            "active_downloaded": active_downloaded
-        })
+        statistic_info.update(self._task_store.statistics())
+
+        total_count, active_count = statistic_info.get("count"), statistic_info.get("active")
+        total_deleted, total_unarchived = statistic_info.get("deleted"), statistic_info.get("unarchived")
+        active_uploaded, active_downloaded = statistic_info.get("active_uploaded"), \
+            statistic_info.get("active_downloaded")
+        total_uploaded, total_downloaded = statistic_info.get("uploaded"), statistic_info.get("downloaded")
 
         logger.info(f"刷流任务统计数据，总任务数：{total_count}，活跃任务数：{active_count}，已删除：{total_deleted}，"
                     f"待归档：{total_unarchived}，"
@@ -2936,7 +3139,6 @@ class BrushFlow(_PluginBase):
                     f"总下载量：{StringUtils.str_filesize(total_downloaded)}")
 
         self.save_data("statistic", statistic_info)
-        self.save_data("torrents", torrent_tasks)
 
     def __get_brush_config(self, sitename: str = None) -> BrushConfig:
         """
@@ -3045,6 +3247,7 @@ class BrushFlow(_PluginBase):
             "save_path": brush_config.save_path,
             "clear_task": brush_config.clear_task,
             "archive_task": brush_config.archive_task,
+            "benchmark_delete": brush_config.benchmark_delete,
             "delete_except_tags": brush_config.delete_except_tags,
             "except_subscribe": brush_config.except_subscribe,
             "brush_sequential": brush_config.brush_sequential,
@@ -3631,16 +3834,17 @@ class BrushFlow(_PluginBase):
         """
         获取任务中的种子总大小
         """
-        # 读取种子记录
-        task_info = self.get_data("torrents") or {}
-        if not task_info:
-            return 0
-        total_size = sum([task.get("size") or 0 for task in task_info.values()])
-        return total_size
+        return self._task_store.total_size()
 
     def __get_downloader_info(self) -> schemas.DownloaderInfo:
         """
-        获取下载器实时信息（所有下载器）
+        获取下载器实时信息（所有下载器），有效期内复用快照
+        """
+        return self._downloader_snapshot.get("downloader_info", self.__load_downloader_info)
+
+    def __load_downloader_info(self) -> schemas.DownloaderInfo:
+        """
+        从下载器获取实时信息（所有下载器）
         """
         ret_info = schemas.DownloaderInfo()
 
@@ -3666,23 +3870,29 @@ class BrushFlow(_PluginBase):
 
     def __get_downloading_count(self) -> int:
         """
-        获取正在下载的任务数量
+        获取正在下载的任务数量，有效期内复用快照
+        """
+        return self._downloader_snapshot.get("downloading_count", self.__load_downloading_count) or 0
+
+    def __load_downloading_count(self) -> Optional[int]:
+        """
+        从下载器获取正在下载的任务数量，获取失败时返回None
         """
         try:
             brush_config = self.__get_brush_config()
             downloader = self.__get_downloader(brush_config.downloader)
             if not downloader:
-                return 0
+                return None
 
             torrents = downloader.get_downloading_torrents(tags=brush_config.brush_tag)
             if torrents is None:
                 logger.warn("获取下载数量失败，可能是下载器连接发生异常")
-                return 0
+                return None
 
             return len(torrents)
         except Exception as e:
             logger.error(f"获取下载数量发生异常: {e}")
-            return 0
+            return None
 
     @staticmethod
     def __get_pubminutes(pubdate: str) -> float:
@@ -3802,8 +4012,18 @@ class BrushFlow(_PluginBase):
         unique_titles = {title for titles in self._subscribe_infos.values() for title in titles}
         return unique_titles
 
+    def __get_subscribe_matcher(self) -> TitleMatcher:
+        """
+        获取订阅标题匹配器，仅在订阅标题发生变化时重建
+        """
+        subscribe_titles = self.__get_subscribe_titles()
+        if not self._subscribe_matcher or self._subscribe_matcher.patterns != subscribe_titles:
+            self._subscribe_matcher = TitleMatcher(subscribe_titles)
+            logger.debug(f"订阅标题匹配器已重建，标题数量 {len(self._subscribe_matcher)}")
+        return self._subscribe_matcher
+
     @staticmethod
-    def __filter_torrents_contains_subscribe(torrents: Any, subscribe_titles: Set[str]):
+    def __filter_torrents_contains_subscribe(torrents: Any, subscribe_matcher: TitleMatcher):
         # 初始化两个列表，一个用于收集未被排除的种子，一个用于记录被排除的种子
         included_torrents = []
         excluded_torrents = []
@@ -3814,10 +4034,11 @@ class BrushFlow(_PluginBase):
             title = torrent.title or ''
             description = torrent.description or ''
 
-            if any(subscribe_title in title or subscribe_title in description for subscribe_title in subscribe_titles):
+            matched_title = subscribe_matcher.search(title) or subscribe_matcher.search(description)
+            if matched_title:
                 # 如果种子的标题或描述包含订阅标题中的任一项，则记录为被排除
                 excluded_torrents.append(torrent)
-                logger.info(f"命中订阅内容，排除种子：{title}|{description}")
+                logger.info(f"命中订阅内容 {matched_title}，排除种子：{title}|{description}")
             else:
                 # 否则，收集为未被排除的种子
                 included_torrents.append(torrent)
@@ -3873,8 +4094,8 @@ class BrushFlow(_PluginBase):
             logger.info("自动归档记录天数小于等于0，取消自动归档")
             return
 
-        # 用于存储已删除的数据
-        archived_tasks: Dict[str, dict] = self.get_data("archived") or {}
+        # 用于存储已删除的数据，归档任务只追加，无需加载历史归档数据
+        archived_tasks: Dict[str, dict] = {}
 
         current_time = time.time()
         archive_threshold_seconds = self._brush_config.auto_archive_days * 86400  # 将天数转换为秒数
@@ -3902,16 +4123,16 @@ class BrushFlow(_PluginBase):
         for key in keys_to_delete:
             del torrent_tasks[key]
 
-        self.save_data("archived", archived_tasks)
+        self.__append_archived_tasks(archived_tasks=archived_tasks)
 
     def __archive_tasks(self):
         """
         归档已经删除的种子数据
         """
-        torrent_tasks: Dict[str, dict] = self.get_data("torrents") or {}
+        torrent_tasks: Dict[str, dict] = self._task_store.load(BrushTaskStore.TORRENTS)
 
         # 用于存储已删除的数据
-        archived_tasks: Dict[str, dict] = self.get_data("archived") or {}
+        archived_tasks: Dict[str, dict] = {}
 
         # 准备一个列表，记录所有需要从原始数据中删除的键
         keys_to_delete = set()
@@ -3929,8 +4150,7 @@ class BrushFlow(_PluginBase):
         for key in keys_to_delete:
             del torrent_tasks[key]
 
-        self.save_data("archived", archived_tasks)
-        self.save_data("torrents", torrent_tasks)
+        self.__append_archived_tasks(archived_tasks=archived_tasks)
         # 归档需要更新一下统计数据
         self.__update_and_save_statistic_info(torrent_tasks=torrent_tasks)
 
@@ -3939,11 +4159,36 @@ class BrushFlow(_PluginBase):
         清除统计数据
         彻底重置所有刷流数据，如当前还存在正在做种的刷流任务，待定时检查任务执行后，会自动纳入刷流管理
         """
-        self.save_data("torrents", {})
-        self.save_data("archived", {})
-        self.save_data("unmanaged", {})
+        self._task_store.clear()
         self.save_data("statistic", {})
 
+    def __append_archived_tasks(self, archived_tasks: Dict[str, dict]):
+        """
+        追加归档任务，已存在的归档任务会被覆盖
+        """
+        if not archived_tasks:
+            return
+        # 使用不记录快照的方式合并，避免加载全部历史归档数据
+        self._task_store.upsert(BrushTaskStore.ARCHIVED, archived_tasks)
+
+    def __migrate_legacy_tasks(self):
+        """
+        将旧版本整体保存的任务数据迁移到按任务存储中
+        """
+        if not self._task_store.is_empty():
+            return
+        migrated = False
+        for bucket in [BrushTaskStore.TORRENTS, BrushTaskStore.ARCHIVED, BrushTaskStore.UNMANAGED]:
+            legacy_tasks = self.get_data(bucket)
+            if not legacy_tasks:
+                continue
+            self._task_store.upsert(bucket, legacy_tasks)
+            self.del_data(key=bucket)
+            migrated = True
+            logger.info(f"刷流任务数据 {bucket} 已迁移，共 {len(legacy_tasks)} 条")
+        if migrated:
+            logger.info("刷流任务数据迁移完成")
+
     def __get_statistic_info(self) -> Dict[str, int]:
         """
         获取统计数据
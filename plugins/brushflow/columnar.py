@@ -0,0 +1,165 @@
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def columnar_available() -> bool:
+    """
+    是否可以使用列式删除规则评估（依赖numpy）
+    """
+    return np is not None
+
+
+class TorrentColumns:
+    """
+    将下载器种子的删种相关字段一次性加载为列数组，字段口径与BrushFlow.__get_torrent_info保持一致
+    """
+
+    def __init__(self, torrents: List[Any], torrent_tasks: Dict[str, dict], downloader: str,
+                 now: Optional[int] = None):
+        now = int(now or time.time())
+        if downloader == "qbittorrent":
+            self.hashes: List[str] = [torrent.get("hash") for torrent in torrents]
+            fields = [(torrent.get("added_on") or 0, torrent.get("completion_on") or 0,
+                       torrent.get("last_activity") or 0, torrent.get("ratio") or 0,
+                       torrent.get("uploaded") or 0, torrent.get("downloaded") or 0,
+                       torrent.get("total_size") or 0) for torrent in torrents]
+        else:
+            self.hashes = [torrent.hashString for torrent in torrents]
+            fields = []
+            for torrent in torrents:
+                downloaded = int(torrent.total_size * torrent.progress / 100)
+                fields.append((int(torrent.date_added.timestamp()) if torrent.date_added else 0,
+                               int(torrent.date_done.timestamp()) if torrent.date_done else 0,
+                               int(torrent.date_active.timestamp()) if torrent.date_active else 0,
+                               torrent.ratio or 0, int(downloaded * (torrent.ratio or 0)), downloaded,
+                               torrent.total_size or 0))
+        matrix = np.array(fields, dtype=np.float64).reshape(len(fields), 7)
+        added_on, completion_on, last_activity, ratio, uploaded, downloaded, total_size = matrix.T
+
+        tasks = [torrent_tasks.get(torrent_hash) for torrent_hash in self.hashes]
+        self.site_names: List[str] = [task.get("site_name", "") if task else "" for task in tasks]
+        managed = np.array([bool(task) for task in tasks], dtype=bool)
+        hit_and_run = np.array([bool(task and task.get("hit_and_run", False)) for task in tasks], dtype=bool)
+
+        self.managed = managed
+        self.hit_and_run = hit_and_run
+        self.ratio = ratio
+        self.uploaded = uploaded
+        self.downloaded = downloaded
+        self.total_size = total_size
+        # qb小于0、tr小于1的时间戳均视为无效
+        self.dltime = np.where(added_on >= 1, now - added_on, 0)
+        self.seeding_time = np.where(completion_on >= 1, now - completion_on, 0)
+        self.iatime = np.where(last_activity >= 1, now - last_activity, 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.avg_upspeed = np.where(self.dltime > 0, np.floor(uploaded / np.maximum(self.dltime, 1)), uploaded)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def site_groups(self) -> Dict[str, Any]:
+        """
+        按站点分组的已托管种子行号
+        """
+        groups: Dict[str, List[int]] = {}
+        for index, site_name in enumerate(self.site_names):
+            if self.managed[index]:
+                groups.setdefault(site_name, []).append(index)
+        return {site_name: np.array(rows, dtype=np.intp) for site_name, rows in groups.items()}
+
+    def info_map(self) -> Dict[str, dict]:
+        """
+        动态删种所需的种子体积及做种时间
+        """
+        return {torrent_hash: {"total_size": int(self.total_size[index]),
+                               "seeding_time": int(self.seeding_time[index])}
+                for index, torrent_hash in enumerate(self.hashes)}
+
+    def hashes_of(self, mask) -> List[str]:
+        return [self.hashes[index] for index in np.flatnonzero(mask)]
+
+
+def evaluate_delete_mask(columns: TorrentColumns, get_config: Callable[[str], Any]):
+    """
+    按站点配置向量化评估删种规则，规则与BrushFlow.__evaluate_conditions_for_delete一致
+    """
+    mask = np.zeros(len(columns), dtype=bool)
+    for site_name, rows in columns.site_groups().items():
+        config = get_config(site_name)
+        seeding_time = columns.seeding_time[rows]
+        ratio = columns.ratio[rows]
+        hit_and_run = columns.hit_and_run[rows]
+
+        # H&R种子且配置了H&R条件时，仅按H&R做种时间/分享率判断
+        hr_specific = hit_and_run & bool(config.hr_seed_time or config.seed_ratio)
+        hr_delete = np.zeros(len(rows), dtype=bool)
+        if config.hr_seed_time:
+            hr_delete |= seeding_time >= float(config.hr_seed_time) * 3600
+        if config.seed_ratio:
+            hr_delete |= ratio >= float(config.seed_ratio)
+
+        normal_delete = np.zeros(len(rows), dtype=bool)
+        if config.seed_time:
+            normal_delete |= seeding_time >= float(config.seed_time) * 3600
+        if config.seed_ratio:
+            normal_delete |= ratio >= float(config.seed_ratio)
+        if config.seed_size:
+            normal_delete |= columns.uploaded[rows] >= float(config.seed_size) * 1024 ** 3
+        if config.download_time:
+            normal_delete |= ((columns.downloaded[rows] < columns.total_size[rows])
+                              & (columns.dltime[rows] >= float(config.download_time) * 3600))
+        if config.seed_avgspeed:
+            normal_delete |= ((columns.avg_upspeed[rows] <= float(config.seed_avgspeed) * 1024)
+                              & (seeding_time >= 30 * 60))
+        if config.seed_inactivetime:
+            normal_delete |= columns.iatime[rows] >= float(config.seed_inactivetime) * 60
+
+        mask[rows] = np.where(hr_specific, hr_delete, normal_delete)
+    return mask
+
+
+def evaluate_proxy_pre_delete_mask(columns: TorrentColumns, get_config: Callable[[str], Any]):
+    """
+    向量化评估动态删种前置条件（排除H&R种子后的下载超时），规则与BrushFlow.__evaluate_proxy_pre_conditions_for_delete一致
+    """
+    mask = np.zeros(len(columns), dtype=bool)
+    for site_name, rows in columns.site_groups().items():
+        config = get_config(site_name)
+        if not config.download_time:
+            continue
+        mask[rows] = (~columns.hit_and_run[rows]
+                      & (columns.downloaded[rows] < columns.total_size[rows])
+                      & (columns.dltime[rows] >= float(config.download_time) * 3600))
+    return mask
+
+
+def benchmark(torrents: List[Any], torrent_tasks: Dict[str, dict], downloader: str,
+              get_config: Callable[[str], Any], should_delete: Callable[[Any], bool], rounds: int = 3) -> dict:
+    """
+    对比逐种子评估与列式评估删种规则的耗时
+    :param should_delete: 逐种子评估函数，即插件实际使用的种子信息获取及删除条件评估流程
+    :return: 种子数、满足删除条件的种子数、两种方式的平均耗时（毫秒）及评估结果不一致的种子数
+    """
+    hashes = [torrent.get("hash") for torrent in torrents] if downloader == "qbittorrent" \
+        else [torrent.hashString for torrent in torrents]
+    rounds = max(rounds, 1)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        scalar = {torrent_hash for torrent_hash, torrent in zip(hashes, torrents) if should_delete(torrent)}
+    scalar_cost = (time.perf_counter() - start) / rounds
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        columns = TorrentColumns(torrents, torrent_tasks, downloader)
+        vectorized = set(columns.hashes_of(evaluate_delete_mask(columns, get_config)))
+    vectorized_cost = (time.perf_counter() - start) / rounds
+
+    return {"torrents": len(torrents), "delete": len(vectorized),
+            "scalar": scalar_cost * 1000, "columnar": vectorized_cost * 1000,
+            "mismatch": len(scalar ^ vectorized)}
@@ -0,0 +1,107 @@
+import time
+from collections import deque
+from typing import Iterable, Optional, List, Dict
+
+
+class TitleMatcher:
+    """
+    基于Aho-Corasick自动机的多模式子串匹配，单次线性扫描即可判断文本是否包含任一标题
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = frozenset(p for p in patterns if p)
+        # 状态转移表，下标为状态编号
+        self._goto: List[Dict[str, int]] = [{}]
+        # 失配跳转
+        self._fail: List[int] = [0]
+        # 到达该状态时命中的模式（含失配链继承的模式），未命中为None
+        self._output: List[Optional[str]] = [None]
+        self.__build()
+
+    def __build(self):
+        goto, output = self._goto, self._output
+        for pattern in self.patterns:
+            state = 0
+            for char in pattern:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    output.append(None)
+                state = next_state
+            output[state] = pattern
+
+        fail = self._fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(char, 0)
+                if output[next_state] is None:
+                    output[next_state] = output[fail[next_state]]
+
+    def search(self, text: str) -> Optional[str]:
+        """
+        查找文本中包含的任一模式，没有命中时返回None
+        """
+        if not text or not self.patterns:
+            return None
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state] is not None:
+                return output[state]
+        return None
+
+    def __len__(self):
+        return len(self.patterns)
+
+
+def benchmark(title_count: int = 3000, torrent_count: int = 300, rounds: int = 5):
+    """
+    对比逐个标题子串匹配与自动机匹配的耗时
+    """
+    import random
+    import string
+
+    rnd = random.Random(0)
+
+    def random_text(length: int) -> str:
+        return "".join(rnd.choice(string.ascii_letters + " .") for _ in range(length))
+
+    titles = {random_text(rnd.randint(4, 20)) for _ in range(title_count)}
+    texts = [random_text(rnd.randint(40, 120)) for _ in range(torrent_count)]
+    # 让部分种子命中订阅
+    for index in range(0, torrent_count, 10):
+        texts[index] += rnd.choice(list(titles))
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        naive = [any(title in text for title in titles) for text in texts]
+    naive_cost = (time.perf_counter() - start) / rounds
+
+    start = time.perf_counter()
+    matcher = TitleMatcher(titles)
+    build_cost = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        matched = [matcher.search(text) is not None for text in texts]
+    matcher_cost = (time.perf_counter() - start) / rounds
+
+    assert naive == matched
+    print(f"titles={len(titles)} torrents={torrent_count} hits={sum(matched)}")
+    print(f"naive: {naive_cost * 1000:.2f} ms/page")
+    print(f"automaton: {matcher_cost * 1000:.2f} ms/page, build {build_cost * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,189 @@
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional, Any
+
+from app.log import logger
+
+
+class BrushTaskStore:
+    """
+    刷流任务存储，按种子Hash逐条持久化，仅写入发生变化的任务
+    """
+
+    # 刷流任务
+    TORRENTS = "torrents"
+    # 归档任务
+    ARCHIVED = "archived"
+    # 移出管理的任务
+    UNMANAGED = "unmanaged"
+
+    def __init__(self, db_path: Path):
+        self._db_path = str(db_path)
+        self._lock = threading.Lock()
+        # 各分组最近一次加载/保存时的任务快照，用于比对脏数据
+        self._snapshots: Dict[str, Dict[str, dict]] = {}
+        self.__init_db()
+
+    @contextmanager
+    def __connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def __init_db(self):
+        with self.__connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    bucket TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    deleted INTEGER NOT NULL DEFAULT 0,
+                    size REAL NOT NULL DEFAULT 0,
+                    uploaded REAL NOT NULL DEFAULT 0,
+                    downloaded REAL NOT NULL DEFAULT 0,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (bucket, hash)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_hash ON tasks (hash)")
+
+    @staticmethod
+    def __to_row(bucket: str, torrent_hash: str, task: dict) -> tuple:
+        return (bucket, torrent_hash,
+                1 if task.get("deleted") else 0,
+                task.get("size") or 0,
+                task.get("uploaded") or 0,
+                task.get("downloaded") or 0,
+                json.dumps(task, ensure_ascii=False))
+
+    def is_empty(self) -> bool:
+        """
+        是否没有任何任务数据
+        """
+        with self.__connect() as conn:
+            return conn.execute("SELECT 1 FROM tasks LIMIT 1").fetchone() is None
+
+    def load(self, bucket: str, track: bool = True) -> Dict[str, dict]:
+        """
+        加载分组下的所有任务
+        :param bucket: 分组
+        :param track: 是否记录快照，只有需要回写的调用方才需要记录
+        """
+        with self._lock:
+            with self.__connect() as conn:
+                rows = conn.execute("SELECT hash, data FROM tasks WHERE bucket = ?", (bucket,)).fetchall()
+            tasks = {}
+            for torrent_hash, data in rows:
+                try:
+                    tasks[torrent_hash] = json.loads(data)
+                except Exception as e:
+                    logger.error(f"刷流任务数据解析失败：{torrent_hash} - {str(e)}")
+            if track:
+                self._snapshots[bucket] = {k: dict(v) for k, v in tasks.items()}
+            return tasks
+
+    def save(self, bucket: str, tasks: Dict[str, dict]) -> int:
+        """
+        保存分组下的任务，仅写入新增、变化以及删除的任务
+        :return: 写入的任务数
+        """
+        with self._lock:
+            snapshot = self._snapshots.get(bucket)
+            with self.__connect() as conn:
+                if snapshot is None:
+                    # 未加载过的分组，以数据库中的记录作为比对基准
+                    snapshot = {}
+                    for torrent_hash, data in conn.execute("SELECT hash, data FROM tasks WHERE bucket = ?",
+                                                           (bucket,)):
+                        snapshot[torrent_hash] = json.loads(data)
+                removed = [(bucket, torrent_hash) for torrent_hash in snapshot if torrent_hash not in tasks]
+                changed = [self.__to_row(bucket, torrent_hash, task) for torrent_hash, task in tasks.items()
+                           if snapshot.get(torrent_hash) != task]
+                if removed:
+                    conn.executemany("DELETE FROM tasks WHERE bucket = ? AND hash = ?", removed)
+                if changed:
+                    conn.executemany("INSERT OR REPLACE INTO tasks "
+                                     "(bucket, hash, deleted, size, uploaded, downloaded, data) "
+                                     "VALUES (?, ?, ?, ?, ?, ?, ?)", changed)
+            self._snapshots[bucket] = {k: dict(v) for k, v in tasks.items()}
+            if removed or changed:
+                logger.debug(f"刷流任务分组 {bucket} 已保存，更新 {len(changed)} 条，删除 {len(removed)} 条")
+            return len(removed) + len(changed)
+
+    def upsert(self, bucket: str, tasks: Dict[str, dict]):
+        """
+        直接新增或覆盖分组下的任务，不需要加载分组下的已有任务
+        """
+        if not tasks:
+            return
+        with self._lock:
+            with self.__connect() as conn:
+                conn.executemany("INSERT OR REPLACE INTO tasks "
+                                 "(bucket, hash, deleted, size, uploaded, downloaded, data) "
+                                 "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                 [self.__to_row(bucket, torrent_hash, task) for torrent_hash, task in tasks.items()])
+            snapshot = self._snapshots.get(bucket)
+            if snapshot is not None:
+                snapshot.update({k: dict(v) for k, v in tasks.items()})
+
+    def clear(self, bucket: Optional[str] = None):
+        """
+        清空分组下的任务，不指定分组时清空所有任务
+        """
+        with self._lock:
+            with self.__connect() as conn:
+                if bucket:
+                    conn.execute("DELETE FROM tasks WHERE bucket = ?", (bucket,))
+                    self._snapshots[bucket] = {}
+                else:
+                    conn.execute("DELETE FROM tasks")
+                    self._snapshots.clear()
+
+    def seeding_size(self) -> float:
+        """
+        刷流任务中未删除种子的总体积
+        """
+        with self.__connect() as conn:
+            row = conn.execute("SELECT SUM(size) FROM tasks WHERE bucket = ? AND deleted = 0",
+                               (self.TORRENTS,)).fetchone()
+        return row[0] or 0
+
+    def total_size(self) -> float:
+        """
+        刷流任务中所有种子的总体积
+        """
+        with self.__connect() as conn:
+            row = conn.execute("SELECT SUM(size) FROM tasks WHERE bucket = ?", (self.TORRENTS,)).fetchone()
+        return row[0] or 0
+
+    def statistics(self) -> Dict[str, Any]:
+        """
+        汇总统计刷流任务及归档任务，归档任务与刷流任务Hash相同时以归档任务为准
+        """
+        with self.__connect() as conn:
+            count, deleted, uploaded, downloaded = conn.execute("""
+                SELECT COUNT(*), SUM(deleted), SUM(uploaded), SUM(downloaded) FROM tasks
+                WHERE bucket = :archived
+                   OR (bucket = :torrents AND hash NOT IN (SELECT hash FROM tasks WHERE bucket = :archived))
+            """, {"archived": self.ARCHIVED, "torrents": self.TORRENTS}).fetchone()
+            active, unarchived, active_uploaded, active_downloaded = conn.execute("""
+                SELECT SUM(deleted = 0), SUM(deleted),
+                       SUM(CASE WHEN deleted = 0 THEN uploaded ELSE 0 END),
+                       SUM(CASE WHEN deleted = 0 THEN downloaded ELSE 0 END)
+                FROM tasks WHERE bucket = ?
+            """, (self.TORRENTS,)).fetchone()
+        return {
+            "uploaded": uploaded or 0,
+            "downloaded": downloaded or 0,
+            "deleted": deleted or 0,
+            "unarchived": unarchived or 0,
+            "count": count or 0,
+            "active": active or 0,
+            "active_uploaded": active_uploaded or 0,
+            "active_downloaded": active_downloaded or 0
+        }
@@ -2,6 +2,7 @@ import glob
 import os
 import shutil
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
 
@@ -15,6 +16,7 @@ from app.core.event import eventmanager, Event
 
 from app.core.config import settings
 from app.plugins import _PluginBase
+from app.plugins.cleaninvalidseed.pathindex import ContentPathIndex, get_dir_size
 from typing import Any, List, Dict, Tuple, Optional
 from app.log import logger
 from app.schemas import NotificationType
@@ -28,7 +30,7 @@ class CleanInvalidSeed(_PluginBase):
     # 插件图标
     plugin_icon = "clean_a.png"
     # 插件版本
-    plugin_version = "2.2"
+    plugin_version = "2.3"
     # 插件作者
     plugin_author = "DzAvril"
     # 作者主页
@@ -66,6 +68,8 @@ class CleanInvalidSeed(_PluginBase):
         "err torrent banned",
     ]
     _custom_error_msg = ""
+    # 计算无效源文件大小的并发数
+    _size_workers = 4
 
     def init_plugin(self, config: dict = None):
         # 停止现有任务
@@ -503,11 +507,13 @@ class CleanInvalidSeed(_PluginBase):
 
     def detect_invalid_files(self):
         logger.info("开始检测未做种的无效源文件")
+        start_time = time.time()
         all_torrents = self.get_all_torrents()
+        fetch_time = time.time()
         source_path_map = {}
         source_paths = []
+        invalid_files = []
         total_size = 0
-        deleted_file_cnt = 0
         exclude_key_words = (
             self._exclude_keywords.split("\n") if self._exclude_keywords else []
         )
@@ -524,9 +530,10 @@ class CleanInvalidSeed(_PluginBase):
             source_path_map[mp_path] = qb_path
             source_paths.append(mp_path)
         # 所有做种源文件路径
-        content_path_set = set()
-        for torrent in all_torrents:
-            content_path_set.add(torrent.content_path)
+        content_path_index = ContentPathIndex(
+            torrent.content_path for torrent in all_torrents
+        )
+        index_time = time.time()
 
         message = "检测未做种无效源文件：\n"
         for source_path_str in source_paths:
@@ -540,11 +547,8 @@ class CleanInvalidSeed(_PluginBase):
                     text=f"{source_path} 不存在，无法检测未做种无效源文件",
                 )
                 continue
-            source_files = []
             # 获取source_path下的所有文件包括文件夹
-            for file in source_path.iterdir():
-                source_files.append(file)
-            for source_file in source_files:
+            for source_file in source_path.iterdir():
                 skip = False
                 for key_word in exclude_key_words:
                     if key_word in source_file.name:
@@ -557,27 +561,37 @@ class CleanInvalidSeed(_PluginBase):
                 qb_path = (str(source_file)).replace(
                     source_path_str, source_path_map[source_path_str]
                 )
-                # todo: 优化性能
-                is_exist = False
-                for content_path in content_path_set:
-                    if qb_path in content_path:
-                        is_exist = True
-                        break
-
-                if not is_exist:
-                    deleted_file_cnt += 1
-                    message += f"{deleted_file_cnt}. {str(source_file)}\n"
-                    total_size += self.get_size(source_file)
-                    if self._delete_invalid_files:
-                        if source_file.is_file():
-                            source_file.unlink()
-                        elif source_file.is_dir():
-                            shutil.rmtree(source_file)
-
-        message += f"检测到{deleted_file_cnt}个未做种的无效源文件，共占用{StringUtils.str_filesize(total_size)}空间。\n"
+                if not content_path_index.contains(qb_path):
+                    invalid_files.append(source_file)
+        match_time = time.time()
+
+        # 并发计算无效源文件大小
+        with ThreadPoolExecutor(max_workers=self._size_workers) as executor:
+            sizes = list(executor.map(lambda file: get_dir_size(str(file)), invalid_files))
+        size_time = time.time()
+
+        for deleted_file_cnt, (source_file, size) in enumerate(zip(invalid_files, sizes), start=1):
+            message += f"{deleted_file_cnt}. {str(source_file)}\n"
+            total_size += size
+            if self._delete_invalid_files:
+                if source_file.is_file():
+                    source_file.unlink()
+                elif source_file.is_dir():
+                    shutil.rmtree(source_file)
+
+        message += f"检测到{len(invalid_files)}个未做种的无效源文件，共占用{StringUtils.str_filesize(total_size)}空间。\n"
         if self._delete_invalid_files:
             message += f"***已删除无效源文件，释放{StringUtils.str_filesize(total_size)}空间!***\n"
+        else:
+            message += "仅检测，未删除文件。\n"
         logger.info(message)
+        logger.info(
+            f"检测无效源文件耗时：获取种子{fetch_time - start_time:.2f}秒，"
+            f"建立索引{index_time - fetch_time:.2f}秒（{len(all_torrents)}个种子），"
+            f"匹配源文件{match_time - index_time:.2f}秒，"
+            f"计算大小{size_time - match_time:.2f}秒，"
+            f"共计{time.time() - start_time:.2f}秒"
+        )
         if self._notify:
             message = message.replace("_", "\_")
             self.post_message(
@@ -587,16 +601,6 @@ class CleanInvalidSeed(_PluginBase):
             )
         logger.info("检测无效源文件任务结束")
 
-    def get_size(self, path: Path):
-        total_size = 0
-        if path.is_file():
-            return path.stat().st_size
-        # rglob 方法用于递归遍历所有文件和目录
-        for entry in path.rglob("*"):
-            if entry.is_file():
-                total_size += entry.stat().st_size
-        return total_size
-
     def get_form(self) -> Tuple[List[dict], Dict[str, Any]]:
         return [
             {
@@ -0,0 +1,68 @@
+import os
+import re
+from typing import Iterable
+
+
+class ContentPathIndex:
+    """
+    做种内容路径前缀树，按路径层级逐级匹配，查询耗时只与路径深度有关
+    """
+
+    def __init__(self, paths: Iterable[str] = None):
+        self._root = {}
+        for path in paths or []:
+            self.add(path)
+
+    @staticmethod
+    def __split(path: str) -> list:
+        # 兼容下载器运行在Windows上的路径
+        return [part for part in re.split(r"[\\/]+", path or "") if part]
+
+    def add(self, path: str):
+        """
+        加入做种内容路径
+        """
+        node = self._root
+        for part in self.__split(path):
+            node = node.setdefault(part, {})
+
+    def contains(self, path: str) -> bool:
+        """
+        path 是否为某个做种内容路径或其上级目录
+        """
+        parts = self.__split(path)
+        if not parts:
+            return False
+        node = self._root
+        for part in parts:
+            node = node.get(part)
+            if node is None:
+                return False
+        return True
+
+
+def get_dir_size(path: str) -> int:
+    """
+    计算文件或目录占用的空间
+    """
+    try:
+        if not os.path.isdir(path):
+            return os.stat(path).st_size
+    except OSError:
+        return 0
+    total_size = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            total_size += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return total_size
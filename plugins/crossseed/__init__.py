@@ -1,9 +1,10 @@
-import hashlib
 import os
 import re
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
+from queue import Queue, Empty
 from threading import Event
 from typing import Any, Dict, List, Optional, Tuple, Union
 
@@ -11,7 +12,6 @@ import pytz
 import requests
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
-from bencode import bdecode, bencode
 
 from app.core.config import settings
 from app.core.event import eventmanager
@@ -22,6 +22,8 @@ from app.log import logger
 from app.modules.qbittorrent import Qbittorrent
 from app.modules.transmission import Transmission
 from app.plugins import _PluginBase
+from app.plugins.crossseed.cachestore import SeedCacheStore
+from app.plugins.crossseed.pieceindex import TorrentPiecesIndex, parse_torrent_data
 from app.schemas import NotificationType
 from app.schemas.types import EventType
 from app.utils.string import StringUtils
@@ -97,15 +99,10 @@ class TorInfo:
     @staticmethod
     def from_data(data: bytes) -> Tuple[Optional[Any], Optional[str]]:
         try:
-            torrent = bdecode(data)
-            info = torrent["info"]
-            pieces = info["pieces"]
-            info_hash = hashlib.sha1(bencode(info)).hexdigest()
-            pieces_hash = hashlib.sha1(pieces).hexdigest()
-            local_tor = TorInfo(info_hash=info_hash, pieces_hash=pieces_hash)
+            indexed = parse_torrent_data(data)
+            local_tor = TorInfo(info_hash=indexed.info_hash, pieces_hash=indexed.pieces_hash)
             # 从种子中获取 announce, qb可能存在获取不到的情况，会存在于fastresume文件中
-            if "announce" in torrent:
-                local_tor.torrent_announce = torrent["announce"]
+            local_tor.torrent_announce = indexed.announce
             return local_tor, None
         except Exception as err:
             return None, str(err)
@@ -139,10 +136,12 @@ class CrossSeedHelper(object):
     @staticmethod
     def get_target_torrent(
             site: CSSiteConfig,
-            pieces_hash_set: List[str]
+            pieces_hash_set: List[str],
+            session: Optional[requests.Session] = None
     ) -> Tuple[Optional[List[TorInfo]], Optional[str]]:
         """
         返回pieces_hash对应的种子信息，包括站点id,pieces_hash,种子id
+        查询间隔由调用方控制
         """
         headers = {
             "Content-Type": "application/json",
@@ -152,7 +151,7 @@ class CrossSeedHelper(object):
         data = {"passkey": site.passkey, "pieces_hash": pieces_hash_set}
         remote_torrent_infos = []
         try:
-            response = requests.post(
+            response = (session or requests).post(
                 site.get_api_url(),
                 headers=headers,
                 json=data,
@@ -166,7 +165,6 @@ class CrossSeedHelper(object):
                     remote_torrent_infos.append(
                         TorInfo.remote(site.name, pieces_hash, torrent_id)
                     )
-            time.sleep(site.query_gap)
         except requests.exceptions.RequestException as e:
             return None, f"站点{site.name}请求失败：{e}"
         return remote_torrent_infos, None
@@ -180,7 +178,7 @@ class CrossSeed(_PluginBase):
     # 插件图标
     plugin_icon = "qingwa.png"
     # 插件版本
-    plugin_version = "2.4"
+    plugin_version = "2.7.2"
     # 插件作者
     plugin_author = "233@qingwa"
     # 作者主页
@@ -218,14 +216,16 @@ class CrossSeed(_PluginBase):
     # 待校全种子hash清单
     _recheck_torrents = {}
     _is_recheck_running = False
-    # 辅种缓存，出错的种子不再重复辅种，可清除
-    _error_caches = []
-    # 辅种缓存，辅种成功的种子，可清除
-    _success_caches = []
-    # 辅种缓存，出错的种子不再重复辅种，且无法清除。种子被删除404等情况
-    _permanent_error_caches = []
+    # 辅种缓存，包括辅种成功、出错（过期后重试）以及永久出错（种子被删除404等情况）的种子，可清除
+    _caches: Optional[SeedCacheStore] = None
+    # 出错缓存有效期（秒）
+    _error_cache_ttl = 7 * 24 * 3600
     _torrentpaths = []
     _site_cs_infos = []
+    # 同时查询的站点数
+    _query_workers = 5
+    # 本地种子文件索引
+    _pieces_index: Optional[TorrentPiecesIndex] = None
     # 辅种计数
     total = 0
     realtotal = 0
@@ -238,6 +238,8 @@ class CrossSeed(_PluginBase):
         self.sites = SitesHelper()
         self.siteoper = SiteOper()
         self.torrent = TorrentHelper()
+        self._caches = SeedCacheStore(db_path=self.get_data_path() / "caches.db", error_ttl=self._error_cache_ttl)
+        self._pieces_index = TorrentPiecesIndex(db_path=self.get_data_path() / "pieces.db")
         # 读取配置
         if config:
             self._enabled = config.get("enabled")
@@ -253,9 +255,13 @@ class CrossSeed(_PluginBase):
             self._nolabels = config.get("nolabels")
             self._nopaths = config.get("nopaths")
             self._clearcache = config.get("clearcache")
-            self._permanent_error_caches = [] if self._clearcache else config.get("permanent_error_caches") or []
-            self._error_caches = [] if self._clearcache else config.get("error_caches") or []
-            self._success_caches = [] if self._clearcache else config.get("success_caches") or []
+            if self._clearcache:
+                self._caches.clear()
+            elif self._caches.is_empty():
+                # 仅首次迁移保存在配置中的旧缓存，保存配置后旧缓存从配置中移除
+                self._caches.add_many(SeedCacheStore.SUCCESS, config.get("success_caches"))
+                self._caches.add_many(SeedCacheStore.ERROR, config.get("error_caches"))
+                self._caches.add_many(SeedCacheStore.PERMANENT, config.get("permanent_error_caches"))
 
             # 过滤掉已删除的站点
             inner_site_list = self.siteoper.list_order_by_pri()
@@ -721,7 +727,82 @@ class CrossSeed(_PluginBase):
         }
 
     def get_page(self) -> List[dict]:
-        pass
+        """
+        拼装插件详情页面，展示辅种缓存数量
+        """
+        sizes = self._caches.sizes() if self._caches else {}
+        cache_names = {
+            SeedCacheStore.SUCCESS: "辅种成功",
+            SeedCacheStore.ERROR: f"辅种出错（{self._error_cache_ttl // 86400}天后重试）",
+            SeedCacheStore.PERMANENT: "辅种出错（不再重试）"
+        }
+        cache_rows = [
+            {
+                'component': 'tr',
+                'props': {
+                    'class': 'text-sm'
+                },
+                'content': [
+                    {
+                        'component': 'td',
+                        'props': {
+                            'class': 'whitespace-nowrap break-keep text-high-emphasis'
+                        },
+                        'text': name
+                    },
+                    {
+                        'component': 'td',
+                        'text': sizes.get(kind) or 0
+                    }
+                ]
+            } for kind, name in cache_names.items()
+        ]
+        return [
+            {
+                'component': 'VRow',
+                'content': [
+                    {
+                        'component': 'VCol',
+                        'props': {
+                            'cols': 12,
+                        },
+                        'content': [
+                            {
+                                'component': 'VTable',
+                                'props': {
+                                    'hover': True
+                                },
+                                'content': [
+                                    {
+                                        'component': 'thead',
+                                        'content': [
+                                            {
+                                                'component': 'th',
+                                                'props': {
+                                                    'class': 'text-start ps-4'
+                                                },
+                                                'text': '缓存类型'
+                                            },
+                                            {
+                                                'component': 'th',
+                                                'props': {
+                                                    'class': 'text-start ps-4'
+                                                },
+                                                'text': '种子数'
+                                            },
+                                        ]
+                                    },
+                                    {
+                                        'component': 'tbody',
+                                        'content': cache_rows
+                                    }
+                                ]
+                            }
+                        ]
+                    }
+                ]
+            }
+        ]
 
     def __update_config(self):
         self.update_config({
@@ -735,10 +816,7 @@ class CrossSeed(_PluginBase):
             "sites": self._sites,
             "notify": self._notify,
             "nolabels": self._nolabels,
-            "nopaths": self._nopaths,
-            "success_caches": self._success_caches,
-            "error_caches": self._error_caches,
-            "permanent_error_caches": self._permanent_error_caches
+            "nopaths": self._nopaths
         })
 
     def __get_downloader(self, dtype: str):
@@ -776,6 +854,11 @@ class CrossSeed(_PluginBase):
             else:
                 logger.info(f"下载器 {downloader} 没有已完成种子")
                 continue
+            # 批量读取种子文件信息，只解析新增或变化的种子文件
+            torrent_paths = [Path(self._torrentpaths[idx]) / f"{self.__get_hash(torrent, downloader)}.torrent"
+                             for torrent in torrents]
+            local_torrent_infos = self._pieces_index.lookup(torrent_paths)
+            self._pieces_index.retain(self._torrentpaths[idx], torrent_paths)
             hash_strs = []
             for torrent in torrents:
                 if self._event.is_set():
@@ -783,14 +866,15 @@ class CrossSeed(_PluginBase):
                     return
                     # 获取种子hash
                 hash_str = self.__get_hash(torrent, downloader)
-                if hash_str in self._error_caches or hash_str in self._permanent_error_caches:
+                if self._caches.contains(hash_str, SeedCacheStore.ERROR, SeedCacheStore.PERMANENT):
                     logger.info(f"种子 {hash_str} 辅种失败且已缓存，跳过 ...")
                     continue
                 save_path = self.__get_save_path(torrent, downloader)
                 # 获取种子文件路径
                 torrent_path = Path(self._torrentpaths[idx]) / f"{hash_str}.torrent"
                 torrent_info = None
-                if not torrent_path.exists():
+                local_torrent_info = local_torrent_infos.get(str(torrent_path))
+                if not local_torrent_info:
                     if False and downloader == "qbittorrent":
                         # qb开启SQLite功能后将不再以hash命名的方式保存torrent文件
                         # TODO 导出功能需要qb4.5.0以上版本才支持
@@ -809,10 +893,14 @@ class CrossSeed(_PluginBase):
 
                 # 读取种子文件具体信息
                 if not torrent_info:
-                    torrent_info, err = self.cross_helper.get_local_torrent_info(torrent_path)
-                    if not torrent_info:
+                    indexed, err = local_torrent_info
+                    if not indexed:
                         logger.error(f"未能读取到种子文件具体信息：{torrent_path} {err}")
                         continue
+                    torrent_info = TorInfo.local(torrent_path=str(torrent_path),
+                                                 info_hash=indexed.info_hash,
+                                                 pieces_hash=indexed.pieces_hash)
+                    torrent_info.torrent_announce = indexed.announce
 
                 # 用站点+pieces_hash记录该站点是否已经在该下载器中,需要从tracker补充站点名字
                 tracker_urls = set()
@@ -954,73 +1042,116 @@ class CrossSeed(_PluginBase):
         logger.info(f"去重后，总共需要辅种查询的种子数：{len(pieces_hash_set)}")
         pieces_hashes = list(pieces_hash_set)
 
-        # 分站点逐个批次辅种
-        # 逐个站点查询可辅种数据
-        chunk_size = 100
+        # 多个站点并发查询可辅种数据，查询结果逐批进入辅种
+        query_sites = []
         for site_config in self._site_cs_infos:
             # 检查站点是否已经停用
             db_site = self.siteoper.get(site_config.id)
             if db_site and not db_site.is_active:
                 logger.info(f"站点{site_config.name}已停用，跳过辅种")
                 continue
-            remote_tors: List[TorInfo] = []
-            total_size = len(pieces_hashes)
-            for i in range(0, len(pieces_hashes), chunk_size):
-                if self._event.is_set():
-                    logger.info(f"辅种服务停止")
-                    return
-                # 切片操作
-                chunk = pieces_hashes[i:i + chunk_size]
-                # 处理分组
-                chunk_tors, err_msg = self.cross_helper.get_target_torrent(site_config, chunk)
-                if not chunk_tors and err_msg:
-                    logger.info(
-                        f"查询站点{site_config.name}可辅种的信息出错 {err_msg},进度={i + 1}/{total_size}"
-                    )
-                else:
-                    logger.info(
-                        f"站点{site_config.name}本批次的可辅种/查询数={len(chunk_tors)}/{len(chunk)},进度={i + 1}/{total_size}"
-                    )
-                    remote_tors = remote_tors + chunk_tors
-
-            logger.info(f"站点{site_config.name}返回可以辅种的种子总数为{len(remote_tors)}")
-
-            # 去除已经下载过的种子
-            local_cnt = 0
-            not_local_tors = []
-            for tor_info in remote_tors:
-                if (
-                        tor_info
-                        and tor_info.site_name
-                        and tor_info.pieces_hash
-                        and tor_info.get_name_pieces_tag() in site_pieces_hash_set
-                ):
-                    local_cnt = local_cnt + 1
-                else:
-                    not_local_tors.append(tor_info)
-            logger.info(f"站点{site_config.name}正在做种或已经辅种过的种子数为{local_cnt}")
+            query_sites.append(site_config)
+        if not query_sites:
+            return
 
-            for tor_info in not_local_tors:
+        results: Queue = Queue()
+        with ThreadPoolExecutor(max_workers=min(len(query_sites), self._query_workers)) as executor:
+            futures = [executor.submit(self.__query_site_torrents, site_config, pieces_hashes, results)
+                       for site_config in query_sites]
+            while True:
                 if self._event.is_set():
                     logger.info(f"辅种服务停止")
                     return
-                if not tor_info:
-                    continue
-                if not tor_info.torrent_id or not tor_info.pieces_hash:
-                    continue
-                if tor_info.get_name_id_tag() in self._success_caches:
-                    logger.info(f"{tor_info.get_name_id_tag()} 已处理过辅种，跳过 ...")
-                    continue
-                if tor_info.get_name_id_tag() in self._error_caches or tor_info.get_name_id_tag() in self._permanent_error_caches:
-                    logger.info(f"种子 {tor_info.get_name_id_tag()} 辅种失败且已缓存，跳过 ...")
+                try:
+                    site_config, remote_tors = results.get(timeout=1)
+                except Empty:
+                    if all(future.done() for future in futures) and results.empty():
+                        break
                     continue
-                # 添加任务
-                self.__download_torrent(tor=tor_info, site_config=site_config,
-                                        downloader=downloader,
-                                        save_path=save_paths.get(tor_info.pieces_hash))
+                self.__seed_site_torrents(site_config=site_config,
+                                          remote_tors=remote_tors,
+                                          site_pieces_hash_set=site_pieces_hash_set,
+                                          save_paths=save_paths,
+                                          downloader=downloader)
 
         logger.info(f"下载器 {downloader} 辅种完成")
 
+    def __query_site_torrents(self, site_config: CSSiteConfig, pieces_hashes: List[str], results: Queue):
+        """
+        分批查询站点可辅种数据，每批查询结果放入结果队列，同一站点的查询间隔不小于站点配置的间隔时间
+        """
+        chunk_size = 100
+        total_size = len(pieces_hashes)
+        remote_count = 0
+        last_query_time = None
+        try:
+            with requests.Session() as session:
+                for i in range(0, total_size, chunk_size):
+                    if self._event.is_set():
+                        return
+                    # 站点流控
+                    if last_query_time:
+                        wait_time = site_config.query_gap - (time.time() - last_query_time)
+                        if wait_time > 0 and self._event.wait(wait_time):
+                            return
+                    # 切片操作
+                    chunk = pieces_hashes[i:i + chunk_size]
+                    last_query_time = time.time()
+                    chunk_tors, err_msg = self.cross_helper.get_target_torrent(site_config, chunk, session=session)
+                    if not chunk_tors and err_msg:
+                        logger.info(
+                            f"查询站点{site_config.name}可辅种的信息出错 {err_msg},进度={i + 1}/{total_size}"
+                        )
+                    else:
+                        logger.info(
+                            f"站点{site_config.name}本批次的可辅种/查询数={len(chunk_tors)}/{len(chunk)},进度={i + 1}/{total_size}"
+                        )
+                        if chunk_tors:
+                            remote_count += len(chunk_tors)
+                            results.put((site_config, chunk_tors))
+        except Exception as err:
+            logger.error(f"查询站点{site_config.name}可辅种的信息出错 {str(err)}")
+        logger.info(f"站点{site_config.name}返回可以辅种的种子总数为{remote_count}")
+
+    def __seed_site_torrents(self, site_config: CSSiteConfig, remote_tors: List[TorInfo],
+                             site_pieces_hash_set: set, save_paths: dict, downloader: str):
+        """
+        对站点返回的一批可辅种数据执行辅种
+        """
+        # 去除已经下载过的种子
+        local_cnt = 0
+        not_local_tors = []
+        for tor_info in remote_tors:
+            if (
+                    tor_info
+                    and tor_info.site_name
+                    and tor_info.pieces_hash
+                    and tor_info.get_name_pieces_tag() in site_pieces_hash_set
+            ):
+                local_cnt = local_cnt + 1
+            else:
+                not_local_tors.append(tor_info)
+        logger.info(f"站点{site_config.name}本批次正在做种或已经辅种过的种子数为{local_cnt}")
+
+        for tor_info in not_local_tors:
+            if self._event.is_set():
+                logger.info(f"辅种服务停止")
+                return
+            if not tor_info:
+                continue
+            if not tor_info.torrent_id or not tor_info.pieces_hash:
+                continue
+            if self._caches.contains(tor_info.get_name_id_tag(), SeedCacheStore.SUCCESS):
+                logger.info(f"{tor_info.get_name_id_tag()} 已处理过辅种，跳过 ...")
+                continue
+            if self._caches.contains(tor_info.get_name_id_tag(), SeedCacheStore.ERROR, SeedCacheStore.PERMANENT):
+                logger.info(f"种子 {tor_info.get_name_id_tag()} 辅种失败且已缓存，跳过 ...")
+                continue
+            # 添加任务
+            self.__download_torrent(tor=tor_info, site_config=site_config,
+                                    downloader=downloader,
+                                    save_path=save_paths.get(tor_info.pieces_hash))
+
     def __download(self, downloader: str, content: Union[bytes, str],
                    save_path: str) -> Optional[str]:
         """
@@ -1087,10 +1218,10 @@ class CrossSeed(_PluginBase):
             self.cached += 1
             # 加入失败缓存
             if error_msg and ('无法打开链接' in error_msg or '触发站点流控' in error_msg):
-                self._error_caches.append(tor.get_name_id_tag())
+                self._caches.add(SeedCacheStore.ERROR, tor.get_name_id_tag())
             else:
                 # 种子不存在的情况
-                self._permanent_error_caches.append(tor.get_name_id_tag())
+                self._caches.add(SeedCacheStore.PERMANENT, tor.get_name_id_tag())
             logger.error(f"下载种子文件失败：{tor.get_name_id_tag()}")
             return False
 
@@ -1100,7 +1231,7 @@ class CrossSeed(_PluginBase):
             tors, msg = self.__get_downloader(downloader).get_torrents(ids=[tmp_tor_info.info_hash])
             if tors:
                 self.exist += 1
-                self._success_caches.append(tor.get_name_id_tag())
+                self._caches.add(SeedCacheStore.SUCCESS, tor.get_name_id_tag())
                 logger.info(f"下载的种子{tor.get_name_id_tag()}已存在, 跳过")
                 return True
         else:
@@ -1116,7 +1247,7 @@ class CrossSeed(_PluginBase):
             self.fail += 1
             self.cached += 1
             # 加入失败缓存
-            self._error_caches.append(tor.get_name_id_tag())
+            self._caches.add(SeedCacheStore.ERROR, tor.get_name_id_tag())
             return False
         else:
             self.success += 1
@@ -1132,7 +1263,7 @@ class CrossSeed(_PluginBase):
                 # 开始校验种子
                 self.__get_downloader(downloader).recheck_torrents(ids=[download_id])
             # 成功也加入缓存，有一些改了路径校验不通过的，手动删除后，下一次又会辅上
-            self._success_caches.append(tor.get_name_id_tag())
+            self._caches.add(SeedCacheStore.SUCCESS, tor.get_name_id_tag())
             return True
 
     @staticmethod
@@ -0,0 +1,165 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from bencode import bdecode, bencode
+
+from app.log import logger
+
+
+class IndexedTorrent(NamedTuple):
+    """
+    种子文件中辅种需要的信息
+    """
+    info_hash: str
+    pieces_hash: str
+    announce: Optional[str]
+
+
+def parse_torrent_data(data: bytes) -> IndexedTorrent:
+    """
+    解析种子内容，计算info_hash及pieces_hash
+    """
+    torrent = bdecode(data)
+    info = torrent["info"]
+    announce = torrent.get("announce")
+    if isinstance(announce, bytes):
+        announce = announce.decode("utf-8", errors="ignore")
+    return IndexedTorrent(info_hash=hashlib.sha1(bencode(info)).hexdigest(),
+                          pieces_hash=hashlib.sha1(info["pieces"]).hexdigest(),
+                          announce=announce)
+
+
+def _parse_torrent_file(path: str) -> Tuple[str, Optional[IndexedTorrent], Optional[str]]:
+    """
+    读取并解析种子文件
+    """
+    try:
+        with open(path, "rb") as f:
+            return path, parse_torrent_data(f.read()), None
+    except Exception as err:
+        return path, None, str(err)
+
+
+class TorrentPiecesIndex:
+    """
+    本地种子文件索引，按文件修改时间及大小判断是否变化，只解析新增或变化的种子文件
+    """
+
+    # 待解析的种子文件数达到该数量时使用线程池解析
+    _parallel_threshold = 64
+    # 每次查询的种子文件路径数，不超过SQLite参数数量限制
+    _query_batch = 500
+
+    def __init__(self, db_path: Path, workers: Optional[int] = None):
+        self._db_path = str(db_path)
+        self._workers = workers or min(os.cpu_count() or 1, 8)
+        self._lock = threading.Lock()
+        self.__init_db()
+
+    @contextmanager
+    def __connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def __init_db(self):
+        with self.__connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS torrents (
+                    path TEXT PRIMARY KEY,
+                    info_hash TEXT NOT NULL,
+                    pieces_hash TEXT NOT NULL,
+                    announce TEXT,
+                    mtime REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )
+            """)
+
+    def __parse_files(self, paths: List[str]) -> List[Tuple[str, Optional[IndexedTorrent], Optional[str]]]:
+        # 不使用多进程，在多线程的主程序中fork子进程可能因继承已持有的锁而死锁
+        if len(paths) >= self._parallel_threshold and self._workers > 1:
+            with ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="crossseed-index") as executor:
+                return list(executor.map(_parse_torrent_file, paths))
+        return [_parse_torrent_file(path) for path in paths]
+
+    def __query(self, conn: sqlite3.Connection, paths: List[str]) -> Dict[str, Tuple[IndexedTorrent, tuple]]:
+        """
+        查询指定种子文件的索引
+        :return: 种子文件路径 -> (种子信息, (修改时间, 大小))
+        """
+        cached = {}
+        for i in range(0, len(paths), self._query_batch):
+            batch = paths[i:i + self._query_batch]
+            rows = conn.execute("SELECT path, info_hash, pieces_hash, announce, mtime, size FROM torrents "
+                                f"WHERE path IN ({','.join('?' * len(batch))})", batch)
+            for path, info_hash, pieces_hash, announce, mtime, size in rows:
+                cached[path] = (IndexedTorrent(info_hash, pieces_hash, announce), (mtime, size))
+        return cached
+
+    def lookup(self, paths: Iterable[Path]) -> Dict[str, Tuple[Optional[IndexedTorrent], Optional[str]]]:
+        """
+        获取种子文件信息，不存在的种子文件不返回
+        :return: 种子文件路径 -> (种子信息, 错误信息)
+        """
+        stats = {}
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            stats[str(path)] = (stat.st_mtime, stat.st_size)
+        if not stats:
+            return {}
+
+        with self._lock:
+            with self.__connect() as conn:
+                cached = self.__query(conn, list(stats))
+
+            results: Dict[str, Tuple[Optional[IndexedTorrent], Optional[str]]] = {}
+            misses = []
+            for path, stat in stats.items():
+                indexed = cached.get(path)
+                if indexed and indexed[1] == stat:
+                    results[path] = (indexed[0], None)
+                else:
+                    misses.append(path)
+
+            if misses:
+                start = time.time()
+                rows = []
+                for path, indexed, err in self.__parse_files(misses):
+                    results[path] = (indexed, err)
+                    if indexed:
+                        mtime, size = stats[path]
+                        rows.append((path, indexed.info_hash, indexed.pieces_hash, indexed.announce, mtime, size))
+                with self.__connect() as conn:
+                    conn.executemany("INSERT OR REPLACE INTO torrents "
+                                     "(path, info_hash, pieces_hash, announce, mtime, size) "
+                                     "VALUES (?, ?, ?, ?, ?, ?)", rows)
+                logger.info(f"解析种子文件 {len(misses)} 个，耗时 {time.time() - start:.2f} 秒，"
+                            f"索引命中 {len(stats) - len(misses)} 个")
+            return results
+
+    def retain(self, directory: str, paths: Iterable[Path]):
+        """
+        清理目录下不在本次扫描范围内的种子文件索引
+        """
+        keep = {str(path) for path in paths}
+        prefix = str(Path(directory)) + os.sep
+        with self._lock:
+            with self.__connect() as conn:
+                stale = [(path,) for (path,) in conn.execute("SELECT path FROM torrents WHERE substr(path, 1, ?) = ?",
+                                                             (len(prefix), prefix))
+                         if path not in keep]
+                if stale:
+                    conn.executemany("DELETE FROM torrents WHERE path = ?", stale)
@@ -4,11 +4,13 @@ import shutil
 import threading
 import traceback
 from pathlib import Path
-from typing import List, Tuple, Dict, Any, Optional
+from typing import List, Tuple, Dict, Any, Optional, Set
 
 import pytz
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
 from watchdog.events import FileSystemEventHandler
 from watchdog.observers import Observer
 from watchdog.observers.polling import PollingObserver
@@ -21,17 +23,19 @@ from app.core.config import settings
 from app.core.context import MediaInfo
 from app.core.event import eventmanager, Event
 from app.core.metainfo import MetaInfoPath
+from app.db import db_query
 from app.db.downloadhistory_oper import DownloadHistoryOper
+from app.db.models.transferhistory import TransferHistory
 from app.db.transferhistory_oper import TransferHistoryOper
 from app.log import logger
 from app.plugins import _PluginBase
+from app.plugins.dirmonitor.eventqueue import DebouncedEventQueue, KeyedLock
+from app.plugins.dirmonitor.filters import PathFilter
 from app.schemas import NotificationType, TransferInfo
 from app.schemas.types import EventType, MediaType, SystemConfigKey
 from app.utils.string import StringUtils
 from app.utils.system import SystemUtils
 
-lock = threading.Lock()
-
 
 class FileMonitorHandler(FileSystemEventHandler):
     """
@@ -60,7 +64,7 @@ class DirMonitor(_PluginBase):
     # 插件图标
     plugin_icon = "directory.png"
     # 插件版本
-    plugin_version = "2.4"
+    plugin_version = "2.6.2"
     # 插件作者
     plugin_author = "jxxghp"
     # 作者主页
@@ -100,6 +104,19 @@ class DirMonitor(_PluginBase):
     _medias = {}
     # 退出事件
     _event = threading.Event()
+    # 文件事件队列
+    _queue: Optional[DebouncedEventQueue] = None
+    # 同时处理的文件数
+    _workers = 3
+    # 文件最后一次变化后等待的秒数
+    _debounce = 5
+    # 同一源文件、同一媒体（标题年份+季）的处理串行
+    _path_locks = KeyedLock()
+    _title_locks = KeyedLock()
+    # 文件过滤规则，过滤关键字或整理屏蔽词变化时重新编译
+    _filter: Optional[PathFilter] = None
+    # 全量同步时已整理过的源文件路径
+    _processed_paths: Optional[Set[str]] = None
 
     def init_plugin(self, config: dict = None):
         self.transferhis = TransferHistoryOper()
@@ -133,6 +150,11 @@ class DirMonitor(_PluginBase):
             self._scheduler = BackgroundScheduler(timezone=settings.TZ)
             # 追加入库消息统一发送服务
             self._scheduler.add_job(self.send_msg, trigger='interval', seconds=15)
+            # 文件事件合并后并发处理
+            if self._enabled:
+                self._queue = DebouncedEventQueue(handler=lambda path, mon_path: self.__handle_file(
+                    event_path=path, mon_path=mon_path), workers=self._workers, debounce=self._debounce)
+                self._queue.start()
 
             # 读取目录配置
             monitor_dirs = self._monitor_dirs.split("\n")
@@ -267,13 +289,61 @@ class DirMonitor(_PluginBase):
         立即运行一次，全量同步目录中所有文件
         """
         logger.info("开始全量同步监控目录 ...")
-        # 遍历所有监控目录
-        for mon_path in self._dirconf.keys():
-            # 遍历目录下所有文件
-            for file_path in SystemUtils.list_files(Path(mon_path), settings.RMT_MEDIAEXT):
-                self.__handle_file(event_path=str(file_path), mon_path=mon_path)
+        # 一次性加载已整理过的源文件，已整理过的文件不再逐个查询数据库
+        self._processed_paths = self.get_processed_paths(mon_paths=list(self._dirconf.keys()))
+        try:
+            # 遍历所有监控目录
+            for mon_path in self._dirconf.keys():
+                # 遍历目录下所有文件
+                for file_path in SystemUtils.list_files(Path(mon_path), settings.RMT_MEDIAEXT):
+                    self.__handle_file(event_path=str(file_path), mon_path=mon_path)
+        finally:
+            self._processed_paths = None
         logger.info("全量同步监控目录完成！")
 
+    @db_query
+    def get_processed_paths(self, mon_paths: List[str], db: Session = None) -> Optional[Set[str]]:
+        """
+        获取监控目录下已整理过的源文件路径，查询失败时返回None，逐个查询数据库
+        """
+        if not mon_paths:
+            return set()
+        try:
+            result = (
+                db.query(TransferHistory.src)
+                .filter(or_(*[TransferHistory.src.startswith(mon_path) for mon_path in mon_paths]))
+                .all()
+            )
+            return {src for (src,) in result if src}
+        except Exception as e:
+            logger.error(f"获取已整理文件失败：{str(e)}")
+            return None
+
+    def __is_processed(self, path: str) -> bool:
+        """
+        源文件是否已整理过，全量同步时使用预先加载的路径集合
+        """
+        processed_paths = self._processed_paths
+        if processed_paths is not None:
+            return path in processed_paths
+        return True if self.transferhis.get_by_src(path) else False
+
+    def __get_filter(self) -> PathFilter:
+        """
+        获取文件过滤规则，配置未变化时复用已编译的规则
+        """
+        transfer_exclude_words = tuple(word for word in
+                                       self.systemconfig.get(SystemConfigKey.TransferExcludeWords) or [] if word)
+        path_filter = self._filter
+        if not path_filter \
+                or path_filter.exclude_keywords != self._exclude_keywords \
+                or path_filter.transfer_exclude_words != transfer_exclude_words:
+            path_filter = PathFilter(exclude_keywords=self._exclude_keywords,
+                                     transfer_exclude_words=transfer_exclude_words,
+                                     media_exts=settings.RMT_MEDIAEXT)
+            self._filter = path_filter
+        return path_filter
+
     def event_handler(self, event, mon_path: str, text: str, event_path: str):
         """
         处理文件变化
@@ -285,52 +355,59 @@ class DirMonitor(_PluginBase):
         if not event.is_directory:
             # 文件发生变化
             logger.debug("文件%s：%s" % (text, event_path))
-            self.__handle_file(event_path=event_path, mon_path=mon_path)
+            if self._queue:
+                self._queue.submit(path=event_path, mon_path=mon_path)
+            else:
+                self.__handle_file(event_path=event_path, mon_path=mon_path)
 
-    def __handle_file(self, event_path: str, mon_path: str):
+    @staticmethod
+    def __source_key(event_path: str) -> str:
+        """
+        源文件加锁的键，蓝光原盘中的文件按原盘目录加锁
+        """
+        match = re.search(r"BDMV[/\\]STREAM", event_path, re.IGNORECASE)
+        if match:
+            return event_path[:event_path.find("BDMV")]
+        return event_path
+
+    def __handle_file(self, event_path: str, mon_path: str) -> Optional[bool]:
         """
         同步一个文件
         :param event_path: 事件文件路径
         :param mon_path: 监控目录
+        :return: 整理失败时返回False，整理成功时返回True，不需要处理时返回None
         """
         file_path = Path(event_path)
         try:
             if not file_path.exists():
                 return
-            # 全程加锁
-            with lock:
-                transfer_history = self.transferhis.get_by_src(event_path)
-                if transfer_history:
+            # 同一源文件（蓝光原盘按原盘目录）加锁，不同文件并发处理
+            with self._path_locks.lock(self.__source_key(event_path)):
+                if self.__is_processed(event_path):
                     logger.debug("文件已处理过：%s" % event_path)
                     return
 
+                path_filter = self.__get_filter()
+
                 # 回收站及隐藏的文件不处理
-                if event_path.find('/@Recycle/') != -1 \
-                        or event_path.find('/#recycle/') != -1 \
-                        or event_path.find('/.') != -1 \
-                        or event_path.find('/@eaDir') != -1:
+                if path_filter.is_ignored(event_path):
                     logger.debug(f"{event_path} 是回收站或隐藏的文件")
                     return
 
                 # 命中过滤关键字不处理
-                if self._exclude_keywords:
-                    for keyword in self._exclude_keywords.split("\n"):
-                        if keyword and re.findall(keyword, event_path):
-                            logger.info(f"{event_path} 命中过滤关键字 {keyword}，不处理")
-                            return
+                keyword = path_filter.match_exclude_keyword(event_path)
+                if keyword:
+                    logger.info(f"{event_path} 命中过滤关键字 {keyword}，不处理")
+                    return
 
                 # 整理屏蔽词不处理
-                transfer_exclude_words = self.systemconfig.get(SystemConfigKey.TransferExcludeWords)
-                if transfer_exclude_words:
-                    for keyword in transfer_exclude_words:
-                        if not keyword:
-                            continue
-                        if keyword and re.search(r"%s" % keyword, event_path, re.IGNORECASE):
-                            logger.info(f"{event_path} 命中整理屏蔽词 {keyword}，不处理")
-                            return
+                keyword = path_filter.match_transfer_exclude_word(event_path)
+                if keyword:
+                    logger.info(f"{event_path} 命中整理屏蔽词 {keyword}，不处理")
+                    return
 
                 # 不是媒体文件不处理
-                if file_path.suffix.casefold() not in map(str.casefold, settings.RMT_MEDIAEXT):
+                if not path_filter.is_media(file_path.suffix):
                     logger.debug(f"{event_path} 不是媒体文件")
                     return
 
@@ -343,16 +420,19 @@ class DirMonitor(_PluginBase):
                     file_path = Path(blurray_dir)
                     logger.info(f"{event_path} 是蓝光目录，更正文件路径为：{str(file_path)}")
 
-                # 查询历史记录，已转移的不处理
-                if self.transferhis.get_by_src(str(file_path)):
+                # 查询历史记录，已转移的不处理（非蓝光目录时路径未变，前面已查询过）
+                if bluray_flag and self.__is_processed(str(file_path)):
                     logger.info(f"{file_path} 已整理过")
                     return
+                if self._processed_paths is not None:
+                    # 全量同步中同一原盘的其它文件不再重复处理
+                    self._processed_paths.add(str(file_path))
 
                 # 元数据
                 file_meta = MetaInfoPath(file_path)
                 if not file_meta.name:
                     logger.error(f"{file_path.name} 无法识别有效信息")
-                    return
+                    return False
 
                 # 判断文件大小
                 if self._size and float(self._size) > 0 and file_path.stat().st_size < float(self._size) * 1024 ** 3:
@@ -397,7 +477,7 @@ class DirMonitor(_PluginBase):
                             title=f"{file_path.name} 未识别到媒体信息，无法入库！\n"
                                   f"回复：```\n/redo {his.id} [tmdbid]|[类型]\n``` 手动识别转移。"
                         )
-                    return
+                    return False
 
                 # 如果未开启新增已入库媒体是否跟随TMDB信息变化则根据tmdbid查询之前的title
                 if not settings.SCRAP_FOLLOW_TMDB:
@@ -407,39 +487,54 @@ class DirMonitor(_PluginBase):
                         mediainfo.title = transfer_history.title
                 logger.info(f"{file_path.name} 识别为：{mediainfo.type.value} {mediainfo.title_year}")
 
-                # 更新媒体图片
-                self.chain.obtain_images(mediainfo=mediainfo)
+                # 同一媒体的转移、刮削及消息汇总串行处理
+                with self._title_locks.lock(f"{mediainfo.title_year} {file_meta.season}"):
+                    # 更新媒体图片
+                    self.chain.obtain_images(mediainfo=mediainfo)
 
-                # 获取集数据
-                if mediainfo.type == MediaType.TV:
-                    episodes_info = self.tmdbchain.tmdb_episodes(tmdbid=mediainfo.tmdb_id,
-                                                                 season=file_meta.begin_season or 1)
-                else:
-                    episodes_info = None
-
-                # 获取下载Hash
-                download_hash = None
-                if download_history:
-                    download_hash = download_history.download_hash
-
-                # 转移
-                transferinfo: TransferInfo = self.chain.transfer(mediainfo=mediainfo,
-                                                                 path=file_path,
-                                                                 transfer_type=transfer_type,
-                                                                 target=target,
-                                                                 meta=file_meta,
-                                                                 episodes_info=episodes_info)
-
-                if not transferinfo:
-                    logger.error("文件转移模块运行失败")
-                    return
-
-                if not transferinfo.success:
-                    # 判断是否转移后文件已存在，补充转移成功历史记录
-                    if transferinfo.target_path and transferinfo.target_path.exists():
-                        logger.info(f"{file_path.name} 目标文件已存在，补充转移成功历史记录")
-                        # 补充转移成功历史记录
-                        self.transferhis.add_success(
+                    # 获取集数据
+                    if mediainfo.type == MediaType.TV:
+                        episodes_info = self.tmdbchain.tmdb_episodes(tmdbid=mediainfo.tmdb_id,
+                                                                     season=file_meta.begin_season or 1)
+                    else:
+                        episodes_info = None
+
+                    # 获取下载Hash
+                    download_hash = None
+                    if download_history:
+                        download_hash = download_history.download_hash
+
+                    # 转移
+                    transferinfo: TransferInfo = self.chain.transfer(mediainfo=mediainfo,
+                                                                     path=file_path,
+                                                                     transfer_type=transfer_type,
+                                                                     target=target,
+                                                                     meta=file_meta,
+                                                                     episodes_info=episodes_info)
+
+                    if not transferinfo:
+                        logger.error("文件转移模块运行失败")
+                        return False
+
+                    if not transferinfo.success:
+                        # 判断是否转移后文件已存在，补充转移成功历史记录
+                        if transferinfo.target_path and transferinfo.target_path.exists():
+                            logger.info(f"{file_path.name} 目标文件已存在，补充转移成功历史记录")
+                            # 补充转移成功历史记录
+                            self.transferhis.add_success(
+                                src_path=file_path,
+                                mode=transfer_type,
+                                download_hash=download_hash,
+                                meta=file_meta,
+                                mediainfo=mediainfo,
+                                transferinfo=transferinfo
+                            )
+                            return True
+
+                        # 转移失败
+                        logger.warn(f"{file_path.name} 入库失败：{transferinfo.message}")
+                        # 新增转移失败历史记录
+                        self.transferhis.add_fail(
                             src_path=file_path,
                             mode=transfer_type,
                             download_hash=download_hash,
@@ -447,12 +542,17 @@ class DirMonitor(_PluginBase):
                             mediainfo=mediainfo,
                             transferinfo=transferinfo
                         )
-                        return
+                        if self._notify:
+                            self.post_message(
+                                mtype=NotificationType.Manual,
+                                title=f"{mediainfo.title_year}{file_meta.season_episode} 入库失败！",
+                                text=f"原因：{transferinfo.message or '未知'}",
+                                image=mediainfo.get_message_image()
+                            )
+                        return False
 
-                    # 转移失败
-                    logger.warn(f"{file_path.name} 入库失败：{transferinfo.message}")
-                    # 新增转移失败历史记录
-                    self.transferhis.add_fail(
+                    # 新增转移成功历史记录
+                    self.transferhis.add_success(
                         src_path=file_path,
                         mode=transfer_type,
                         download_hash=download_hash,
@@ -460,110 +560,94 @@ class DirMonitor(_PluginBase):
                         mediainfo=mediainfo,
                         transferinfo=transferinfo
                     )
-                    if self._notify:
-                        self.post_message(
-                            mtype=NotificationType.Manual,
-                            title=f"{mediainfo.title_year}{file_meta.season_episode} 入库失败！",
-                            text=f"原因：{transferinfo.message or '未知'}",
-                            image=mediainfo.get_message_image()
-                        )
-                    return
 
-                # 新增转移成功历史记录
-                self.transferhis.add_success(
-                    src_path=file_path,
-                    mode=transfer_type,
-                    download_hash=download_hash,
-                    meta=file_meta,
-                    mediainfo=mediainfo,
-                    transferinfo=transferinfo
-                )
-
-                # 刮削单个文件
-                if self._scrape:
-                    self.chain.scrape_metadata(path=transferinfo.target_path,
-                                               mediainfo=mediainfo,
-                                               transfer_type=transfer_type)
-
-                """
-                {
-                    "title_year season": {
-                        "files": [
-                            {
-                                "path":,
-                                "mediainfo":,
-                                "file_meta":,
-                                "transferinfo":
-                            }
-                        ],
-                        "time": "2023-08-24 23:23:23.332"
+                    # 刮削单个文件
+                    if self._scrape:
+                        self.chain.scrape_metadata(path=transferinfo.target_path,
+                                                   mediainfo=mediainfo,
+                                                   transfer_type=transfer_type)
+
+                    """
+                    {
+                        "title_year season": {
+                            "files": [
+                                {
+                                    "path":,
+                                    "mediainfo":,
+                                    "file_meta":,
+                                    "transferinfo":
+                                }
+                            ],
+                            "time": "2023-08-24 23:23:23.332"
+                        }
                     }
-                }
-                """
-                # 发送消息汇总
-                media_list = self._medias.get(mediainfo.title_year + " " + file_meta.season) or {}
-                if media_list:
-                    media_files = media_list.get("files") or []
-                    if media_files:
-                        file_exists = False
-                        for file in media_files:
-                            if str(file_path) == file.get("path"):
-                                file_exists = True
-                                break
-                        if not file_exists:
-                            media_files.append({
-                                "path": str(file_path),
-                                "mediainfo": mediainfo,
-                                "file_meta": file_meta,
-                                "transferinfo": transferinfo
-                            })
+                    """
+                    # 发送消息汇总
+                    media_list = self._medias.get(mediainfo.title_year + " " + file_meta.season) or {}
+                    if media_list:
+                        media_files = media_list.get("files") or []
+                        if media_files:
+                            file_exists = False
+                            for file in media_files:
+                                if str(file_path) == file.get("path"):
+                                    file_exists = True
+                                    break
+                            if not file_exists:
+                                media_files.append({
+                                    "path": str(file_path),
+                                    "mediainfo": mediainfo,
+                                    "file_meta": file_meta,
+                                    "transferinfo": transferinfo
+                                })
+                        else:
+                            media_files = [
+                                {
+                                    "path": str(file_path),
+                                    "mediainfo": mediainfo,
+                                    "file_meta": file_meta,
+                                    "transferinfo": transferinfo
+                                }
+                            ]
+                        media_list = {
+                            "files": media_files,
+                            "time": datetime.datetime.now()
+                        }
                     else:
-                        media_files = [
-                            {
-                                "path": str(file_path),
-                                "mediainfo": mediainfo,
-                                "file_meta": file_meta,
-                                "transferinfo": transferinfo
-                            }
-                        ]
-                    media_list = {
-                        "files": media_files,
-                        "time": datetime.datetime.now()
-                    }
-                else:
-                    media_list = {
-                        "files": [
-                            {
-                                "path": str(file_path),
-                                "mediainfo": mediainfo,
-                                "file_meta": file_meta,
-                                "transferinfo": transferinfo
-                            }
-                        ],
-                        "time": datetime.datetime.now()
-                    }
-                self._medias[mediainfo.title_year + " " + file_meta.season] = media_list
-
-                # 广播事件
-                self.eventmanager.send_event(EventType.TransferComplete, {
-                    'meta': file_meta,
-                    'mediainfo': mediainfo,
-                    'transferinfo': transferinfo
-                })
-
-                # 移动模式删除空目录
-                if transfer_type == "move":
-                    for file_dir in file_path.parents:
-                        if len(str(file_dir)) <= len(str(Path(mon_path))):
-                            # 重要，删除到监控目录为止
-                            break
-                        files = SystemUtils.list_files(file_dir, settings.RMT_MEDIAEXT + settings.DOWNLOAD_TMPEXT)
-                        if not files:
-                            logger.warn(f"移动模式，删除空目录：{file_dir}")
-                            shutil.rmtree(file_dir, ignore_errors=True)
+                        media_list = {
+                            "files": [
+                                {
+                                    "path": str(file_path),
+                                    "mediainfo": mediainfo,
+                                    "file_meta": file_meta,
+                                    "transferinfo": transferinfo
+                                }
+                            ],
+                            "time": datetime.datetime.now()
+                        }
+                    self._medias[mediainfo.title_year + " " + file_meta.season] = media_list
+
+                    # 广播事件
+                    self.eventmanager.send_event(EventType.TransferComplete, {
+                        'meta': file_meta,
+                        'mediainfo': mediainfo,
+                        'transferinfo': transferinfo
+                    })
+
+                    # 移动模式删除空目录
+                    if transfer_type == "move":
+                        for file_dir in file_path.parents:
+                            if len(str(file_dir)) <= len(str(Path(mon_path))):
+                                # 重要，删除到监控目录为止
+                                break
+                            files = SystemUtils.list_files(file_dir, settings.RMT_MEDIAEXT + settings.DOWNLOAD_TMPEXT)
+                            if not files:
+                                logger.warn(f"移动模式，删除空目录：{file_dir}")
+                                shutil.rmtree(file_dir, ignore_errors=True)
+                    return True
 
         except Exception as e:
             logger.error("目录监控发生错误：%s - %s" % (str(e), traceback.format_exc()))
+            return False
 
     def send_msg(self):
         """
@@ -994,12 +1078,84 @@ class DirMonitor(_PluginBase):
         }
 
     def get_page(self) -> List[dict]:
-        pass
+        """
+        拼装插件详情页面，展示文件事件队列情况
+        """
+        if not self._queue:
+            return [
+                {
+                    'component': 'div',
+                    'text': '目录监控未启用',
+                    'props': {
+                        'class': 'text-center',
+                    }
+                }
+            ]
+        stats = self._queue.stats()
+        items = [
+            ('等待处理', stats.get("pending")),
+            ('正在处理', stats.get("running")),
+            ('已处理', stats.get("processed")),
+            ('处理出错', stats.get("failed")),
+            ('平均入库延迟', f'{stats.get("avg_latency"):.1f} 秒'),
+            ('最大入库延迟', f'{stats.get("max_latency"):.1f} 秒'),
+            ('平均处理耗时', f'{stats.get("avg_cost"):.1f} 秒')
+        ]
+        return [
+            {
+                'component': 'VRow',
+                'content': [
+                    {
+                        'component': 'VCol',
+                        'props': {
+                            'cols': 12,
+                        },
+                        'content': [
+                            {
+                                'component': 'VTable',
+                                'props': {
+                                    'hover': True
+                                },
+                                'content': [
+                                    {
+                                        'component': 'tbody',
+                                        'content': [
+                                            {
+                                                'component': 'tr',
+                                                'props': {
+                                                    'class': 'text-sm'
+                                                },
+                                                'content': [
+                                                    {
+                                                        'component': 'td',
+                                                        'props': {
+                                                            'class': 'whitespace-nowrap break-keep text-high-emphasis'
+                                                        },
+                                                        'text': name
+                                                    },
+                                                    {
+                                                        'component': 'td',
+                                                        'text': value
+                                                    }
+                                                ]
+                                            } for name, value in items
+                                        ]
+                                    }
+                                ]
+                            }
+                        ]
+                    }
+                ]
+            }
+        ]
 
     def stop_service(self):
         """
         退出插件
         """
+        if self._queue:
+            self._queue.stop()
+            self._queue = None
         if self._observer:
             for observer in self._observer:
                 try:
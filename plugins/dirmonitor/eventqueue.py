@@ -0,0 +1,204 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Any
+
+from app.log import logger
+
+
+class KeyedLock:
+    """
+    按键加锁，不同键之间互不阻塞，不再使用的锁自动释放
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 键 -> [锁, 引用计数]
+        self._locks: Dict[str, list] = {}
+
+    @contextmanager
+    def lock(self, key: str):
+        with self._lock:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    self._locks.pop(key, None)
+
+
+@dataclass
+class PendingEvent:
+    """
+    等待处理的文件事件
+    """
+    mon_path: str
+    # 首次收到事件的时间
+    first_time: float
+    # 最近一次收到事件的时间
+    last_time: float
+    # 最近一次检查时的文件大小
+    size: Optional[int] = None
+
+
+class DebouncedEventQueue:
+    """
+    文件事件队列，合并同一文件的重复事件，文件大小稳定后交由线程池并发处理
+    """
+
+    def __init__(self, handler: Callable[[str, str], Any], workers: int = 3,
+                 debounce: float = 5, poll_interval: float = 1):
+        """
+        :param handler: 处理函数，参数为文件路径及监控目录，处理失败时返回False
+        :param workers: 并发处理数
+        :param debounce: 文件最后一次事件后等待的秒数
+        :param poll_interval: 检查待处理事件的间隔秒数
+        """
+        self._handler = handler
+        self._workers = max(int(workers or 1), 1)
+        self._debounce = debounce
+        self._poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._pending: Dict[str, PendingEvent] = {}
+        # 已提交到线程池但尚未处理完成的文件
+        self._running: Dict[str, float] = {}
+        self._stop_event = threading.Event()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._dispatcher: Optional[threading.Thread] = None
+        # 统计信息
+        self._processed = 0
+        self._failed = 0
+        # 最近处理的文件：(从收到事件到处理完成的耗时, 处理耗时)
+        self._latencies = deque(maxlen=200)
+
+    def start(self):
+        if self._dispatcher:
+            return
+        self._stop_event.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="dirmonitor")
+        self._dispatcher = threading.Thread(target=self.__dispatch, name="dirmonitor-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._dispatcher:
+            self._dispatcher.join(timeout=self._poll_interval * 2)
+            self._dispatcher = None
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        with self._lock:
+            self._pending.clear()
+            self._running.clear()
+
+    def submit(self, path: str, mon_path: str):
+        """
+        加入文件事件，同一文件的多次事件合并为一次
+        """
+        now = time.time()
+        with self._lock:
+            pending = self._pending.get(path)
+            if pending:
+                pending.last_time = now
+            else:
+                self._pending[path] = PendingEvent(mon_path=mon_path, first_time=now, last_time=now)
+
+    @staticmethod
+    def __check(pending: PendingEvent, size: Optional[int], now: float) -> Optional[bool]:
+        """
+        根据文件大小判断文件是否可以处理，需持有锁
+        :param size: 文件大小，文件不存在时为None
+        :return: True 可以处理，False 继续等待，None 文件已不存在
+        """
+        if size is None:
+            return None
+        if size != pending.size:
+            # 文件仍在写入，等待下次检查时大小不变再处理
+            if pending.size is not None:
+                pending.last_time = now
+            pending.size = size
+            return False
+        return True
+
+    @staticmethod
+    def __get_size(path: str) -> Optional[int]:
+        try:
+            return os.stat(path).st_size
+        except OSError:
+            return None
+
+    def __dispatch(self):
+        while not self._stop_event.wait(self._poll_interval):
+            now = time.time()
+            # 持有锁时只取出已过等待时间的文件，获取文件大小在锁外进行，避免网络存储较慢时阻塞事件加入
+            with self._lock:
+                candidates = [(path, pending) for path, pending in self._pending.items()
+                              # 同一文件正在处理时，等处理完成后再处理新的事件
+                              if path not in self._running and now - pending.last_time >= self._debounce]
+            if not candidates:
+                continue
+            sizes = [self.__get_size(path) for path, _ in candidates]
+            ready = []
+            with self._lock:
+                for (path, pending), size in zip(candidates, sizes):
+                    # 获取文件大小期间收到了新的事件，下次再检查
+                    if self._pending.get(path) is not pending or now - pending.last_time < self._debounce:
+                        continue
+                    state = self.__check(pending, size, now)
+                    if state is None:
+                        del self._pending[path]
+                    elif state:
+                        del self._pending[path]
+                        self._running[path] = pending.first_time
+                        ready.append((path, pending))
+            for index, (path, pending) in enumerate(ready):
+                try:
+                    self._executor.submit(self.__run, path, pending)
+                except RuntimeError:
+                    # 线程池已关闭，未提交的文件不再标记为处理中
+                    with self._lock:
+                        for unsubmitted, _ in ready[index:]:
+                            self._running.pop(unsubmitted, None)
+                    return
+
+    def __run(self, path: str, pending: PendingEvent):
+        start = time.time()
+        success = False
+        try:
+            success = self._handler(path, pending.mon_path) is not False
+        except Exception as e:
+            logger.error(f"处理文件 {path} 出错：{str(e)}")
+        finally:
+            end = time.time()
+            with self._lock:
+                self._running.pop(path, None)
+                self._latencies.append((end - pending.first_time, end - start))
+                if success:
+                    self._processed += 1
+                else:
+                    self._failed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        队列统计信息
+        """
+        with self._lock:
+            latencies = [latency for latency, _ in self._latencies]
+            costs = [cost for _, cost in self._latencies]
+            return {
+                "pending": len(self._pending),
+                "running": len(self._running),
+                "processed": self._processed,
+                "failed": self._failed,
+                "avg_latency": sum(latencies) / len(latencies) if latencies else 0,
+                "max_latency": max(latencies, default=0),
+                "avg_cost": sum(costs) / len(costs) if costs else 0
+            }
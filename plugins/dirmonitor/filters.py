@@ -0,0 +1,67 @@
+import re
+from typing import Iterable, List, Optional, Pattern, Tuple
+
+from app.log import logger
+
+
+class PathFilter:
+    """
+    目录监控文件过滤规则，配置变化时编译一次，处理文件时直接匹配
+    """
+
+    # 回收站及隐藏的文件
+    _ignore_parts = ('/@Recycle/', '/#recycle/', '/.', '/@eaDir')
+
+    def __init__(self, exclude_keywords: str, transfer_exclude_words: Iterable[str], media_exts: Iterable[str]):
+        """
+        :param exclude_keywords: 过滤关键字，每行一个正则表达式
+        :param transfer_exclude_words: 整理屏蔽词，忽略大小写
+        :param media_exts: 媒体文件后缀
+        """
+        self.exclude_keywords = exclude_keywords or ""
+        self.transfer_exclude_words = tuple(word for word in transfer_exclude_words or [] if word)
+        self._exclude_keywords = self.__compile(
+            [keyword for keyword in self.exclude_keywords.split("\n") if keyword])
+        self._transfer_exclude_words = self.__compile(self.transfer_exclude_words, re.IGNORECASE)
+        self._media_exts = frozenset(ext.casefold() for ext in media_exts or [])
+
+    @staticmethod
+    def __compile(keywords: Iterable[str], flags: int = 0) -> List[Tuple[str, Pattern]]:
+        patterns = []
+        for keyword in keywords:
+            try:
+                patterns.append((keyword, re.compile(keyword, flags)))
+            except re.error as e:
+                logger.warn(f"关键字 {keyword} 不是有效的正则表达式，按普通文本匹配：{str(e)}")
+                patterns.append((keyword, re.compile(re.escape(keyword), flags)))
+        return patterns
+
+    def is_ignored(self, path: str) -> bool:
+        """
+        是否为回收站或隐藏的文件
+        """
+        return any(part in path for part in self._ignore_parts)
+
+    def match_exclude_keyword(self, path: str) -> Optional[str]:
+        """
+        返回命中的过滤关键字
+        """
+        for keyword, pattern in self._exclude_keywords:
+            if pattern.search(path):
+                return keyword
+        return None
+
+    def match_transfer_exclude_word(self, path: str) -> Optional[str]:
+        """
+        返回命中的整理屏蔽词
+        """
+        for keyword, pattern in self._transfer_exclude_words:
+            if pattern.search(path):
+                return keyword
+        return None
+
+    def is_media(self, suffix: str) -> bool:
+        """
+        是否为媒体文件后缀
+        """
+        return suffix.casefold() in self._media_exts
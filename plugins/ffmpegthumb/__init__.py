@@ -1,8 +1,13 @@
+import os
+import shutil
+import tempfile
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
 from threading import Event as ThreadEvent
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, Optional
 
 import pytz
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -13,12 +18,11 @@ from app.core.event import eventmanager, Event
 from app.log import logger
 from app.plugins import _PluginBase
 from app.plugins.ffmpegthumb.ffmpeg_helper import FfmpegHelper
+from app.plugins.ffmpegthumb.thumbindex import ThumbIndex
 from app.schemas import TransferInfo
 from app.schemas.types import EventType
 from app.utils.system import SystemUtils
 
-ffmpeg_lock = threading.Lock()
-
 
 class FFmpegThumb(_PluginBase):
     # 插件名称
@@ -28,7 +32,7 @@ class FFmpegThumb(_PluginBase):
     # 插件图标
     plugin_icon = "ffmpeg.png"
     # 插件版本
-    plugin_version = "1.2"
+    plugin_version = "1.3.1"
     # 插件作者
     plugin_author = "jxxghp"
     # 作者主页
@@ -48,8 +52,17 @@ class FFmpegThumb(_PluginBase):
     _timeline = "00:03:01"
     _scan_paths = ""
     _exclude_paths = ""
+    _threads = None
+    _benchmark = False
+    _clear_index = False
+    # 性能测试截取的文件数
+    _benchmark_files = 50
     # 退出事件
     _event = ThreadEvent()
+    # 限制同时运行的FFmpeg进程数
+    _semaphore: Optional[threading.BoundedSemaphore] = None
+    # 已生成缩略图的文件索引
+    _index: Optional[ThumbIndex] = None
 
     def init_plugin(self, config: dict = None):
         # 读取配置
@@ -60,10 +73,30 @@ class FFmpegThumb(_PluginBase):
             self._timeline = config.get("timeline")
             self._scan_paths = config.get("scan_paths") or ""
             self._exclude_paths = config.get("exclude_paths") or ""
+            self._threads = config.get("threads")
+            self._benchmark = config.get("benchmark")
+            self._clear_index = config.get("clear_index")
 
         # 停止现有任务
         self.stop_service()
 
+        self._semaphore = threading.BoundedSemaphore(self.__get_threads())
+        self._index = ThumbIndex(self)
+        # 旧版本的索引数据库
+        (self.get_data_path() / "thumbs.db").unlink(missing_ok=True)
+
+        # 清除缩略图索引
+        if self._clear_index:
+            self._index.clear()
+            self._clear_index = False
+            self.__update_config()
+
+        # 性能测试
+        if self._benchmark:
+            self._benchmark = False
+            self.__update_config()
+            threading.Thread(target=self.__benchmark, name="ffmpegthumb-benchmark", daemon=True).start()
+
         # 启动定时任务 & 立即运行一次
         if self._enabled or self._onlyonce:
             self._scheduler = BackgroundScheduler(timezone=settings.TZ)
@@ -83,19 +116,35 @@ class FFmpegThumb(_PluginBase):
                                         name="FFmpeg缩略图")
                 # 关闭一次性开关
                 self._onlyonce = False
-                self.update_config({
-                    "onlyonce": False,
-                    "enabled": self._enabled,
-                    "cron": self._cron,
-                    "timeline": self._timeline,
-                    "scan_paths": self._scan_paths,
-                    "exclude_paths": self._exclude_paths
-                })
+                self.__update_config()
             if self._scheduler.get_jobs():
                 # 启动服务
                 self._scheduler.print_jobs()
                 self._scheduler.start()
 
+    def __update_config(self):
+        self.update_config({
+            "onlyonce": self._onlyonce,
+            "enabled": self._enabled,
+            "cron": self._cron,
+            "timeline": self._timeline,
+            "scan_paths": self._scan_paths,
+            "exclude_paths": self._exclude_paths,
+            "threads": self._threads,
+            "benchmark": self._benchmark,
+            "clear_index": self._clear_index
+        })
+
+    def __get_threads(self) -> int:
+        """
+        同时运行的FFmpeg进程数，未配置时与CPU核数相同
+        """
+        try:
+            threads = int(self._threads)
+        except (TypeError, ValueError):
+            threads = 0
+        return threads if threads > 0 else (os.cpu_count() or 1)
+
     def get_state(self) -> bool:
         return self._enabled
 
@@ -145,6 +194,55 @@ class FFmpegThumb(_PluginBase):
                                         }
                                     }
                                 ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 6
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VSwitch',
+                                        'props': {
+                                            'model': 'benchmark',
+                                            'label': '性能测试',
+                                        }
+                                    }
+                                ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 6
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VSwitch',
+                                        'props': {
+                                            'model': 'clear_index',
+                                            'label': '清除缩略图索引',
+                                        }
+                                    }
+                                ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 6
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextField',
+                                        'props': {
+                                            'model': 'threads',
+                                            'label': '并发数',
+                                            'placeholder': '留空与CPU核数相同'
+                                        }
+                                    }
+                                ]
                             }
                         ]
                     },
@@ -245,7 +343,9 @@ class FFmpegThumb(_PluginBase):
                                         'props': {
                                             'type': 'info',
                                             'variant': 'tonal',
-                                            'text': '开启插件后默认会实时处理增量整理的媒体文件，需要处理存量媒体文件时才需开启定时；需要提前安装FFmpeg：https://www.ffmpeg.org'
+                                            'text': '开启插件后默认会实时处理增量整理的媒体文件，需要处理存量媒体文件时才需开启定时；需要提前安装FFmpeg：https://www.ffmpeg.org；'
+                                                    '性能测试从定时扫描路径中选取部分文件截取缩略图到临时目录，统计每秒生成的缩略图数量；'
+                                                    '定时扫描跳过已生成缩略图且未变化的文件，清除缩略图索引后下次扫描重新检查所有文件'
                                         }
                                     }
                                 ]
@@ -259,7 +359,10 @@ class FFmpegThumb(_PluginBase):
             "cron": "",
             "timeline": "00:03:01",
             "scan_paths": "",
-            "err_hosts": ""
+            "err_hosts": "",
+            "threads": "",
+            "benchmark": False,
+            "clear_index": False
         }
 
     def get_page(self) -> List[dict]:
@@ -288,14 +391,14 @@ class FFmpegThumb(_PluginBase):
                 continue
             self.gen_file_thumb(file_path)
 
-    def __libraryscan(self):
+    def __scan_files(self, index: Dict[str, float] = None):
         """
-        开始扫描媒体库
+        遍历扫描路径下的视频文件
+        :param index: 已处理的文件索引，文件修改时间未变化的跳过
+        :return: (文件路径, 修改时间)
         """
-        if not self._scan_paths:
-            return
         # 排除目录
-        exclude_paths = self._exclude_paths.split("\n")
+        exclude_paths = [Path(exclude_path) for exclude_path in self._exclude_paths.split("\n") if exclude_path]
         # 已选择的目录
         paths = self._scan_paths.split("\n")
         for path in paths:
@@ -309,40 +412,110 @@ class FFmpegThumb(_PluginBase):
             # 遍历目录下的所有文件
             for file_path in SystemUtils.list_files(scan_path, extensions=settings.RMT_MEDIAEXT):
                 if self._event.is_set():
-                    logger.info(f"FFmpeg缩略图扫描服务停止")
                     return
                 # 排除目录
-                exclude_flag = False
-                for exclude_path in exclude_paths:
-                    try:
-                        if file_path.is_relative_to(Path(exclude_path)):
-                            exclude_flag = True
-                            break
-                    except Exception as err:
-                        print(str(err))
-                if exclude_flag:
+                if any(file_path.is_relative_to(exclude_path) for exclude_path in exclude_paths):
                     logger.debug(f"{file_path} 在排除目录中，跳过 ...")
                     continue
-                # 开始处理文件
-                self.gen_file_thumb(file_path)
+                try:
+                    mtime = file_path.stat().st_mtime
+                except OSError:
+                    continue
+                # 已处理且未变化
+                if index and index.get(str(file_path)) == mtime:
+                    continue
+                yield file_path, mtime
             logger.info(f"目录 {path} 扫描完成")
 
-    def gen_file_thumb(self, file_path: Path):
+    def __libraryscan(self):
+        """
+        开始扫描媒体库
+        """
+        if not self._scan_paths:
+            return
+        start_time = time.time()
+        files = list(self.__scan_files(index=self._index.load()))
+        if self._event.is_set():
+            logger.info(f"FFmpeg缩略图扫描服务停止")
+            return
+        logger.info(f"FFmpeg缩略图共有 {len(files)} 个新增或变化的文件需要处理 ...")
+        generated = 0
+        with ThreadPoolExecutor(max_workers=self.__get_threads(), thread_name_prefix="ffmpegthumb") as executor:
+            results = executor.map(lambda file: self.gen_file_thumb(file[0]), files)
+            done = []
+            for (file_path, mtime), result in zip(files, results):
+                if result is None:
+                    continue
+                if result:
+                    generated += 1
+                done.append((str(file_path), mtime))
+                if len(done) >= 100:
+                    self._index.add_many(done)
+                    done = []
+            self._index.add_many(done)
+        elapsed = time.time() - start_time
+        logger.info(f"FFmpeg缩略图扫描完成，处理文件 {len(files)} 个，生成缩略图 {generated} 个，"
+                    f"耗时 {elapsed:.2f} 秒，{generated / elapsed if elapsed else 0:.2f} 张/秒")
+
+    def __benchmark(self):
+        """
+        性能测试，截取缩略图到临时目录，统计每秒生成的缩略图数量
+        """
+        if not self._scan_paths:
+            logger.warn("FFmpeg缩略图性能测试未配置扫描路径")
+            return
+        files = []
+        for file_path, _ in self.__scan_files():
+            files.append(file_path)
+            if len(files) >= self._benchmark_files:
+                break
+        if not files:
+            logger.warn("FFmpeg缩略图性能测试未找到视频文件")
+            return
+        threads = self.__get_threads()
+        temp_dir = Path(tempfile.mkdtemp(prefix="ffmpegthumb-"))
+        try:
+            def __gen(item: Tuple[int, Path]) -> bool:
+                if self._event.is_set():
+                    return False
+                image_path = temp_dir / f"{item[0]}.jpg"
+                FfmpegHelper.get_thumb(video_path=str(item[1]), image_path=str(image_path), frames=self._timeline)
+                return image_path.exists()
+
+            start_time = time.time()
+            with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="ffmpegthumb-benchmark") as executor:
+                generated = sum(executor.map(__gen, enumerate(files)))
+            elapsed = time.time() - start_time
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        message = (f"文件 {len(files)} 个，并发数 {threads}，生成缩略图 {generated} 张，"
+                   f"耗时 {elapsed:.2f} 秒，{generated / elapsed if elapsed else 0:.2f} 张/秒")
+        logger.info(f"FFmpeg缩略图性能测试完成：{message}")
+        self.systemmessage.put(message, title="FFmpeg缩略图性能测试")
+
+    def gen_file_thumb(self, file_path: Path) -> Optional[bool]:
         """
         处理一个文件
+        :return: True 生成了缩略图，False 缩略图已存在，None 处理失败
         """
-        # 单线程处理
-        with ffmpeg_lock:
+        if self._event.is_set():
+            return None
+        # 限制同时运行的FFmpeg进程数
+        with self._semaphore:
             try:
                 thumb_path = file_path.with_name(file_path.stem + "-thumb.jpg")
                 if thumb_path.exists():
                     logger.info(f"缩略图已存在：{thumb_path}")
-                    return
-                if FfmpegHelper.get_thumb(video_path=str(file_path),
-                                          image_path=str(thumb_path), frames=self._timeline):
+                    return False
+                FfmpegHelper.get_thumb(video_path=str(file_path),
+                                       image_path=str(thumb_path), frames=self._timeline)
+                if thumb_path.exists():
                     logger.info(f"{file_path} 缩略图已生成：{thumb_path}")
+                    return True
+                logger.warn(f"{file_path} 缩略图生成失败")
             except Exception as err:
                 logger.error(f"FFmpeg处理文件 {file_path} 时发生错误：{str(err)}")
+        return None
 
     def stop_service(self):
         """
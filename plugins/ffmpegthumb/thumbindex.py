@@ -0,0 +1,67 @@
+import json
+import os
+import threading
+from typing import Dict, Iterable, Tuple
+
+from app.log import logger
+from app.plugins import _PluginBase
+
+
+class ThumbIndex:
+    """
+    已生成缩略图的视频文件索引，按目录保存在插件数据中，记录文件的修改时间，文件未变化时再次扫描直接跳过
+    """
+
+    # 插件数据键前缀，存储方式见README常见问题11
+    _prefix = "thumbs:"
+
+    def __init__(self, plugin: _PluginBase):
+        self._plugin = plugin
+        self._lock = threading.Lock()
+
+    def __items(self):
+        for data in self._plugin.get_data(key=None) or []:
+            if not data.key.startswith(self._prefix):
+                continue
+            try:
+                value = json.loads(data.value) if isinstance(data.value, str) else data.value
+            except ValueError:
+                continue
+            if isinstance(value, dict):
+                yield data.key, value
+
+    def load(self) -> Dict[str, float]:
+        """
+        获取全部已处理的文件
+        :return: 文件路径 -> 修改时间
+        """
+        index = {}
+        for key, value in self.__items():
+            directory = key[len(self._prefix):]
+            index.update({os.path.join(directory, name): mtime for name, mtime in value.items()})
+        return index
+
+    def add_many(self, rows: Iterable[Tuple[str, float]]):
+        """
+        批量记录已处理的文件
+        :param rows: (文件路径, 修改时间)
+        """
+        dirs: Dict[str, Dict[str, float]] = {}
+        for path, mtime in rows:
+            directory, name = os.path.split(path)
+            dirs.setdefault(directory, {})[name] = mtime
+        with self._lock:
+            for directory, files in dirs.items():
+                key = f"{self._prefix}{directory}"
+                value = self._plugin.get_data(key) or {}
+                value.update(files)
+                self._plugin.save_data(key, value)
+
+    def clear(self):
+        """
+        清空索引
+        """
+        with self._lock:
+            for key, _ in list(self.__items()):
+                self._plugin.del_data(key=key)
+        logger.info("已清空缩略图索引")
@@ -2,7 +2,7 @@ import os
 import re
 from datetime import datetime, timedelta
 from threading import Event
-from typing import Any, List, Dict, Tuple, Optional
+from typing import Any, List, Dict, Tuple, Optional, Set
 
 import pytz
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -19,6 +19,7 @@ from app.log import logger
 from app.modules.qbittorrent import Qbittorrent
 from app.modules.transmission import Transmission
 from app.plugins import _PluginBase
+from app.plugins.iyuuautoseed.cachestore import SeedCacheStore
 from app.plugins.iyuuautoseed.iyuu_helper import IyuuHelper
 from app.schemas import NotificationType
 from app.schemas.types import EventType
@@ -34,7 +35,7 @@ class IYUUAutoSeed(_PluginBase):
     # 插件图标
     plugin_icon = "IYUU.png"
     # 插件版本
-    plugin_version = "1.9.9"
+    plugin_version = "1.9.12"
     # 插件作者
     plugin_author = "jxxghp"
     # 作者主页
@@ -82,12 +83,12 @@ class IYUUAutoSeed(_PluginBase):
     # 待校全种子hash清单
     _recheck_torrents = {}
     _is_recheck_running = False
-    # 辅种缓存，出错的种子不再重复辅种，可清除
-    _error_caches = []
-    # 辅种缓存，辅种成功的种子，可清除
-    _success_caches = []
-    # 辅种缓存，出错的种子不再重复辅种，且无法清除。种子被删除404等情况
-    _permanent_error_caches = []
+    # 辅种缓存，包括辅种成功、出错（过期后重试）以及永久出错（种子被删除404等情况）的种子，可清除
+    _caches: Optional[SeedCacheStore] = None
+    # 出错缓存有效期（秒）
+    _error_cache_ttl = 7 * 24 * 3600
+    # 本次辅种下载器中已有种子的Hash索引，获取失败时为None，逐个查询下载器
+    _torrent_hashes: Dict[str, Optional[Set[str]]] = {}
     # 辅种计数
     total = 0
     realtotal = 0
@@ -100,6 +101,7 @@ class IYUUAutoSeed(_PluginBase):
         self.sites = SitesHelper()
         self.siteoper = SiteOper()
         self.torrent = TorrentHelper()
+        self._caches = SeedCacheStore(db_path=self.get_data_path() / "caches.db", error_ttl=self._error_cache_ttl)
         # 读取配置
         if config:
             self._enabled = config.get("enabled")
@@ -117,9 +119,13 @@ class IYUUAutoSeed(_PluginBase):
             self._addhosttotag = config.get("addhosttotag")
             self._size = float(config.get("size")) if config.get("size") else 0
             self._clearcache = config.get("clearcache")
-            self._permanent_error_caches = [] if self._clearcache else config.get("permanent_error_caches") or []
-            self._error_caches = [] if self._clearcache else config.get("error_caches") or []
-            self._success_caches = [] if self._clearcache else config.get("success_caches") or []
+            if self._clearcache:
+                self._caches.clear()
+            elif self._caches.is_empty():
+                # 仅首次迁移保存在配置中的旧缓存，保存配置后旧缓存从配置中移除
+                self._caches.add_many(SeedCacheStore.SUCCESS, config.get("success_caches"))
+                self._caches.add_many(SeedCacheStore.ERROR, config.get("error_caches"))
+                self._caches.add_many(SeedCacheStore.PERMANENT, config.get("permanent_error_caches"))
 
             # 过滤掉已删除的站点
             all_sites = [site.id for site in self.siteoper.list_order_by_pri()] + [site.get("id") for site in
@@ -513,7 +519,82 @@ class IYUUAutoSeed(_PluginBase):
         }
 
     def get_page(self) -> List[dict]:
-        pass
+        """
+        拼装插件详情页面，展示辅种缓存数量
+        """
+        sizes = self._caches.sizes() if self._caches else {}
+        cache_names = {
+            SeedCacheStore.SUCCESS: "辅种成功",
+            SeedCacheStore.ERROR: f"辅种出错（{self._error_cache_ttl // 86400}天后重试）",
+            SeedCacheStore.PERMANENT: "辅种出错（不再重试）"
+        }
+        cache_rows = [
+            {
+                'component': 'tr',
+                'props': {
+                    'class': 'text-sm'
+                },
+                'content': [
+                    {
+                        'component': 'td',
+                        'props': {
+                            'class': 'whitespace-nowrap break-keep text-high-emphasis'
+                        },
+                        'text': name
+                    },
+                    {
+                        'component': 'td',
+                        'text': sizes.get(kind) or 0
+                    }
+                ]
+            } for kind, name in cache_names.items()
+        ]
+        return [
+            {
+                'component': 'VRow',
+                'content': [
+                    {
+                        'component': 'VCol',
+                        'props': {
+                            'cols': 12,
+                        },
+                        'content': [
+                            {
+                                'component': 'VTable',
+                                'props': {
+                                    'hover': True
+                                },
+                                'content': [
+                                    {
+                                        'component': 'thead',
+                                        'content': [
+                                            {
+                                                'component': 'th',
+                                                'props': {
+                                                    'class': 'text-start ps-4'
+                                                },
+                                                'text': '缓存类型'
+                                            },
+                                            {
+                                                'component': 'th',
+                                                'props': {
+                                                    'class': 'text-start ps-4'
+                                                },
+                                                'text': '种子数'
+                                            },
+                                        ]
+                                    },
+                                    {
+                                        'component': 'tbody',
+                                        'content': cache_rows
+                                    }
+                                ]
+                            }
+                        ]
+                    }
+                ]
+            }
+        ]
 
     def __update_config(self):
         self.update_config({
@@ -531,10 +612,7 @@ class IYUUAutoSeed(_PluginBase):
             "labelsafterseed": self._labelsafterseed,
             "categoryafterseed": self._categoryafterseed,
             "addhosttotag": self._addhosttotag,
-            "size": self._size,
-            "success_caches": self._success_caches,
-            "error_caches": self._error_caches,
-            "permanent_error_caches": self._permanent_error_caches
+            "size": self._size
         })
 
     def __get_downloader(self, dtype: str):
@@ -563,10 +641,13 @@ class IYUUAutoSeed(_PluginBase):
         self.exist = 0
         self.fail = 0
         self.cached = 0
+        self._torrent_hashes = {}
         # 扫描下载器辅种
         for downloader in self._downloaders:
             logger.info(f"开始扫描下载器 {downloader} ...")
             downloader_obj = self.__get_downloader(downloader)
+            # 一次性获取下载器中所有种子的Hash，辅种时直接在本地判断是否已存在
+            self._torrent_hashes[downloader] = self.__load_torrent_hashes(downloader)
             # 获取下载器中已完成的种子
             torrents = downloader_obj.get_completed_torrents()
             if torrents:
@@ -581,7 +662,7 @@ class IYUUAutoSeed(_PluginBase):
                     return
                 # 获取种子hash
                 hash_str = self.__get_hash(torrent, downloader)
-                if hash_str in self._error_caches or hash_str in self._permanent_error_caches:
+                if self._caches.contains(hash_str, SeedCacheStore.ERROR, SeedCacheStore.PERMANENT):
                     logger.info(f"种子 {hash_str} 辅种失败且已缓存，跳过 ...")
                     continue
                 save_path = self.__get_save_path(torrent, downloader)
@@ -648,6 +729,8 @@ class IYUUAutoSeed(_PluginBase):
                     else:
                         logger.info(f"下载器 {downloader} 不自动开始种子 {torrent.name}, state={torrent.state}")
                 downloader_obj.start_torrents(ids=pausedUP_torrent_hashs)
+        # 释放Hash索引
+        self._torrent_hashes = {}
         # 保存缓存
         self.__update_config()
         # 发送消息
@@ -715,6 +798,7 @@ class IYUUAutoSeed(_PluginBase):
         logger.info(f"下载器 {downloader} 开始查询辅种，数量：{len(hash_strs)} ...")
         # 下载器中的Hashs
         hashs = [item.get("hash") for item in hash_strs]
+        hash_set = set(hashs)
         # 每个Hash的保存目录
         save_paths = {}
         for item in hash_strs:
@@ -748,13 +832,13 @@ class IYUUAutoSeed(_PluginBase):
                     continue
                 if not seed.get("sid") or not seed.get("info_hash"):
                     continue
-                if seed.get("info_hash") in hashs:
+                if seed.get("info_hash") in hash_set:
                     logger.info(f"{seed.get('info_hash')} 已在下载器中，跳过 ...")
                     continue
-                if seed.get("info_hash") in self._success_caches:
+                if self._caches.contains(seed.get("info_hash"), SeedCacheStore.SUCCESS):
                     logger.info(f"{seed.get('info_hash')} 已处理过辅种，跳过 ...")
                     continue
-                if seed.get("info_hash") in self._error_caches or seed.get("info_hash") in self._permanent_error_caches:
+                if self._caches.contains(seed.get("info_hash"), SeedCacheStore.ERROR, SeedCacheStore.PERMANENT):
                     logger.info(f"种子 {seed.get('info_hash')} 辅种失败且已缓存，跳过 ...")
                     continue
                 # 添加任务
@@ -894,7 +978,7 @@ class IYUUAutoSeed(_PluginBase):
         site_url, download_page = self.iyuuhelper.get_torrent_url(seed.get("sid"))
         if not site_url or not download_page:
             # 加入缓存
-            self._error_caches.append(seed.get("info_hash"))
+            self._caches.add(SeedCacheStore.ERROR, seed.get("info_hash"))
             self.fail += 1
             self.cached += 1
             return False
@@ -911,8 +995,7 @@ class IYUUAutoSeed(_PluginBase):
         self.realtotal += 1
         # 查询hash值是否已经在下载器中
         downloader_obj = self.__get_downloader(downloader)
-        torrent_info, _ = downloader_obj.get_torrents(ids=[seed.get("info_hash")])
-        if torrent_info:
+        if self.__torrent_exists(downloader, seed.get("info_hash")):
             logger.info(f"{seed.get('info_hash')} 已在下载器中，跳过 ...")
             self.exist += 1
             return False
@@ -928,7 +1011,7 @@ class IYUUAutoSeed(_PluginBase):
                                               base_url=download_page)
         if not torrent_url:
             # 加入失败缓存
-            self._error_caches.append(seed.get("info_hash"))
+            self._caches.add(SeedCacheStore.ERROR, seed.get("info_hash"))
             self.fail += 1
             self.cached += 1
             return False
@@ -949,10 +1032,10 @@ class IYUUAutoSeed(_PluginBase):
             self.fail += 1
             # 加入失败缓存
             if error_msg and ('无法打开链接' in error_msg or '触发站点流控' in error_msg):
-                self._error_caches.append(seed.get("info_hash"))
+                self._caches.add(SeedCacheStore.ERROR, seed.get("info_hash"))
             else:
                 # 种子不存在的情况
-                self._permanent_error_caches.append(seed.get("info_hash"))
+                self._caches.add(SeedCacheStore.PERMANENT, seed.get("info_hash"))
             logger.error(f"下载种子文件失败：{torrent_url}")
             return False
         # 添加下载，辅种任务默认暂停
@@ -965,7 +1048,7 @@ class IYUUAutoSeed(_PluginBase):
             # 下载失败
             self.fail += 1
             # 加入失败缓存
-            self._error_caches.append(seed.get("info_hash"))
+            self._caches.add(SeedCacheStore.ERROR, seed.get("info_hash"))
             return False
         else:
             self.success += 1
@@ -989,9 +1072,36 @@ class IYUUAutoSeed(_PluginBase):
             # 下载成功
             logger.info(f"成功添加辅种下载，站点：{site_info.get('name')}，种子链接：{torrent_url}")
             # 成功也加入缓存，有一些改了路径校验不通过的，手动删除后，下一次又会辅上
-            self._success_caches.append(seed.get("info_hash"))
+            self._caches.add(SeedCacheStore.SUCCESS, seed.get("info_hash"))
+            # 更新Hash索引
+            torrent_hashes = self._torrent_hashes.get(downloader)
+            if torrent_hashes is not None:
+                torrent_hashes.update({seed.get("info_hash"), download_id})
             return True
 
+    def __load_torrent_hashes(self, downloader: str) -> Optional[Set[str]]:
+        """
+        获取下载器中所有种子的Hash
+        """
+        downloader_obj = self.__get_downloader(downloader)
+        torrents, error = downloader_obj.get_torrents()
+        if error or torrents is None:
+            logger.warn(f"下载器 {downloader} 获取种子列表失败，将逐个查询种子是否已存在")
+            return None
+        torrent_hashes = {self.__get_hash(torrent, downloader) for torrent in torrents}
+        logger.info(f"下载器 {downloader} 已有种子数：{len(torrent_hashes)}")
+        return torrent_hashes
+
+    def __torrent_exists(self, downloader: str, torrent_hash: str) -> bool:
+        """
+        判断种子是否已在下载器中，优先使用Hash索引
+        """
+        torrent_hashes = self._torrent_hashes.get(downloader)
+        if torrent_hashes is not None:
+            return torrent_hash in torrent_hashes
+        torrent_info, _ = self.__get_downloader(downloader).get_torrents(ids=[torrent_hash])
+        return True if torrent_info else False
+
     @staticmethod
     def __get_hash(torrent: Any, dl_type: str):
         """
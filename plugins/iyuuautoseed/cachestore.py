@@ -0,0 +1,122 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+
+class SeedCacheStore:
+    """
+    辅种缓存存储，内存中按缓存类型保存记录便于快速判断，每条记录连同写入时间单独持久化
+    """
+
+    # 辅种成功
+    SUCCESS = "success"
+    # 辅种出错，过期后重新尝试
+    ERROR = "error"
+    # 辅种出错且不再重试，种子被删除404等情况
+    PERMANENT = "permanent"
+
+    KINDS = (SUCCESS, ERROR, PERMANENT)
+
+    def __init__(self, db_path: Path, error_ttl: Optional[int] = None):
+        """
+        :param db_path: 数据库路径
+        :param error_ttl: 出错缓存的有效期（秒），为空时不过期
+        """
+        self._db_path = str(db_path)
+        self._error_ttl = error_ttl
+        self._lock = threading.Lock()
+        # 缓存类型 -> {缓存键: 写入时间}
+        self._caches: Dict[str, Dict[str, int]] = {kind: {} for kind in self.KINDS}
+        self.__init_db()
+        self.__load()
+
+    @contextmanager
+    def __connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def __init_db(self):
+        with self.__connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS caches (
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    created INTEGER NOT NULL,
+                    PRIMARY KEY (kind, key)
+                )
+            """)
+
+    def __load(self):
+        with self.__connect() as conn:
+            if self._error_ttl:
+                conn.execute("DELETE FROM caches WHERE kind = ? AND created < ?",
+                             (self.ERROR, int(time.time()) - self._error_ttl))
+            rows = conn.execute("SELECT kind, key, created FROM caches").fetchall()
+        for kind, key, created in rows:
+            if kind in self._caches:
+                self._caches[kind][key] = created
+
+    def __expired(self, kind: str, created: int) -> bool:
+        return bool(kind == self.ERROR and self._error_ttl and created < time.time() - self._error_ttl)
+
+    def is_empty(self) -> bool:
+        """
+        是否没有任何缓存记录
+        """
+        return not any(self._caches.values())
+
+    def contains(self, key: str, *kinds: str) -> bool:
+        """
+        判断缓存键是否存在于任一缓存类型中，不指定类型时判断所有类型
+        """
+        if not key:
+            return False
+        for kind in kinds or self.KINDS:
+            created = self._caches[kind].get(key)
+            if created is not None and not self.__expired(kind, created):
+                return True
+        return False
+
+    def add(self, kind: str, key: str):
+        """
+        新增缓存
+        """
+        self.add_many(kind, [key])
+
+    def add_many(self, kind: str, keys: Iterable[str]):
+        """
+        批量新增缓存
+        """
+        now = int(time.time())
+        rows = [(kind, key, now) for key in set(keys or []) if key]
+        if not rows:
+            return
+        with self._lock:
+            with self.__connect() as conn:
+                conn.executemany("INSERT OR REPLACE INTO caches (kind, key, created) VALUES (?, ?, ?)", rows)
+            self._caches[kind].update({key: created for _, key, created in rows})
+
+    def clear(self, *kinds: str):
+        """
+        清除缓存，不指定类型时清除所有类型
+        """
+        kinds = kinds or self.KINDS
+        with self._lock:
+            with self.__connect() as conn:
+                conn.executemany("DELETE FROM caches WHERE kind = ?", [(kind,) for kind in kinds])
+            for kind in kinds:
+                self._caches[kind] = {}
+
+    def sizes(self) -> Dict[str, int]:
+        """
+        各缓存类型的有效记录数
+        """
+        return {kind: sum(1 for created in caches.values() if not self.__expired(kind, created))
+                for kind, caches in self._caches.items()}
@@ -1,18 +1,22 @@
+import os
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from threading import Event
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, Optional
 
 import pytz
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 
 from app.core.config import settings
+from app.core.context import MediaInfo
 from app.core.metainfo import MetaInfoPath
 from app.db.transferhistory_oper import TransferHistoryOper
 from app.helper.nfo import NfoReader
 from app.log import logger
 from app.plugins import _PluginBase
+from app.plugins.libraryscraper.manifest import ScrapeManifest
 from app.schemas import MediaType
 from app.utils.system import SystemUtils
 
@@ -25,7 +29,7 @@ class LibraryScraper(_PluginBase):
     # 插件图标
     plugin_icon = "scraper.png"
     # 插件版本
-    plugin_version = "1.5"
+    plugin_version = "1.6.1"
     # 插件作者
     plugin_author = "jxxghp"
     # 作者主页
@@ -48,6 +52,10 @@ class LibraryScraper(_PluginBase):
     _mode = ""
     _scraper_paths = ""
     _exclude_paths = ""
+    _incremental = False
+    _clear_manifest = False
+    # 刮削清单
+    _manifest: Optional[ScrapeManifest] = None
     # 退出事件
     _event = Event()
 
@@ -60,10 +68,22 @@ class LibraryScraper(_PluginBase):
             self._mode = config.get("mode") or ""
             self._scraper_paths = config.get("scraper_paths") or ""
             self._exclude_paths = config.get("exclude_paths") or ""
+            self._incremental = config.get("incremental")
+            self._clear_manifest = config.get("clear_manifest")
 
         # 停止现有任务
         self.stop_service()
 
+        self._manifest = ScrapeManifest(self)
+        # 旧版本的清单数据库
+        (self.get_data_path() / "manifest.db").unlink(missing_ok=True)
+        # 清除刮削清单
+        if self._clear_manifest:
+            self._manifest.clear()
+            logger.info("媒体库刮削清单已清除")
+            self._clear_manifest = False
+            self.__update_config()
+
         # 启动定时任务 & 立即运行一次
         if self._enabled or self._onlyonce:
             self.transferhis = TransferHistoryOper()
@@ -76,19 +96,27 @@ class LibraryScraper(_PluginBase):
                                         name="媒体库刮削")
                 # 关闭一次性开关
                 self._onlyonce = False
-                self.update_config({
-                    "onlyonce": False,
-                    "enabled": self._enabled,
-                    "cron": self._cron,
-                    "mode": self._mode,
-                    "scraper_paths": self._scraper_paths,
-                    "exclude_paths": self._exclude_paths
-                })
+                self.__update_config()
                 if self._scheduler.get_jobs():
                     # 启动服务
                     self._scheduler.print_jobs()
                     self._scheduler.start()
 
+    def __update_config(self):
+        """
+        更新配置
+        """
+        self.update_config({
+            "onlyonce": self._onlyonce,
+            "enabled": self._enabled,
+            "cron": self._cron,
+            "mode": self._mode,
+            "scraper_paths": self._scraper_paths,
+            "exclude_paths": self._exclude_paths,
+            "incremental": self._incremental,
+            "clear_manifest": self._clear_manifest
+        })
+
     def get_state(self) -> bool:
         return self._enabled
 
@@ -167,6 +195,38 @@ class LibraryScraper(_PluginBase):
                                         }
                                     }
                                 ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 6
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VSwitch',
+                                        'props': {
+                                            'model': 'incremental',
+                                            'label': '增量刮削',
+                                        }
+                                    }
+                                ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 6
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VSwitch',
+                                        'props': {
+                                            'model': 'clear_manifest',
+                                            'label': '清除刮削清单',
+                                        }
+                                    }
+                                ]
                             }
                         ]
                     },
@@ -274,6 +334,8 @@ class LibraryScraper(_PluginBase):
                                             'variant': 'tonal',
                                             'text': '刮削路径后拼接#电视剧/电影，强制指定该媒体路径媒体类型。'
                                                     '不加默认根据文件名自动识别媒体类型。'
+                                                    '开启增量刮削后只处理上次刮削后新增或变化的文件，'
+                                                    '清除刮削清单后下次刮削重新检查所有文件。'
                                         }
                                     }
                                 ]
@@ -287,7 +349,9 @@ class LibraryScraper(_PluginBase):
             "cron": "0 0 */7 * *",
             "mode": "",
             "scraper_paths": "",
-            "err_hosts": ""
+            "err_hosts": "",
+            "incremental": False,
+            "clear_manifest": False
         }
 
     def get_page(self) -> List[dict]:
@@ -300,9 +364,11 @@ class LibraryScraper(_PluginBase):
         if not self._scraper_paths:
             return
         # 排除目录
-        exclude_paths = self._exclude_paths.split("\n")
+        exclude_paths = [Path(exclude_path) for exclude_path in self._exclude_paths.split("\n") if exclude_path]
         # 已选择的目录
         paths = self._scraper_paths.split("\n")
+        # 本次运行的识别结果缓存，同一目录下的文件（如同一季的剧集）只识别一次
+        cache: Dict[tuple, Optional[MediaInfo]] = {}
         for path in paths:
             if not path:
                 continue
@@ -319,6 +385,13 @@ class LibraryScraper(_PluginBase):
                 logger.warning(f"媒体库刮削路径不存在：{path}")
                 continue
             logger.info(f"开始刮削媒体库：{path} {mtype} ...")
+            if self._incremental:
+                if not self.__incremental_scrape(scraper_path=scraper_path, mtype=mtype,
+                                                 exclude_paths=exclude_paths, cache=cache):
+                    logger.info(f"媒体库刮削服务停止")
+                    return
+                logger.info(f"媒体库 {path} 刮削完成")
+                continue
             # 遍历所有文件
             files = SystemUtils.list_files(scraper_path, settings.RMT_MEDIAEXT)
             for file_path in files:
@@ -326,24 +399,92 @@ class LibraryScraper(_PluginBase):
                     logger.info(f"媒体库刮削服务停止")
                     return
                 # 排除目录
-                exclude_flag = False
-                for exclude_path in exclude_paths:
-                    try:
-                        if file_path.is_relative_to(Path(exclude_path)):
-                            exclude_flag = True
-                            break
-                    except Exception as err:
-                        print(str(err))
-                if exclude_flag:
+                if any(file_path.is_relative_to(exclude_path) for exclude_path in exclude_paths):
                     logger.debug(f"{file_path} 在排除目录中，跳过 ...")
                     continue
                 # 开始刮削文件
-                self.__scrape_file(file=file_path, mtype=mtype)
+                self.__scrape_file(file=file_path, mtype=mtype, cache=cache)
             logger.info(f"媒体库 {path} 刮削完成")
 
-    def __scrape_file(self, file: Path, mtype: MediaType = None):
+    def __incremental_scrape(self, scraper_path: Path, mtype: MediaType,
+                             exclude_paths: List[Path], cache: Dict[tuple, Optional[MediaInfo]]) -> bool:
+        """
+        增量刮削，目录修改时间未变化的跳过，文件修改时间未变化且nfo存在的跳过
+        :return: 是否完成，服务停止时返回False
+        """
+        start_time = time.time()
+        dir_mtimes, file_mtimes = self._manifest.load()
+        media_exts = {ext.lower() for ext in settings.RMT_MEDIAEXT}
+        scanned = skipped = scraped = 0
+        stack = [str(scraper_path)]
+        while stack:
+            if self._event.is_set():
+                return False
+            directory = stack.pop()
+            if any(Path(directory).is_relative_to(exclude_path) for exclude_path in exclude_paths):
+                logger.debug(f"{directory} 在排除目录中，跳过 ...")
+                continue
+            try:
+                dir_mtime = os.stat(directory).st_mtime
+                with os.scandir(directory) as it:
+                    entries = list(it)
+            except OSError as err:
+                logger.warn(f"读取目录 {directory} 失败：{str(err)}")
+                continue
+            names = {entry.name for entry in entries}
+            media_entries = []
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        stack.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in media_exts:
+                        media_entries.append(entry)
+                except OSError:
+                    continue
+            # 目录处理完成后未发生变化
+            if dir_mtimes.get(directory) == dir_mtime:
+                skipped += len(media_entries)
+                continue
+            scanned += 1
+            done = []
+            complete = True
+            for entry in media_entries:
+                if self._event.is_set():
+                    return False
+                try:
+                    mtime = entry.stat().st_mtime
+                except OSError:
+                    continue
+                # 文件未变化且nfo仍存在
+                if file_mtimes.get(entry.path) == mtime \
+                        and (f"{os.path.splitext(entry.name)[0]}.nfo" in names or "movie.nfo" in names):
+                    skipped += 1
+                    continue
+                tmdbid = self.__scrape_file(file=Path(entry.path), mtype=mtype, cache=cache)
+                if tmdbid:
+                    scraped += 1
+                    done.append((entry.path, mtime, tmdbid))
+                else:
+                    complete = False
+            # 刮削会写入nfo和图片，记录处理完成后的目录修改时间
+            if complete:
+                try:
+                    dir_mtime = os.stat(directory).st_mtime
+                except OSError:
+                    dir_mtime = None
+            else:
+                dir_mtime = None
+            self._manifest.record(directory=directory, dir_mtime=dir_mtime, files=done)
+        logger.info(f"增量刮削 {scraper_path} 完成，检查目录 {scanned} 个，刮削文件 {scraped} 个，"
+                    f"跳过未变化文件 {skipped} 个，耗时 {time.time() - start_time:.2f} 秒")
+        return True
+
+    def __scrape_file(self, file: Path, mtype: MediaType = None,
+                      cache: Dict[tuple, Optional[MediaInfo]] = None) -> Optional[int]:
         """
         削刮一个目录，该目录必须是媒体文件目录
+        :param cache: 识别结果缓存
+        :return: 刮削成功时返回TMDBID
         """
         # 识别元数据
         meta_info = MetaInfoPath(file)
@@ -355,6 +496,30 @@ class LibraryScraper(_PluginBase):
         force_nfo = self._mode in ["force_all", "force_nfo"]
         force_img = self._mode in ["force_all", "force_image"]
 
+        # 同一目录下同名同类型的文件使用相同的识别结果
+        cache_key = (str(file.parent), meta_info.name, meta_info.year, meta_info.type)
+        if cache is not None and cache_key in cache:
+            mediainfo = cache[cache_key]
+        else:
+            mediainfo = self.__recognize_file(file=file, meta_info=meta_info)
+            if cache is not None:
+                cache[cache_key] = mediainfo
+        if not mediainfo:
+            logger.warn(f"未识别到媒体信息：{file}")
+            return None
+
+        # 刮削
+        self.chain.scrape_metadata(path=file,
+                                   mediainfo=mediainfo,
+                                   transfer_type=settings.TRANSFER_TYPE,
+                                   force_nfo=force_nfo,
+                                   force_img=force_img)
+        return mediainfo.tmdb_id
+
+    def __recognize_file(self, file: Path, meta_info: MetaInfoPath) -> Optional[MediaInfo]:
+        """
+        识别媒体信息并获取图片
+        """
         # 优先读取本地nfo文件
         tmdbid = None
         if meta_info.type == MediaType.MOVIE:
@@ -378,8 +543,7 @@ class LibraryScraper(_PluginBase):
             # 按名称识别
             mediainfo = self.chain.recognize_media(meta=meta_info)
         if not mediainfo:
-            logger.warn(f"未识别到媒体信息：{file}")
-            return
+            return None
 
         # 如果未开启新增已入库媒体是否跟随TMDB信息变化则根据tmdbid查询之前的title
         if not settings.SCRAP_FOLLOW_TMDB:
@@ -389,12 +553,7 @@ class LibraryScraper(_PluginBase):
                 mediainfo.title = transfer_history.title
         # 获取图片
         self.chain.obtain_images(mediainfo)
-        # 刮削
-        self.chain.scrape_metadata(path=file,
-                                   mediainfo=mediainfo,
-                                   transfer_type=settings.TRANSFER_TYPE,
-                                   force_nfo=force_nfo,
-                                   force_img=force_img)
+        return mediainfo
 
     @staticmethod
     def __get_tmdbid_from_nfo(file_path: Path):
@@ -0,0 +1,67 @@
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from app.plugins import _PluginBase
+
+
+class ScrapeManifest:
+    """
+    媒体库刮削清单，按目录保存在插件数据中，记录目录处理完成时的修改时间及已刮削的文件（修改时间、TMDBID、刮削时间）
+    增量刮削时目录修改时间未变化的跳过整个目录，文件修改时间未变化且nfo存在的跳过该文件
+    """
+
+    # 插件数据键前缀，存储方式见README常见问题11
+    _prefix = "manifest:"
+
+    def __init__(self, plugin: _PluginBase):
+        self._plugin = plugin
+
+    def __items(self):
+        for data in self._plugin.get_data(key=None) or []:
+            if not data.key.startswith(self._prefix):
+                continue
+            try:
+                value = json.loads(data.value) if isinstance(data.value, str) else data.value
+            except ValueError:
+                continue
+            if isinstance(value, dict):
+                yield data.key, value
+
+    def load(self) -> Tuple[Dict[str, float], Dict[str, float]]:
+        """
+        获取清单
+        :return: 目录 -> 修改时间，文件 -> 修改时间
+        """
+        dirs, files = {}, {}
+        for key, value in self.__items():
+            directory = key[len(self._prefix):]
+            if value.get("mtime") is not None:
+                dirs[directory] = value.get("mtime")
+            for name, (mtime, _, _) in (value.get("files") or {}).items():
+                files[os.path.join(directory, name)] = mtime
+        return dirs, files
+
+    def record(self, directory: str, dir_mtime: Optional[float], files: List[Tuple[str, float, Optional[int]]]):
+        """
+        记录一个目录的处理结果
+        :param directory: 目录
+        :param dir_mtime: 目录处理完成时的修改时间，为空表示目录中有文件未刮削成功，下次仍需检查
+        :param files: 本次刮削成功的文件 (路径, 修改时间, TMDBID)
+        """
+        key = f"{self._prefix}{directory}"
+        value = self._plugin.get_data(key) or {}
+        if not files and value.get("mtime") == dir_mtime:
+            return
+        scraped = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        recorded = value.get("files") or {}
+        recorded.update({os.path.basename(path): [mtime, tmdbid, scraped] for path, mtime, tmdbid in files})
+        self._plugin.save_data(key, {"mtime": dir_mtime, "files": recorded})
+
+    def clear(self):
+        """
+        清除清单
+        """
+        for key, _ in list(self.__items()):
+            self._plugin.del_data(key=key)
@@ -18,6 +18,8 @@ from app.log import logger
 from app.modules.emby import Emby
 from app.modules.jellyfin import Jellyfin
 from app.plugins import _PluginBase
+from app.plugins.mediasyncdel.history import SyncDelHistoryStore
+from app.plugins.mediasyncdel.logtail import LogTailer, server_fetcher
 from app.schemas.types import NotificationType, EventType, MediaType, MediaImageType
 
 
@@ -29,7 +31,7 @@ class MediaSyncDel(_PluginBase):
     # 插件图标
     plugin_icon = "mediasyncdel.png"
     # 插件版本
-    plugin_version = "1.7.1"
+    plugin_version = "1.7.7"
     # 插件作者
     plugin_author = "thsrite"
     # 作者主页
@@ -54,6 +56,14 @@ class MediaSyncDel(_PluginBase):
     _transferchain = None
     _transferhis = None
     _downloadhis = None
+    # 历史记录保留天数及最多保留条数，为空时不清理
+    _history_days = None
+    _history_max = None
+    _history: Optional[SyncDelHistoryStore] = None
+    # 详情页展示的历史记录数
+    _page_size = 50
+    # 分页查询历史记录每次最多返回的条数
+    _history_limit = 500
 
     def init_plugin(self, config: dict = None):
         self._transferchain = TransferChain()
@@ -73,20 +83,40 @@ class MediaSyncDel(_PluginBase):
             self._del_history = config.get("del_history")
             self._exclude_path = config.get("exclude_path")
             self._library_path = config.get("library_path")
+            self._history_days = config.get("history_days")
+            self._history_max = config.get("history_max")
 
-            # 清理插件历史
-            if self._del_history:
-                self.del_data(key="history")
-                self.update_config({
-                    "enabled": self._enabled,
-                    "sync_type": self._sync_type,
-                    "cron": self._cron,
-                    "notify": self._notify,
-                    "del_source": self._del_source,
-                    "del_history": False,
-                    "exclude_path": self._exclude_path,
-                    "library_path": self._library_path
-                })
+        self._history = SyncDelHistoryStore(db_path=self.get_data_path() / "history.db",
+                                            retention_days=self.__parse_int(self._history_days),
+                                            max_count=self.__parse_int(self._history_max))
+        self.__migrate_history()
+
+        # 清理插件历史
+        if config and self._del_history:
+            self._history.clear()
+            self.update_config({
+                "enabled": self._enabled,
+                "sync_type": self._sync_type,
+                "cron": self._cron,
+                "notify": self._notify,
+                "del_source": self._del_source,
+                "del_history": False,
+                "exclude_path": self._exclude_path,
+                "library_path": self._library_path,
+                "history_days": self._history_days,
+                "history_max": self._history_max
+            })
+
+    @staticmethod
+    def __parse_int(value: Any) -> Optional[int]:
+        """
+        解析正整数配置，为空或无效时返回None
+        """
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            return None
+        return value if value > 0 else None
 
     @staticmethod
     def get_command() -> List[Dict[str, Any]]:
@@ -103,24 +133,48 @@ class MediaSyncDel(_PluginBase):
                 "endpoint": self.delete_history,
                 "methods": ["GET"],
                 "summary": "删除订阅历史记录"
+            },
+            {
+                "path": "/history",
+                "endpoint": self.query_history,
+                "methods": ["GET"],
+                "summary": "分页查询同步删除历史记录"
             }
         ]
 
+    def __migrate_history(self):
+        """
+        迁移保存在插件数据中的历史记录，迁移时不清理旧记录
+        """
+        historys = self.get_data('history')
+        if not historys:
+            return
+        logger.info(f"开始迁移同步删除历史记录，共 {len(historys)} 条 ...")
+        self._history.add_many(historys)
+        self.del_data(key="history")
+
     def delete_history(self, key: str, apikey: str):
         """
         删除历史记录
         """
         if apikey != settings.API_TOKEN:
             return schemas.Response(success=False, message="API密钥错误")
-        # 历史记录
-        historys = self.get_data('history')
-        if not historys:
-            return schemas.Response(success=False, message="未找到历史记录")
         # 删除指定记录
-        historys = [h for h in historys if h.get("unique") != key]
-        self.save_data('history', historys)
+        if not self._history.delete(key):
+            return schemas.Response(success=False, message="未找到历史记录")
         return schemas.Response(success=True, message="删除成功")
 
+    def query_history(self, apikey: str, offset: int = 0, limit: int = 50):
+        """
+        按删除时间倒序分页查询历史记录
+        """
+        if apikey != settings.API_TOKEN:
+            return schemas.Response(success=False, message="API密钥错误")
+        return schemas.Response(success=True, data={
+            "total": self._history.count(),
+            "items": self._history.page(offset=offset, limit=min(int(limit), self._history_limit))
+        })
+
     def get_service(self) -> List[Dict[str, Any]]:
         """
         注册插件公共服务
@@ -288,6 +342,45 @@ class MediaSyncDel(_PluginBase):
                             }
                         ]
                     },
+                    {
+                        'component': 'VRow',
+                        'content': [
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 6
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextField',
+                                        'props': {
+                                            'model': 'history_days',
+                                            'label': '历史保留天数',
+                                            'placeholder': '留空不清理'
+                                        }
+                                    }
+                                ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 6
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextField',
+                                        'props': {
+                                            'model': 'history_max',
+                                            'label': '历史最多保留条数',
+                                            'placeholder': '留空不限制'
+                                        }
+                                    }
+                                ]
+                            }
+                        ]
+                    },
                     {
                         'component': 'VRow',
                         'content': [
@@ -437,14 +530,16 @@ class MediaSyncDel(_PluginBase):
             "sync_type": "webhook",
             "cron": "*/30 * * * *",
             "exclude_path": "",
+            "history_days": "",
+            "history_max": "",
         }
 
     def get_page(self) -> List[dict]:
         """
         拼装插件详情页面，需要返回页面配置，同时附带数据
         """
-        # 查询同步详情
-        historys = self.get_data('history')
+        # 查询同步详情，只展示最新的部分记录
+        historys = self._history.page(limit=self._page_size)
         if not historys:
             return [
                 {
@@ -455,8 +550,6 @@ class MediaSyncDel(_PluginBase):
                     }
                 }
             ]
-        # 数据按时间降序排序
-        historys = sorted(historys, key=lambda x: x.get('del_time'), reverse=True)
         # 拼装页面
         contents = []
         for history in historys:
@@ -598,7 +691,7 @@ class MediaSyncDel(_PluginBase):
                 }
             )
 
-        return [
+        page = [
             {
                 'component': 'div',
                 'props': {
@@ -607,6 +700,44 @@ class MediaSyncDel(_PluginBase):
                 'content': contents
             }
         ]
+        total = self._history.count()
+        if total > len(historys):
+            # 更早的记录按接口的最大条数分段，点击后在新页面中查看
+            buttons = []
+            for offset in range(len(historys), total, self._history_limit):
+                end = min(offset + self._history_limit, total)
+                buttons.append({
+                    'component': 'VBtn',
+                    'props': {
+                        'variant': 'tonal',
+                        'size': 'small',
+                        'class': 'ma-1',
+                        'href': f'/api/v1/plugin/MediaSyncDel/history?apikey={settings.API_TOKEN}'
+                                f'&offset={offset}&limit={self._history_limit}',
+                        'target': '_blank'
+                    },
+                    'text': f'第 {offset + 1}-{end} 条'
+                })
+            page.append({
+                'component': 'div',
+                'props': {
+                    'class': 'text-center mt-3',
+                },
+                'content': [
+                    {
+                        'component': 'div',
+                        'text': f'仅展示最近 {len(historys)} 条，共 {total} 条，查看更早的记录：'
+                    },
+                    {
+                        'component': 'div',
+                        'props': {
+                            'class': 'd-flex flex-wrap justify-center',
+                        },
+                        'content': buttons
+                    }
+                ]
+            })
+        return page
 
     @eventmanager.register(EventType.WebhookMessage)
     def sync_del_by_webhook(self, event: Event):
@@ -697,6 +828,8 @@ class MediaSyncDel(_PluginBase):
                 "notify": self._notify,
                 "cron": self._cron,
                 "sync_type": self._sync_type,
+                "history_days": self._history_days,
+                "history_max": self._history_max,
             })
             return
 
@@ -861,16 +994,13 @@ class MediaSyncDel(_PluginBase):
                      f"时间 {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time()))}"
             )
 
-        # 读取历史记录
-        history = self.get_data('history') or []
-
         # 获取poster
         poster_image = self.chain.obtain_specific_image(
             mediaid=tmdb_id,
             mtype=media_type,
             image_type=MediaImageType.Poster,
         ) or image
-        history.append({
+        self._history.add({
             "type": media_type.value,
             "title": media_name,
             "year": year,
@@ -881,9 +1011,7 @@ class MediaSyncDel(_PluginBase):
             "del_time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time())),
             "unique": f"{media_name}:{tmdb_id}:{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time()))}"
         })
-
-        # 保存历史
-        self.save_data("history", history)
+        self._history.compact()
 
     def __get_transfer_his(self, media_type: str, media_name: str, media_path: str,
                            tmdb_id: int, season_num: str, episode_num: str):
@@ -952,9 +1080,9 @@ class MediaSyncDel(_PluginBase):
         emby删除媒体库同步删除历史记录
         日志方式
         """
-        # 读取历史记录
-        history = self.get_data('history') or []
         last_time = self.get_data("last_time") or None
+        # 日志增量读取位置
+        log_tailer = LogTailer(self.get_data("log_checkpoints"))
         del_medias = []
 
         # 媒体服务器类型，多个以,分隔
@@ -963,15 +1091,16 @@ class MediaSyncDel(_PluginBase):
         media_servers = settings.MEDIASERVER.split(',')
         for media_server in media_servers:
             if media_server == 'emby':
-                del_medias.extend(self.parse_emby_log(last_time))
+                del_medias.extend(self.parse_emby_log(last_time, log_tailer))
             elif media_server == 'jellyfin':
-                del_medias.extend(self.parse_jellyfin_log(last_time))
+                del_medias.extend(self.parse_jellyfin_log(last_time, log_tailer))
             elif media_server == 'plex':
                 # TODO plex解析日志
                 return
 
         if not del_medias:
             logger.error("未解析到已删除媒体信息")
+            self.save_data("log_checkpoints", log_tailer.checkpoints)
             return
 
         # 遍历删除
@@ -1115,7 +1244,7 @@ class MediaSyncDel(_PluginBase):
                          f"时间 {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time()))}",
                     image=image)
 
-            history.append({
+            self._history.add({
                 "type": "电影" if media_type == "Movie" else "电视剧",
                 "title": media_name,
                 "year": media_year,
@@ -1126,10 +1255,11 @@ class MediaSyncDel(_PluginBase):
                 "del_time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time()))
             })
 
-        # 保存历史
-        self.save_data("history", history)
+        # 清理旧历史
+        self._history.compact()
 
         self.save_data("last_time", last_del_time)
+        self.save_data("log_checkpoints", log_tailer.checkpoints)
 
     def handle_torrent(self, type: str, src: str, torrent_hash: str):
         """
@@ -1339,9 +1469,9 @@ class MediaSyncDel(_PluginBase):
         return handle_torrent_hashs
 
     @staticmethod
-    def parse_emby_log(last_time):
+    def parse_emby_log(last_time, log_tailer: LogTailer = None):
         """
-        获取emby日志列表、解析emby日志
+        获取emby日志列表、解析emby日志，只解析上次读取后新增的日志内容
         """
 
         def __parse_log(file_name: str, del_list: list):
@@ -1349,14 +1479,15 @@ class MediaSyncDel(_PluginBase):
             解析emby日志
             """
             log_url = f"[HOST]System/Logs/{file_name}?api_key=[APIKEY]"
-            log_res = Emby().get_data(log_url)
-            if not log_res or log_res.status_code != 200:
+            fetch = server_fetcher(Emby(), host=settings.EMBY_HOST, apikey=settings.EMBY_API_KEY)
+            log_text = (log_tailer or LogTailer()).read(key=f"emby:{file_name}", url=log_url, fetch=fetch)
+            if log_text is None:
                 logger.error("获取emby日志失败，请检查服务器配置")
                 return del_list
 
             # 正则解析删除的媒体信息
             pattern = r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}.\d{3}) Info App: Removing item from database, Type: (\w+), Name: (.*), Path: (.*), Id: (\d+)'
-            matches = re.findall(pattern, log_res.text)
+            matches = re.findall(pattern, log_text)
 
             # 循环获取媒体信息
             for match in matches:
@@ -1443,9 +1574,9 @@ class MediaSyncDel(_PluginBase):
         return del_medias
 
     @staticmethod
-    def parse_jellyfin_log(last_time: datetime):
+    def parse_jellyfin_log(last_time: datetime, log_tailer: LogTailer = None):
         """
-        获取jellyfin日志列表、解析jellyfin日志
+        获取jellyfin日志列表、解析jellyfin日志，只解析上次读取后新增的日志内容
         """
 
         def __parse_log(file_name: str, del_list: list):
@@ -1453,14 +1584,15 @@ class MediaSyncDel(_PluginBase):
             解析jellyfin日志
             """
             log_url = f"[HOST]System/Logs/Log?name={file_name}&api_key=[APIKEY]"
-            log_res = Jellyfin().get_data(log_url)
-            if not log_res or log_res.status_code != 200:
+            fetch = server_fetcher(Jellyfin(), host=settings.JELLYFIN_HOST, apikey=settings.JELLYFIN_API_KEY)
+            log_text = (log_tailer or LogTailer()).read(key=f"jellyfin:{file_name}", url=log_url, fetch=fetch)
+            if log_text is None:
                 logger.error("获取jellyfin日志失败，请检查服务器配置")
                 return del_list
 
             # 正则解析删除的媒体信息
             pattern = r'\[(.*?)\].*?Removing item, Type: "(.*?)", Name: "(.*?)", Path: "(.*?)"'
-            matches = re.findall(pattern, log_res.text)
+            matches = re.findall(pattern, log_text)
 
             # 循环获取媒体信息
             for match in matches:
@@ -0,0 +1,131 @@
+import json
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+
+from app.log import logger
+
+
+class SyncDelHistoryStore:
+    """
+    同步删除历史记录存储，按删除时间建立索引，支持分页查询，按保留天数及最大条数清理旧记录
+    """
+
+    def __init__(self, db_path: Path, retention_days: Optional[int] = None, max_count: Optional[int] = None):
+        """
+        :param db_path: 数据库路径
+        :param retention_days: 记录保留天数，为空时不按时间清理
+        :param max_count: 最多保留的记录数，为空时不按条数清理
+        """
+        self._db_path = str(db_path)
+        self._retention_days = retention_days
+        self._max_count = max_count
+        self._lock = threading.Lock()
+        self.__init_db()
+
+    @contextmanager
+    def __connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def __init_db(self):
+        with self.__connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    unique_key TEXT NOT NULL UNIQUE,
+                    del_time TEXT NOT NULL,
+                    data TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_history_del_time ON history (del_time, id)")
+
+    @staticmethod
+    def __to_row(history: dict) -> tuple:
+        if not history.get("unique"):
+            history = dict(history, unique=uuid.uuid4().hex)
+        return history.get("unique"), history.get("del_time") or "", json.dumps(history, ensure_ascii=False)
+
+    def add(self, history: dict):
+        """
+        新增历史记录
+        """
+        self.add_many([history])
+
+    def add_many(self, historys: List[dict]):
+        """
+        批量新增历史记录
+        """
+        rows = [self.__to_row(history) for history in historys or [] if isinstance(history, dict)]
+        if not rows:
+            return
+        with self._lock:
+            with self.__connect() as conn:
+                conn.executemany("INSERT OR REPLACE INTO history (unique_key, del_time, data) VALUES (?, ?, ?)", rows)
+
+    def count(self) -> int:
+        """
+        历史记录总数
+        """
+        with self.__connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    def page(self, offset: int = 0, limit: int = 50) -> List[dict]:
+        """
+        按删除时间倒序分页查询历史记录
+        """
+        with self.__connect() as conn:
+            rows = conn.execute("SELECT data FROM history ORDER BY del_time DESC, id DESC LIMIT ? OFFSET ?",
+                                (max(int(limit), 0), max(int(offset), 0))).fetchall()
+        historys = []
+        for (data,) in rows:
+            try:
+                historys.append(json.loads(data))
+            except Exception as e:
+                logger.error(f"同步删除历史记录解析失败：{str(e)}")
+        return historys
+
+    def delete(self, unique: str) -> bool:
+        """
+        删除指定历史记录
+        """
+        with self._lock:
+            with self.__connect() as conn:
+                return conn.execute("DELETE FROM history WHERE unique_key = ?", (unique,)).rowcount > 0
+
+    def clear(self):
+        """
+        清空历史记录
+        """
+        with self._lock:
+            with self.__connect() as conn:
+                conn.execute("DELETE FROM history")
+
+    def compact(self) -> int:
+        """
+        按保留策略清理旧记录
+        :return: 清理的记录数
+        """
+        removed = 0
+        with self._lock:
+            with self.__connect() as conn:
+                if self._retention_days:
+                    expire_time = (datetime.now() - timedelta(days=self._retention_days)).strftime("%Y-%m-%d %H:%M:%S")
+                    removed += conn.execute("DELETE FROM history WHERE del_time < ?", (expire_time,)).rowcount
+                if self._max_count:
+                    removed += conn.execute("""
+                        DELETE FROM history WHERE id NOT IN (
+                            SELECT id FROM history ORDER BY del_time DESC, id DESC LIMIT ?
+                        )
+                    """, (self._max_count,)).rowcount
+        if removed:
+            logger.info(f"已清理 {removed} 条同步删除历史记录")
+        return removed
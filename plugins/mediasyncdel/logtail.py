@@ -0,0 +1,112 @@
+import hashlib
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.log import logger
+from app.utils.http import RequestUtils
+
+
+def server_fetcher(server: Any, host: Optional[str], apikey: Optional[str]) -> Callable[[str, Optional[dict]], Any]:
+    """
+    获取媒体服务器（Emby/Jellyfin）数据，地址中的[HOST]、[APIKEY]替换为配置的服务器地址及API密钥
+    不需要请求头时通过媒体服务器模块获取，需要请求头（按范围获取）时按配置的服务器地址直接请求
+    :param server: 媒体服务器模块
+    :param host: 配置的服务器地址
+    :param apikey: 配置的API密钥
+    """
+    if host:
+        if not host.endswith("/"):
+            host += "/"
+        if not host.startswith("http"):
+            host = "http://" + host
+
+    def __fetch(url: str, headers: Optional[dict] = None):
+        if not headers:
+            return server.get_data(url)
+        if not host or not apikey:
+            logger.warn("未获取到媒体服务器地址或API密钥，改为获取完整日志文件")
+            return server.get_data(url)
+        return RequestUtils(headers=headers).get_res(url=url.replace("[HOST]", host).replace("[APIKEY]", apikey))
+
+    return __fetch
+
+
+class LogTailer:
+    """
+    媒体服务器日志增量读取，记录每个日志文件已读取到的位置，只获取并返回新增的完整行
+    通过已读位置前的一段内容校验文件是否被轮转或重建，校验不通过时重新读取整个文件
+    """
+
+    # 用于校验文件是否变化的已读内容长度
+    _check_size = 256
+
+    def __init__(self, checkpoints: Optional[Dict[str, dict]] = None):
+        """
+        :param checkpoints: 日志文件 -> {"offset": 已读位置, "digest": 已读位置前内容的摘要}
+        """
+        self._checkpoints = dict(checkpoints or {})
+        # 本次读取过的日志文件，未读取的日志文件已被清理，不再保留读取位置
+        self._touched = set()
+
+    @property
+    def checkpoints(self) -> Dict[str, dict]:
+        return {key: value for key, value in self._checkpoints.items() if key in self._touched}
+
+    @staticmethod
+    def __digest(content: bytes) -> str:
+        return hashlib.md5(content).hexdigest()
+
+    def __read(self, url: str, fetch: Callable[[str, Optional[dict]], Any],
+               offset: int, digest: str) -> Optional[Tuple[bytes, int]]:
+        """
+        获取日志内容
+        :return: 日志内容（包含已读位置前用于校验的内容），新增内容在日志内容中的起始位置
+        """
+        check_size = min(offset, self._check_size)
+        start = offset - check_size
+        res = fetch(url, {"Range": f"bytes={start}-"} if start else None)
+        if res is None:
+            return None
+        if res.status_code == 416:
+            # 文件比已读位置小，已被轮转
+            logger.info(f"日志文件已轮转，重新读取：{url.split('?')[0]}")
+            return self.__read(url, fetch, offset=0, digest=None)
+        if res.status_code not in (200, 206):
+            return None
+        content = res.content
+        if res.status_code == 200:
+            # 服务器不支持按范围获取，返回的是完整文件
+            content = content[start:]
+        checked = content[:check_size]
+        if offset and (len(checked) != check_size or self.__digest(checked) != digest):
+            logger.info(f"日志文件内容已变化，重新读取：{url.split('?')[0]}")
+            if res.status_code == 200:
+                return res.content, 0
+            return self.__read(url, fetch, offset=0, digest=None)
+        return content, check_size
+
+    def read(self, key: str, url: str, fetch: Callable[[str, Optional[dict]], Any]) -> Optional[str]:
+        """
+        读取日志文件新增的内容，读取失败时返回None
+        :param key: 日志文件标识
+        :param url: 日志文件地址
+        :param fetch: 获取地址内容的方法，参数为地址及请求头
+        """
+        self._touched.add(key)
+        checkpoint = self._checkpoints.get(key) or {}
+        offset = checkpoint.get("offset") or 0
+        result = self.__read(url, fetch, offset=offset, digest=checkpoint.get("digest"))
+        if result is None:
+            return None
+        content, begin = result
+        if begin == 0:
+            # 重新读取了整个文件
+            offset = 0
+        # 只处理完整的行，未写完的行下次再读取
+        end = content.rfind(b"\n", begin) + 1
+        if end <= begin:
+            return ""
+        self._checkpoints[key] = {
+            "offset": offset + end - begin,
+            "digest": self.__digest(content[max(end - self._check_size, 0):end])
+        }
+        return content[begin:end].decode("utf-8", errors="ignore")
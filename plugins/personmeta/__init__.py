@@ -1,10 +1,11 @@
 import base64
 import copy
 import datetime
+import hashlib
 import json
-import re
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, List, Dict, Tuple, Optional
 
@@ -25,6 +26,9 @@ from app.modules.emby import Emby
 from app.modules.jellyfin import Jellyfin
 from app.modules.plex import Plex
 from app.plugins import _PluginBase
+from app.plugins.personmeta.doubanindex import DoubanActorIndex
+from app.plugins.personmeta.personcache import PersonCache
+from app.plugins.personmeta.ratelimit import TokenBucket
 from app.schemas import MediaInfo, MediaServerItem
 from app.schemas.types import EventType, MediaType
 from app.utils.common import retry
@@ -40,7 +44,7 @@ class PersonMeta(_PluginBase):
     # 插件图标
     plugin_icon = "actor.png"
     # 插件版本
-    plugin_version = "1.4"
+    plugin_version = "1.7.2"
     # 插件作者
     plugin_author = "jxxghp"
     # 作者主页
@@ -65,10 +69,29 @@ class PersonMeta(_PluginBase):
     _delay = 0
     _type = "all"
     _remove_nozh = False
+    _clear_cache = False
+    # 人物处理状态缓存
+    _person_cache: Optional[PersonCache] = None
+    # 人物缓存有效期（秒）
+    _person_cache_ttl = 30 * 24 * 3600
+    # 刮削媒体库时同时处理的媒体项数
+    _workers = 4
+    # 豆瓣、TMDB 请求限速
+    _douban_limiter = TokenBucket(rate=0.3, capacity=2)
+    _tmdb_limiter = TokenBucket(rate=4, capacity=10)
+    # 豆瓣演员信息缓存有效期（秒）
+    _douban_cache_ttl = 3600
+    # 豆瓣演员信息缓存：(标题, 年份, 季) -> (过期时间, 演员索引)
+    _douban_actors: Dict[tuple, Tuple[float, DoubanActorIndex]] = {}
+    _douban_locks: Dict[tuple, threading.Lock] = {}
+    _douban_lock = threading.Lock()
 
     def init_plugin(self, config: dict = None):
         self.tmdbchain = TmdbChain()
         self.mschain = MediaServerChain()
+        self._person_cache = PersonCache(self, ttl=self._person_cache_ttl)
+        # 旧版本的人物缓存数据库
+        (self.get_data_path() / "persons.db").unlink(missing_ok=True)
         if config:
             self._enabled = config.get("enabled")
             self._onlyonce = config.get("onlyonce")
@@ -76,6 +99,16 @@ class PersonMeta(_PluginBase):
             self._type = config.get("type") or "all"
             self._delay = config.get("delay") or 0
             self._remove_nozh = config.get("remove_nozh") or False
+            self._clear_cache = config.get("clear_cache") or False
+
+        # 清除人物缓存
+        if self._clear_cache:
+            self._person_cache.clear()
+            with self._douban_lock:
+                self._douban_actors.clear()
+            logger.info("演职人员刮削缓存已清除")
+            self._clear_cache = False
+            self.__update_config()
 
         # 停止现有任务
         self.stop_service()
@@ -107,7 +140,8 @@ class PersonMeta(_PluginBase):
             "cron": self._cron,
             "type": self._type,
             "delay": self._delay,
-            "remove_nozh": self._remove_nozh
+            "remove_nozh": self._remove_nozh,
+            "clear_cache": self._clear_cache
         })
 
     def get_state(self) -> bool:
@@ -263,6 +297,22 @@ class PersonMeta(_PluginBase):
                                         }
                                     }
                                 ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 6
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VSwitch',
+                                        'props': {
+                                            'model': 'clear_cache',
+                                            'label': '清除人物缓存',
+                                        }
+                                    }
+                                ]
                             }
                         ]
                     }
@@ -274,7 +324,8 @@ class PersonMeta(_PluginBase):
             "cron": "",
             "type": "all",
             "delay": 30,
-            "remove_nozh": False
+            "remove_nozh": False,
+            "clear_cache": False
         }
 
     def get_page(self) -> List[dict]:
@@ -316,30 +367,50 @@ class PersonMeta(_PluginBase):
         # 所有媒体服务器
         if not settings.MEDIASERVER:
             return
-        for server in settings.MEDIASERVER.split(","):
-            # 扫描所有媒体库
-            logger.info(f"开始刮削服务器 {server} 的演员信息 ...")
-            for library in self.mschain.librarys(server):
-                logger.info(f"开始刮削媒体库 {library.name} 的演员信息 ...")
-                for item in self.mschain.items(server, library.id):
-                    if not item:
-                        continue
-                    if not item.item_id:
-                        continue
-                    if "Series" not in item.item_type \
-                            and "Movie" not in item.item_type:
-                        continue
-                    if self._event.is_set():
-                        logger.info(f"演职人员刮削服务停止")
-                        return
-                    # 处理条目
-                    logger.info(f"开始刮削 {item.title} 的演员信息 ...")
-                    self.__update_item(server=server, item=item)
-                    logger.info(f"{item.title} 的演员信息刮削完成")
-                logger.info(f"媒体库 {library.name} 的演员信息刮削完成")
-            logger.info(f"服务器 {server} 的演员信息刮削完成")
-
-    def __update_peoples(self, server: str, itemid: str, iteminfo: dict, douban_actors):
+        # 每次刮削媒体库重新获取豆瓣演员信息
+        with self._douban_lock:
+            self._douban_actors.clear()
+            self._douban_locks.clear()
+        # 限制等待处理的媒体项数量
+        pending = threading.BoundedSemaphore(self._workers * 2)
+
+        def __process(_server: str, _item: MediaServerItem):
+            try:
+                if self._event.is_set():
+                    return
+                # 处理条目
+                logger.info(f"开始刮削 {_item.title} 的演员信息 ...")
+                self.__update_item(server=_server, item=_item)
+                logger.info(f"{_item.title} 的演员信息刮削完成")
+            except Exception as err:
+                logger.error(f"刮削 {_item.title} 的演员信息失败：{str(err)}")
+            finally:
+                pending.release()
+
+        with ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="personmeta") as executor:
+            for server in settings.MEDIASERVER.split(","):
+                # 扫描所有媒体库
+                logger.info(f"开始刮削服务器 {server} 的演员信息 ...")
+                for library in self.mschain.librarys(server):
+                    logger.info(f"开始刮削媒体库 {library.name} 的演员信息 ...")
+                    for item in self.mschain.items(server, library.id):
+                        if not item:
+                            continue
+                        if not item.item_id:
+                            continue
+                        if "Series" not in item.item_type \
+                                and "Movie" not in item.item_type:
+                            continue
+                        if self._event.is_set():
+                            logger.info(f"演职人员刮削服务停止")
+                            return
+                        pending.acquire()
+                        executor.submit(__process, server, item)
+                    logger.info(f"媒体库 {library.name} 的演员信息已全部提交刮削")
+                logger.info(f"服务器 {server} 的演员信息已全部提交刮削")
+        logger.info(f"演员信息刮削完成")
+
+    def __update_peoples(self, server: str, itemid: str, iteminfo: dict, douban_actors: DoubanActorIndex):
         # 处理媒体项中的人物信息
         """
         "People": [
@@ -407,6 +478,8 @@ class PersonMeta(_PluginBase):
                 logger.warn(f"{item.title} 未找到tmdbid，无法识别媒体信息")
                 return
             mtype = MediaType.TV if item.item_type in ['Series', 'show'] else MediaType.MOVIE
+            if not self._tmdb_limiter.acquire(self._event):
+                return
             mediainfo = self.chain.recognize_media(mtype=mtype, tmdbid=item.tmdbid)
             if not mediainfo:
                 logger.warn(f"{item.title} 未识别到媒体信息")
@@ -470,7 +543,8 @@ class PersonMeta(_PluginBase):
                     else:
                         logger.info(f"集 {episodeinfo.get('Id')} 的人物信息已是中文，无需更新")
 
-    def __update_people(self, server: str, people: dict, douban_actors: list = None) -> Optional[dict]:
+    def __update_people(self, server: str, people: dict,
+                        douban_actors: DoubanActorIndex = None) -> Optional[dict]:
         """
         更新人物信息，返回替换后的人物信息
         """
@@ -494,8 +568,25 @@ class PersonMeta(_PluginBase):
 
         # 返回的人物信息
         ret_people = copy.deepcopy(people)
+        # 豆瓣中匹配的演员
+        douban_actor = douban_actors.match(people.get("Name")) if douban_actors else None
 
         try:
+            # 同一人物已处理过，只更新当前媒体项中的人物信息
+            cached = self._person_cache.get_people(server=server, person_id=people.get("Id"))
+            if cached:
+                if cached.get("name"):
+                    logger.debug(f"人物 {people.get('Name')} 已处理过，使用缓存的中文名：{cached.get('name')}")
+                    ret_people["Name"] = cached.get("name")
+                    character = douban_actors.character(douban_actor)
+                    if character:
+                        ret_people["Role"] = character
+                    return ret_people
+                if not douban_actor:
+                    # 已确认没有中文数据，且当前媒体项的豆瓣演员中也没有
+                    logger.debug(f"人物 {people.get('Name')} 已处理过，未找到中文数据")
+                    return None
+
             # 查询媒体库人物详情
             personinfo = self.get_iteminfo(server=server, itemid=people.get("Id"))
             if not personinfo:
@@ -511,11 +602,11 @@ class PersonMeta(_PluginBase):
             # 从TMDB信息中更新人物信息
             person_tmdbid, person_imdbid = __get_peopleid(personinfo)
             if person_tmdbid:
-                person_detail = self.tmdbchain.person_detail(int(person_tmdbid))
+                person_detail = self.__get_tmdb_person(person_tmdbid)
                 if person_detail:
-                    cn_name = self.__get_chinese_name(person_detail)
+                    cn_name = person_detail.get("name")
                     # 图片优先从TMDB获取
-                    profile_path = person_detail.profile_path
+                    profile_path = person_detail.get("profile")
                     if profile_path:
                         logger.debug(f"{people.get('Name')} 从TMDB获取到图片：{profile_path}")
                         profile_path = f"https://{settings.TMDB_IMAGE_DOMAIN}/t/p/original{profile_path}"
@@ -526,7 +617,7 @@ class PersonMeta(_PluginBase):
                         ret_people["Name"] = cn_name
                         updated_name = True
                         # 更新中文描述
-                        biography = person_detail.biography
+                        biography = person_detail.get("overview")
                         if biography and StringUtils.is_chinese(biography):
                             logger.debug(f"{people.get('Name')} 从TMDB获取到中文描述")
                             personinfo["Overview"] = biography
@@ -556,47 +647,39 @@ class PersonMeta(_PluginBase):
               "latin_name": "Daniel Craig"
             }
             """
-            if douban_actors and (not updated_name
-                                  or not updated_overview
-                                  or not update_character):
+            if douban_actor and (not updated_name
+                                 or not updated_overview
+                                 or not update_character):
                 # 从豆瓣演员中匹配中文名称、角色和简介
-                for douban_actor in douban_actors:
-                    if douban_actor.get("latin_name") == people.get("Name") \
-                            or douban_actor.get("name") == people.get("Name"):
-                        # 名称
-                        if not updated_name:
-                            logger.debug(f"{people.get('Name')} 从豆瓣中获取到中文名：{douban_actor.get('name')}")
-                            personinfo["Name"] = douban_actor.get("name")
-                            ret_people["Name"] = douban_actor.get("name")
-                            updated_name = True
-                        # 描述
-                        if not updated_overview:
-                            if douban_actor.get("title"):
-                                logger.debug(f"{people.get('Name')} 从豆瓣中获取到中文描述：{douban_actor.get('title')}")
-                                personinfo["Overview"] = douban_actor.get("title")
-                                updated_overview = True
-                        # 饰演角色
-                        if not update_character:
-                            if douban_actor.get("character"):
-                                # "饰 詹姆斯·邦德 James Bond 007"
-                                character = re.sub(r"饰\s+", "",
-                                                   douban_actor.get("character"))
-                                character = re.sub("演员", "",
-                                                   character)
-                                if character:
-                                    logger.debug(f"{people.get('Name')} 从豆瓣中获取到饰演角色：{character}")
-                                    ret_people["Role"] = character
-                                    update_character = True
-                        # 图片
-                        if not profile_path:
-                            avatar = douban_actor.get("avatar") or {}
-                            if avatar.get("large"):
-                                logger.debug(f"{people.get('Name')} 从豆瓣中获取到图片：{avatar.get('large')}")
-                                profile_path = avatar.get("large")
-                        break
-
-            # 更新人物图片
-            if profile_path:
+                # 名称
+                if not updated_name:
+                    logger.debug(f"{people.get('Name')} 从豆瓣中获取到中文名：{douban_actor.get('name')}")
+                    personinfo["Name"] = douban_actor.get("name")
+                    ret_people["Name"] = douban_actor.get("name")
+                    updated_name = True
+                # 描述
+                if not updated_overview:
+                    if douban_actor.get("title"):
+                        logger.debug(f"{people.get('Name')} 从豆瓣中获取到中文描述：{douban_actor.get('title')}")
+                        personinfo["Overview"] = douban_actor.get("title")
+                        updated_overview = True
+                # 饰演角色
+                if not update_character:
+                    character = douban_actors.character(douban_actor)
+                    if character:
+                        logger.debug(f"{people.get('Name')} 从豆瓣中获取到饰演角色：{character}")
+                        ret_people["Role"] = character
+                        update_character = True
+                # 图片
+                if not profile_path:
+                    avatar = douban_actor.get("avatar") or {}
+                    if avatar.get("large"):
+                        logger.debug(f"{people.get('Name')} 从豆瓣中获取到图片：{avatar.get('large')}")
+                        profile_path = avatar.get("large")
+
+            # 更新人物图片，同一图片不重复上传
+            image_digest = hashlib.md5(profile_path.encode("utf-8")).hexdigest() if profile_path else None
+            if profile_path and (not cached or cached.get("image") != image_digest):
                 logger.debug(f"更新人物 {people.get('Name')} 的图片：{profile_path}")
                 self.set_item_image(server=server, itemid=people.get("Id"), imageurl=profile_path)
 
@@ -613,34 +696,83 @@ class PersonMeta(_PluginBase):
                 logger.debug(f"更新人物 {people.get('Name')} 的信息：{personinfo}")
                 ret = self.set_iteminfo(server=server, itemid=people.get("Id"), iteminfo=personinfo)
                 if ret:
+                    self._person_cache.set_people(server=server, person_id=people.get("Id"), tmdbid=person_tmdbid,
+                                                  name=ret_people.get("Name"), image=image_digest)
                     return ret_people
             else:
                 logger.debug(f"人物 {people.get('Name')} 未找到中文数据")
+                self._person_cache.set_people(server=server, person_id=people.get("Id"), tmdbid=person_tmdbid,
+                                              name=None, image=image_digest)
         except Exception as err:
             logger.error(f"更新人物信息失败：{str(err)}")
         return None
 
-    def __get_douban_actors(self, mediainfo: MediaInfo, season: int = None) -> List[dict]:
+    def __get_tmdb_person(self, tmdbid: str) -> Optional[dict]:
         """
-        获取豆瓣演员信息
+        获取TMDB人物的中文名、中文描述及图片，同一人物只查询一次
         """
-        # 随机休眠 3-10 秒
-        sleep_time = 3 + int(time.time()) % 7
-        logger.debug(f"随机休眠 {sleep_time}秒 ...")
-        time.sleep(sleep_time)
-        # 匹配豆瓣信息
-        doubaninfo = self.chain.match_doubaninfo(name=mediainfo.title,
-                                                 imdbid=mediainfo.imdb_id,
-                                                 mtype=mediainfo.type,
-                                                 year=mediainfo.year,
-                                                 season=season)
-        # 豆瓣演员
-        if doubaninfo:
-            doubanitem = self.chain.douban_info(doubaninfo.get("id")) or {}
-            return (doubanitem.get("actors") or []) + (doubanitem.get("directors") or [])
-        else:
-            logger.debug(f"未找到豆瓣信息：{mediainfo.title_year}")
-        return []
+        person = self._person_cache.get_tmdb(tmdbid)
+        if person:
+            return person
+        if not self._tmdb_limiter.acquire(self._event):
+            return None
+        person_detail = self.tmdbchain.person_detail(int(tmdbid))
+        if not person_detail:
+            return None
+        person = {
+            "name": self.__get_chinese_name(person_detail),
+            "overview": person_detail.biography,
+            "profile": person_detail.profile_path
+        }
+        self._person_cache.set_tmdb(tmdbid=tmdbid, **person)
+        return person
+
+    def __get_douban_actors(self, mediainfo: MediaInfo, season: int = None) -> DoubanActorIndex:
+        """
+        获取豆瓣演员信息并建立索引，同一标题、年份、季在缓存有效期内只查询一次，未获取到演员时不缓存
+        """
+        key = (mediainfo.title, mediainfo.year, season)
+        with self._douban_lock:
+            self.__purge_douban_actors()
+            lock = self._douban_locks.setdefault(key, threading.Lock())
+        with lock:
+            cached = self._douban_actors.get(key)
+            if cached and cached[0] > time.time():
+                return cached[1]
+            # 豆瓣请求限速
+            if not self._douban_limiter.acquire(self._event):
+                return DoubanActorIndex()
+            # 匹配豆瓣信息
+            doubaninfo = self.chain.match_doubaninfo(name=mediainfo.title,
+                                                     imdbid=mediainfo.imdb_id,
+                                                     mtype=mediainfo.type,
+                                                     year=mediainfo.year,
+                                                     season=season)
+            # 豆瓣演员
+            actors = []
+            if doubaninfo:
+                if not self._douban_limiter.acquire(self._event):
+                    return DoubanActorIndex()
+                doubanitem = self.chain.douban_info(doubaninfo.get("id")) or {}
+                actors = (doubanitem.get("actors") or []) + (doubanitem.get("directors") or [])
+            else:
+                logger.debug(f"未找到豆瓣信息：{mediainfo.title_year}")
+            douban_actors = DoubanActorIndex(actors)
+            if douban_actors:
+                with self._douban_lock:
+                    self._douban_actors[key] = (time.time() + self._douban_cache_ttl, douban_actors)
+            return douban_actors
+
+    def __purge_douban_actors(self):
+        """
+        清理过期的豆瓣演员信息缓存及不再使用的锁，需持有 _douban_lock
+        """
+        now = time.time()
+        for key in [k for k, (expire, _) in self._douban_actors.items() if expire <= now]:
+            del self._douban_actors[key]
+        for key in [k for k, lock in self._douban_locks.items()
+                    if k not in self._douban_actors and not lock.locked()]:
+            del self._douban_locks[key]
 
     @staticmethod
     def get_iteminfo(server: str, itemid: str) -> dict:
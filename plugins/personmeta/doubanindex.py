@@ -0,0 +1,70 @@
+import re
+from typing import Dict, List, Optional
+
+
+class DoubanActorIndex:
+    """
+    豆瓣演职人员索引，按规范化后的中文名、外文名及别名查找，饰演角色预先处理
+    """
+
+    # 作为名称索引的字段
+    _name_keys = ("name", "latin_name")
+    # 作为别名索引的字段
+    _alias_keys = ("aliases", "aka", "other_names")
+
+    def __init__(self, actors: List[dict] = None):
+        self._actors = list(actors or [])
+        self._names: Dict[str, dict] = {}
+        # id(演员) -> 饰演角色
+        self._characters: Dict[int, Optional[str]] = {}
+        for actor in self._actors:
+            for name in self.__names(actor):
+                # 与逐个比较时一致，重名时以先出现的为准
+                self._names.setdefault(name, actor)
+            self._characters[id(actor)] = self.__clean_character(actor.get("character"))
+
+    def __len__(self):
+        return len(self._actors)
+
+    @staticmethod
+    def normalize(name: Optional[str]) -> str:
+        """
+        规范化名称：忽略大小写及多余空白
+        """
+        return " ".join((name or "").split()).casefold()
+
+    def __names(self, actor: dict) -> List[str]:
+        names = [actor.get(key) for key in self._name_keys]
+        for key in self._alias_keys:
+            aliases = actor.get(key)
+            if isinstance(aliases, str):
+                names.append(aliases)
+            elif isinstance(aliases, list):
+                names.extend(alias for alias in aliases if isinstance(alias, str))
+        return [name for name in map(self.normalize, names) if name]
+
+    @staticmethod
+    def __clean_character(character: Optional[str]) -> Optional[str]:
+        if not character:
+            return None
+        # "饰 詹姆斯·邦德 James Bond 007"
+        character = re.sub(r"饰\s+", "", character)
+        character = re.sub("演员", "", character)
+        return character or None
+
+    def match(self, name: Optional[str]) -> Optional[dict]:
+        """
+        按人物名称查找豆瓣演职人员
+        """
+        name = self.normalize(name)
+        if not name:
+            return None
+        return self._names.get(name)
+
+    def character(self, actor: Optional[dict]) -> Optional[str]:
+        """
+        豆瓣演职人员饰演的角色
+        """
+        if not actor:
+            return None
+        return self._characters.get(id(actor))
@@ -0,0 +1,74 @@
+import time
+from typing import Optional
+
+from app.plugins import _PluginBase
+
+
+class PersonCache:
+    """
+    人物处理状态缓存，保存在插件数据中，按媒体服务器人物Id记录已处理的人物（TMDBID、中文名、图片摘要），按TMDBID记录TMDB人物详情
+    同一人物再次出现时直接使用缓存，不再请求媒体服务器及TMDB
+    """
+
+    # 插件数据键前缀，存储方式见README常见问题11
+    _people_prefix = "people:"
+    _tmdb_prefix = "tmdb:"
+
+    def __init__(self, plugin: _PluginBase, ttl: Optional[int] = None):
+        """
+        :param plugin: 插件
+        :param ttl: 缓存有效期（秒），过期后重新处理，为空时不过期
+        """
+        self._plugin = plugin
+        self._ttl = ttl
+
+    def __get(self, key: str) -> Optional[dict]:
+        value = self._plugin.get_data(key)
+        if not isinstance(value, dict):
+            return None
+        if self._ttl and value.get("updated", 0) < time.time() - self._ttl:
+            return None
+        return value
+
+    def get_people(self, server: str, person_id: str) -> Optional[dict]:
+        """
+        获取已处理的人物
+        :return: {"tmdbid": TMDBID, "name": 中文名（未找到中文数据时为空）, "image": 已上传图片地址的摘要}
+        """
+        value = self.__get(f"{self._people_prefix}{server}:{person_id}")
+        if not value:
+            return None
+        return {"tmdbid": value.get("tmdbid"), "name": value.get("name"), "image": value.get("image")}
+
+    def set_people(self, server: str, person_id: str, tmdbid: Optional[str], name: Optional[str],
+                   image: Optional[str]):
+        """
+        记录已处理的人物
+        """
+        self._plugin.save_data(f"{self._people_prefix}{server}:{person_id}",
+                               {"tmdbid": tmdbid, "name": name, "image": image, "updated": time.time()})
+
+    def get_tmdb(self, tmdbid: str) -> Optional[dict]:
+        """
+        获取TMDB人物详情
+        :return: {"name": 中文名, "overview": 中文描述, "profile": 图片路径}
+        """
+        value = self.__get(f"{self._tmdb_prefix}{tmdbid}")
+        if not value:
+            return None
+        return {"name": value.get("name"), "overview": value.get("overview"), "profile": value.get("profile")}
+
+    def set_tmdb(self, tmdbid: str, name: Optional[str], overview: Optional[str], profile: Optional[str]):
+        """
+        记录TMDB人物详情
+        """
+        self._plugin.save_data(f"{self._tmdb_prefix}{tmdbid}",
+                               {"name": name, "overview": overview, "profile": profile, "updated": time.time()})
+
+    def clear(self):
+        """
+        清除缓存
+        """
+        for data in self._plugin.get_data(key=None) or []:
+            if data.key.startswith((self._people_prefix, self._tmdb_prefix)):
+                self._plugin.del_data(key=data.key)
@@ -0,0 +1,41 @@
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    令牌桶限速，按固定速率补充令牌，允许短时间内使用积攒的令牌
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        """
+        :param rate: 每秒补充的令牌数
+        :param capacity: 最多积攒的令牌数
+        """
+        self._rate = rate
+        self._capacity = max(capacity, 1)
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, stop_event: Optional[threading.Event] = None) -> bool:
+        """
+        获取一个令牌，没有令牌时等待
+        :param stop_event: 退出事件，设置后不再等待
+        :return: 是否获取到令牌
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self._rate
+            if stop_event:
+                if stop_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
@@ -1,6 +1,5 @@
 import os
 import threading
-import time
 import traceback
 from pathlib import Path
 from typing import List, Tuple, Dict, Any
@@ -10,6 +9,7 @@ from watchdog.observers import Observer
 from app.db.transferhistory_oper import TransferHistoryOper
 from app.log import logger
 from app.plugins import _PluginBase
+from app.plugins.removelink.linkindex import LinkIndex
 from app.schemas import NotificationType
 from app.core.event import eventmanager
 from app.schemas.types import EventType
@@ -42,7 +42,7 @@ class FileMonitorHandler(FileSystemEventHandler):
         # 新增文件记录
         with state_lock:
             try:
-                self.sync.state_set[str(file_path)] = file_path.stat().st_ino
+                self.sync.state_set.add(str(file_path), file_path.stat().st_ino)
             except Exception as e:
                 logger.error(f"新增文件记录失败：{str(e)}")
 
@@ -58,9 +58,10 @@ class FileMonitorHandler(FileSystemEventHandler):
                 if keyword and keyword in str(file_path):
                     logger.info(f"{file_path} 命中过滤关键字 {keyword}，不处理")
                     return
-        # 新增文件记录
+        # 新增文件记录，移除原文件记录
         with state_lock:
-            self.sync.state_set[str(file_path)] = file_path.stat().st_ino
+            self.sync.state_set.remove(str(Path(event.src_path)))
+            self.sync.state_set.add(str(file_path), file_path.stat().st_ino)
 
     def on_deleted(self, event):
         file_path = Path(event.src_path)
@@ -86,30 +87,6 @@ class FileMonitorHandler(FileSystemEventHandler):
         self.sync.handle_deleted(file_path)
 
 
-def updateState(monitor_dirs: List[str]):
-    """
-    更新监控目录的文件列表
-    """
-    # 记录开始时间
-    start_time = time.time()
-    state_set = {}
-    for mon_path in monitor_dirs:
-        for root, dirs, files in os.walk(mon_path):
-            for file in files:
-                file = Path(root) / file
-                if not file.exists():
-                    continue
-                # 记录文件inode
-                state_set[str(file)] = file.stat().st_ino
-    # 记录结束时间
-    end_time = time.time()
-    # 计算耗时
-    elapsed_time = end_time - start_time
-    logger.info(f"更新文件列表完成，共计{len(state_set)}个文件，耗时：{elapsed_time}秒")
-
-    return state_set
-
-
 class RemoveLink(_PluginBase):
     # 插件名称
     plugin_name = "清理硬链接"
@@ -118,7 +95,7 @@ class RemoveLink(_PluginBase):
     # 插件图标
     plugin_icon = "Ombi_A.png"
     # 插件版本
-    plugin_version = "2.2"
+    plugin_version = "2.3"
     # 插件作者
     plugin_author = "DzAvril"
     # 作者主页
@@ -142,7 +119,7 @@ class RemoveLink(_PluginBase):
     _transferhistory = None
     _observer = []
     # 监控目录的文件列表
-    state_set: Dict[str, int] = {}
+    state_set: LinkIndex = LinkIndex()
 
     def init_plugin(self, config: dict = None):
         logger.info(f"Hello, RemoveLink! config {config}")
@@ -183,9 +160,10 @@ class RemoveLink(_PluginBase):
                     err_msg = str(e)
                     logger.error(f"{mon_path} 启动目录监控失败：{err_msg}")
                     self.systemmessage.put(f"{mon_path} 启动目录监控失败：{err_msg}", title="清理硬链接")
-            # 更新监控集合
+            # 更新监控集合，修改时间未变化的目录使用上次保存的快照
             with state_lock:
-                self.state_set = updateState(monitor_dirs)
+                self.state_set = LinkIndex(snapshot_path=self.get_data_path() / "snapshot.json")
+                self.state_set.scan(monitor_dirs)
 
     def __update_config(self):
         """
@@ -429,6 +407,9 @@ class RemoveLink(_PluginBase):
                 except Exception as e:
                     print(str(e))
                     logger.error(f"停止目录监控失败：{str(e)}")
+            # 保存文件列表快照
+            with state_lock:
+                self.state_set.save()
         self._observer = []
 
     def __is_excluded(self, file_path: Path) -> bool:
@@ -557,39 +538,36 @@ class RemoveLink(_PluginBase):
             # 删除历史记录
             self.delete_history(str(file_path))
             # 删除的文件inode
-            deleted_inode = self.state_set.get(str(file_path))
+            deleted_inode = self.state_set.remove(str(file_path))
             if not deleted_inode:
                 logger.info(f"文件 {file_path} 未在监控列表中，不处理")
                 return
-            else:
-                self.state_set.pop(str(file_path))
             try:
-                # 在current_set中查找与deleted_inode有相同inode的文件并删除
-                for path, inode in self.state_set.copy().items():
-                    if inode == deleted_inode:
-                        file = Path(path)
-                        if self.__is_excluded(file):
-                            logger.info(f"文件 {file} 在不删除目录中，不处理")
-                            continue
-                        # 删除硬链接文件
-                        logger.info(f"删除硬链接文件：{path}， inode: {inode}")
-                        file.unlink()
-                        # 清理刮削文件
-                        self.delete_scrap_infos(file_path)
-                        if self._delete_torrents:
-                            # 发送事件
-                            eventmanager.send_event(
-                                EventType.DownloadFileDeleted, {"src": str(file_path)}
-                            )
-                        # 删除历史记录
-                        self.delete_history(str(file_path))
-                        if self._notify:
-                            self.post_message(
-                                mtype=NotificationType.SiteMessage,
-                                title=f"【清理硬链接】",
-                                text=f"监控到删除源文件：[{file_path}]\n"
-                                     f"同步删除硬链接文件：[{path}]",
-                            )
+                # 查找与deleted_inode有相同inode的文件并删除
+                for path in self.state_set.links(deleted_inode):
+                    file = Path(path)
+                    if self.__is_excluded(file):
+                        logger.info(f"文件 {file} 在不删除目录中，不处理")
+                        continue
+                    # 删除硬链接文件
+                    logger.info(f"删除硬链接文件：{path}， inode: {deleted_inode}")
+                    file.unlink()
+                    # 清理刮削文件
+                    self.delete_scrap_infos(file_path)
+                    if self._delete_torrents:
+                        # 发送事件
+                        eventmanager.send_event(
+                            EventType.DownloadFileDeleted, {"src": str(file_path)}
+                        )
+                    # 删除历史记录
+                    self.delete_history(str(file_path))
+                    if self._notify:
+                        self.post_message(
+                            mtype=NotificationType.SiteMessage,
+                            title=f"【清理硬链接】",
+                            text=f"监控到删除源文件：[{file_path}]\n"
+                                 f"同步删除硬链接文件：[{path}]",
+                        )
             except Exception as e:
                 logger.error(
                     "删除硬链接文件发生错误：%s - %s" % (str(e), traceback.format_exc())
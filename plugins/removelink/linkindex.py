@@ -0,0 +1,164 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from app.log import logger
+
+
+class LinkIndex:
+    """
+    监控目录文件索引，同时维护 文件 -> inode 及 inode -> 文件 的对应关系，删除文件时只需查找同一inode的文件
+    扫描结果按目录记录修改时间保存为快照，重启后只重新扫描修改时间变化的目录
+    """
+
+    # 修改时间距扫描开始不足该秒数的目录可能在扫描过程中仍有变化，不记录到快照
+    _racy_seconds = 2
+
+    def __init__(self, snapshot_path: Optional[Path] = None):
+        """
+        :param snapshot_path: 快照文件路径，为空时不保存快照
+        """
+        self._snapshot_path = snapshot_path
+        self._inodes: Dict[str, int] = {}
+        self._paths: Dict[int, Set[str]] = {}
+        # 目录 -> (修改时间, 子目录)，目录中的文件变化后移除，下次启动时重新扫描
+        self._dirs: Dict[str, tuple] = {}
+
+    def __len__(self):
+        return len(self._inodes)
+
+    def get(self, path: str) -> Optional[int]:
+        return self._inodes.get(path)
+
+    def add(self, path: str, inode: int):
+        """
+        新增文件记录
+        """
+        self.__discard(path)
+        self._inodes[path] = inode
+        self._paths.setdefault(inode, set()).add(path)
+        self._dirs.pop(os.path.dirname(path), None)
+
+    def remove(self, path: str) -> Optional[int]:
+        """
+        移除文件记录
+        :return: 文件的inode，文件不在索引中时返回None
+        """
+        inode = self.__discard(path)
+        if inode is not None:
+            self._dirs.pop(os.path.dirname(path), None)
+        return inode
+
+    def __discard(self, path: str) -> Optional[int]:
+        inode = self._inodes.pop(path, None)
+        if inode is not None:
+            paths = self._paths.get(inode)
+            if paths:
+                paths.discard(path)
+                if not paths:
+                    self._paths.pop(inode, None)
+        return inode
+
+    def links(self, inode: int) -> List[str]:
+        """
+        与inode对应的所有文件
+        """
+        return list(self._paths.get(inode) or [])
+
+    def __load_snapshot(self) -> Dict[str, dict]:
+        if not self._snapshot_path or not self._snapshot_path.exists():
+            return {}
+        try:
+            with open(self._snapshot_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("dirs") or {}
+        except Exception as e:
+            logger.warn(f"读取文件列表快照失败，重新扫描全部目录：{str(e)}")
+            return {}
+
+    def save(self):
+        """
+        保存快照，只保存扫描后未发生变化的目录
+        """
+        if not self._snapshot_path:
+            return
+        files: Dict[str, Dict[str, int]] = {}
+        for path, inode in self._inodes.items():
+            directory, name = os.path.split(path)
+            if directory in self._dirs:
+                files.setdefault(directory, {})[name] = inode
+        dirs = {directory: {"mtime": mtime, "dirs": subdirs, "files": files.get(directory) or {}}
+                for directory, (mtime, subdirs) in self._dirs.items()}
+        tmp_path = self._snapshot_path.with_suffix(".tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"dirs": dirs}, f, ensure_ascii=False)
+            os.replace(tmp_path, self._snapshot_path)
+        except Exception as e:
+            logger.error(f"保存文件列表快照失败：{str(e)}")
+
+    def scan(self, monitor_dirs: List[str]):
+        """
+        扫描监控目录，修改时间未变化的目录直接使用快照中的文件列表
+        """
+        start_time = time.time()
+        snapshot = self.__load_snapshot()
+        self._inodes = {}
+        self._paths = {}
+        self._dirs = {}
+        scanned = reused = 0
+        for mon_path in monitor_dirs:
+            if not mon_path:
+                continue
+            stack = [os.path.normpath(mon_path)]
+            while stack:
+                directory = stack.pop()
+                try:
+                    mtime = os.stat(directory).st_mtime_ns
+                except OSError:
+                    continue
+                cached = snapshot.get(directory)
+                if cached and cached.get("mtime") == mtime:
+                    reused += 1
+                    files = cached.get("files") or {}
+                    subdirs = cached.get("dirs") or []
+                else:
+                    try:
+                        files, subdirs = self.__scan_dir(directory)
+                    except OSError as e:
+                        logger.warn(f"扫描目录 {directory} 失败：{str(e)}")
+                        continue
+                    scanned += 1
+                for name, inode in files.items():
+                    path = os.path.join(directory, name)
+                    self._inodes[path] = inode
+                    self._paths.setdefault(inode, set()).add(path)
+                if start_time - mtime / 1e9 > self._racy_seconds:
+                    self._dirs[directory] = (mtime, subdirs)
+                stack.extend(os.path.join(directory, name) for name in subdirs)
+        self.save()
+        logger.info(f"更新文件列表完成，共计{len(self._inodes)}个文件，扫描目录{scanned}个，"
+                    f"使用快照目录{reused}个，耗时：{time.time() - start_time}秒")
+
+    @staticmethod
+    def __scan_dir(directory: str) -> tuple:
+        """
+        扫描单个目录
+        :return: 文件名 -> inode，子目录名
+        """
+        files: Dict[str, int] = {}
+        subdirs: List[str] = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        # 与os.walk一致，不进入链接的目录
+                        if not entry.is_symlink():
+                            subdirs.append(entry.name)
+                        continue
+                    # 记录文件inode
+                    files[entry.name] = entry.stat().st_ino
+                except OSError:
+                    continue
+        return files, subdirs
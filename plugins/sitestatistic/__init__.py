@@ -4,7 +4,8 @@ import warnings
 from datetime import datetime, timedelta
 from multiprocessing.dummy import Pool as ThreadPool
 from threading import Lock
-from typing import Optional, Any, List, Dict, Tuple
+from typing import Optional, Any, List, Dict, Tuple, Generator
+from urllib.parse import urlsplit
 
 import pytz
 import requests
@@ -22,10 +23,11 @@ from app.helper.module import ModuleHelper
 from app.helper.sites import SitesHelper
 from app.log import logger
 from app.plugins import _PluginBase
+from app.plugins.sitestatistic.asyncengine import AsyncRefreshEngine, async_available
+from app.plugins.sitestatistic.history import SiteHistoryStore
 from app.plugins.sitestatistic.siteuserinfo import ISiteUserInfo
 from app.schemas.types import EventType, NotificationType
 from app.utils.http import RequestUtils
-from app.utils.object import ObjectUtils
 from app.utils.string import StringUtils
 from app.utils.timer import TimerUtils
 
@@ -42,7 +44,7 @@ class SiteStatistic(_PluginBase):
     # 插件图标
     plugin_icon = "statistic.png"
     # 插件版本
-    plugin_version = "4.0.1"
+    plugin_version = "4.1.4"
     # 插件作者
     plugin_author = "lightolly"
     # 作者主页
@@ -61,6 +63,7 @@ class SiteStatistic(_PluginBase):
     _last_update_time: Optional[datetime] = None
     _sites_data: dict = {}
     _site_schema: List[ISiteUserInfo] = None
+    _history: Optional[SiteHistoryStore] = None
 
     # 配置属性
     _enabled: bool = False
@@ -70,6 +73,8 @@ class SiteStatistic(_PluginBase):
     _notify: bool = False
     _queue_cnt: int = 5
     _remove_failed: bool = False
+    _page_concurrency: int = 3
+    _async_refresh: bool = False
     _statistic_type: str = None
     _statistic_sites: list = []
     _dashboard_type: str = "today"
@@ -77,6 +82,8 @@ class SiteStatistic(_PluginBase):
     def init_plugin(self, config: dict = None):
         self.sites = SitesHelper()
         self.siteoper = SiteOper()
+        self._history = SiteHistoryStore(db_path=self.get_data_path() / "history.db")
+        self.__migrate_history()
         # 停止现有任务
         self.stop_service()
 
@@ -89,6 +96,8 @@ class SiteStatistic(_PluginBase):
             self._sitemsg = config.get("sitemsg")
             self._queue_cnt = config.get("queue_cnt")
             self._remove_failed = config.get("remove_failed")
+            self._page_concurrency = config.get("page_concurrency") or 3
+            self._async_refresh = config.get("async_refresh")
             self._statistic_type = config.get("statistic_type") or "all"
             self._statistic_sites = config.get("statistic_sites") or []
             self._dashboard_type = config.get("dashboard_type") or "today"
@@ -165,6 +174,12 @@ class SiteStatistic(_PluginBase):
             "methods": ["GET"],
             "summary": "刷新站点数据",
             "description": "刷新对应域名的站点数据",
+        }, {
+            "path": "/history",
+            "endpoint": self.query_history,
+            "methods": ["GET"],
+            "summary": "查询站点历史数据",
+            "description": "按日期范围查询站点上传量、下载量、魔力值、做种数等历史数据",
         }]
 
     def get_service(self) -> List[Dict[str, Any]]:
@@ -300,7 +315,7 @@ class SiteStatistic(_PluginBase):
                                 'component': 'VCol',
                                 'props': {
                                     'cols': 12,
-                                    'md': 3
+                                    'md': 2
                                 },
                                 'content': [
                                     {
@@ -316,7 +331,23 @@ class SiteStatistic(_PluginBase):
                                 'component': 'VCol',
                                 'props': {
                                     'cols': 12,
-                                    'md': 3
+                                    'md': 2
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextField',
+                                        'props': {
+                                            'model': 'page_concurrency',
+                                            'label': '单站点并发数'
+                                        }
+                                    }
+                                ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 2
                                 },
                                 'content': [
                                     {
@@ -410,6 +441,22 @@ class SiteStatistic(_PluginBase):
                                     }
                                 ]
                             },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 4
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VSwitch',
+                                        'props': {
+                                            'model': 'async_refresh',
+                                            'label': '异步刷新',
+                                        }
+                                    }
+                                ]
+                            },
                         ]
                     }
                 ]
@@ -422,6 +469,8 @@ class SiteStatistic(_PluginBase):
             "cron": "5 1 * * *",
             "queue_cnt": 5,
             "remove_failed": False,
+            "page_concurrency": 3,
+            "async_refresh": False,
             "statistic_type": "all",
             "statistic_sites": [],
             "dashboard_type": 'today'
@@ -435,22 +484,14 @@ class SiteStatistic(_PluginBase):
         stattistic_data: Dict[str, Dict[str, Any]] = {}
         # 昨天数据
         yesterday_sites_data: Dict[str, Dict[str, Any]] = {}
-        # 获取最近所有数据
-        data_list: List[PluginData] = self.get_data(key=None)
-        if not data_list:
+        # 仅读取最近两天的数据
+        days = self._history.latest(2)
+        if not days:
             return "", {}, {}
-        # 取key符合日期格式的数据
-        data_list = [data for data in data_list if re.match(r"\d{4}-\d{2}-\d{2}", data.key)]
-        # 按日期倒序排序
-        data_list.sort(key=lambda x: x.key, reverse=True)
         # 今天的日期
-        today = data_list[0].key
-        # 数据按时间降序排序
-        datas = [json.loads(data.value) for data in data_list if ObjectUtils.is_obj(data.value)]
-        if len(data_list) > 0:
-            stattistic_data = datas[0]
-        if len(data_list) > 1:
-            yesterday_sites_data = datas[1]
+        today, stattistic_data = days[0]
+        if len(days) > 1:
+            yesterday_sites_data = days[1][1]
 
         # 数据按时间降序排序
         stattistic_data = dict(sorted(stattistic_data.items(),
@@ -1128,10 +1169,15 @@ class SiteStatistic(_PluginBase):
     def __build_class(self, html_text: str) -> Any:
         for site_schema in self._site_schema:
             try:
+                # 先通过特征文本快速排除，再执行完整匹配，完整匹配共享同一份解析后的页面
+                if not site_schema.quick_match(html_text):
+                    continue
                 if site_schema.match(html_text):
                     return site_schema
             except Exception as e:
                 logger.error(f"站点匹配失败 {str(e)}")
+        # 未匹配到解析模型时释放匹配过程中解析的页面
+        ISiteUserInfo._clear_html_cache()
         return None
 
     def build(self, site_info: CommentedMap) -> Optional[ISiteUserInfo]:
@@ -1161,88 +1207,133 @@ class SiteStatistic(_PluginBase):
                                                                proxies=proxy_server)
             else:
                 # 普通模式
-                res = RequestUtils(cookies=site_cookie,
-                                   session=session,
-                                   ua=ua,
-                                   proxies=proxies
-                                   ).get_res(url=url)
+                steps = self.__index_steps(site_info)
+                try:
+                    request_url = next(steps)
+                    while True:
+                        request_url = steps.send(RequestUtils(cookies=site_cookie,
+                                                              session=session,
+                                                              ua=ua,
+                                                              proxies=proxies
+                                                              ).get_res(url=request_url))
+                except StopIteration as e:
+                    html_text = e.value
+            return self.__create_site_user_info(site_info=site_info, html_text=html_text, session=session)
+
+    async def __build_async(self, site_info: CommentedMap, engine: AsyncRefreshEngine) -> Optional[ISiteUserInfo]:
+        """
+        通过异步刷新引擎构建站点信息，不支持渲染模式
+        """
+        site_cookie = site_info.get("cookie")
+        if not site_cookie and not site_info.get("apikey") and not site_info.get("token"):
+            return None
+        url = site_info.get("url")
+        steps = self.__index_steps(site_info)
+        try:
+            request_url = next(steps)
+            while True:
+                request_url = steps.send(await engine.fetch(site=urlsplit(url).netloc,
+                                                            url=request_url,
+                                                            cookies=site_cookie,
+                                                            ua=site_info.get("ua"),
+                                                            proxy=site_info.get("proxy")))
+        except StopIteration as e:
+            html_text = e.value
+        return self.__create_site_user_info(site_info=site_info, html_text=html_text)
+
+    @staticmethod
+    def __index_steps(site_info: CommentedMap) -> Generator[str, Any, Optional[str]]:
+        """
+        获取站点首页，产出需要请求的地址，接收响应，返回首页html
+        """
+        site_name = site_info.get("name")
+        url = site_info.get("url")
+        res = yield url
+        if res and res.status_code == 200:
+            if re.search(r"charset=\"?utf-8\"?", res.text, re.IGNORECASE):
+                res.encoding = "utf-8"
+            else:
+                res.encoding = res.apparent_encoding
+            html_text = res.text
+            # 第一次登录反爬
+            if html_text.find("title") == -1:
+                i = html_text.find("window.location")
+                if i == -1:
+                    return None
+                tmp_url = url + html_text[i:html_text.find(";")] \
+                    .replace("\"", "") \
+                    .replace("+", "") \
+                    .replace(" ", "") \
+                    .replace("window.location=", "")
+                res = yield tmp_url
                 if res and res.status_code == 200:
-                    if re.search(r"charset=\"?utf-8\"?", res.text, re.IGNORECASE):
-                        res.encoding = "utf-8"
+                    if "charset=utf-8" in res.text or "charset=UTF-8" in res.text:
+                        res.encoding = "UTF-8"
                     else:
                         res.encoding = res.apparent_encoding
                     html_text = res.text
-                    # 第一次登录反爬
-                    if html_text.find("title") == -1:
-                        i = html_text.find("window.location")
-                        if i == -1:
-                            return None
-                        tmp_url = url + html_text[i:html_text.find(";")] \
-                            .replace("\"", "") \
-                            .replace("+", "") \
-                            .replace(" ", "") \
-                            .replace("window.location=", "")
-                        res = RequestUtils(cookies=site_cookie,
-                                           session=session,
-                                           ua=ua,
-                                           proxies=proxies
-                                           ).get_res(url=tmp_url)
-                        if res and res.status_code == 200:
-                            if "charset=utf-8" in res.text or "charset=UTF-8" in res.text:
-                                res.encoding = "UTF-8"
-                            else:
-                                res.encoding = res.apparent_encoding
-                            html_text = res.text
-                            if not html_text:
-                                return None
-                        elif res is not None:
-                            logger.error("站点 %s 被反爬限制：%s, 状态码：%s" % (site_name, url, res.status_code))
-                            return None
-                        else:
-                            logger.error("站点 %s 无法访问：%s" % (site_name, url))
-                            return None
-
-                    # 兼容假首页情况，假首页通常没有 <link rel="search" 属性
-                    if '"search"' not in html_text and '"csrf-token"' not in html_text:
-                        # 排除掉单页面应用，单页面应用首页包含一个 div 容器
-                        if not re.search(r"id=\"?root\"?", res.text, re.IGNORECASE):
-                            res = RequestUtils(cookies=site_cookie,
-                                               session=session,
-                                               ua=ua,
-                                               proxies=proxies
-                                               ).get_res(url=url + "/index.php")
-                            if res and res.status_code == 200:
-                                if re.search(r"charset=\"?utf-8\"?", res.text, re.IGNORECASE):
-                                    res.encoding = "utf-8"
-                                else:
-                                    res.encoding = res.apparent_encoding
-                                html_text = res.text
-                                if not html_text:
-                                    return None
+                    if not html_text:
+                        return None
                 elif res is not None:
-                    logger.error(f"站点 {site_name} 连接失败，状态码：{res.status_code}")
+                    logger.error("站点 %s 被反爬限制：%s, 状态码：%s" % (site_name, url, res.status_code))
                     return None
                 else:
-                    logger.error(f"站点 {site_name} 无法访问：{url}")
+                    logger.error("站点 %s 无法访问：%s" % (site_name, url))
                     return None
-            # 解析站点类型
-            if html_text:
-                site_schema = self.__build_class(html_text)
-                if not site_schema:
-                    logger.error(f"站点 {site_name} 无法识别站点类型，可能是由于插件代码不全，请尝试强制重装插件以确保代码完整")
-                    return None
-                return site_schema(
-                    site_name=site_name,
-                    url=url,
-                    site_cookie=site_cookie,
-                    apikey=apikey,
-                    token=token,
-                    index_html=html_text,
-                    session=session,
-                    ua=ua,
-                    proxy=proxy)
+
+            # 兼容假首页情况，假首页通常没有 <link rel="search" 属性
+            if '"search"' not in html_text and '"csrf-token"' not in html_text:
+                # 排除掉单页面应用，单页面应用首页包含一个 div 容器
+                if not re.search(r"id=\"?root\"?", res.text, re.IGNORECASE):
+                    res = yield url + "/index.php"
+                    if res and res.status_code == 200:
+                        if re.search(r"charset=\"?utf-8\"?", res.text, re.IGNORECASE):
+                            res.encoding = "utf-8"
+                        else:
+                            res.encoding = res.apparent_encoding
+                        html_text = res.text
+                        if not html_text:
+                            return None
+            return html_text
+        elif res is not None:
+            logger.error(f"站点 {site_name} 连接失败，状态码：{res.status_code}")
+            return None
+        else:
+            logger.error(f"站点 {site_name} 无法访问：{url}")
             return None
 
+    def __create_site_user_info(self, site_info: CommentedMap, html_text: Optional[str],
+                                session: requests.Session = None) -> Optional[ISiteUserInfo]:
+        """
+        根据首页识别站点类型，创建站点解析器
+        """
+        if not html_text:
+            return None
+        site_name = site_info.get("name")
+        site_schema = self.__build_class(html_text)
+        if not site_schema:
+            logger.error(f"站点 {site_name} 无法识别站点类型，可能是由于插件代码不全，请尝试强制重装插件以确保代码完整")
+            return None
+        return site_schema(
+            site_name=site_name,
+            url=site_info.get("url"),
+            site_cookie=site_info.get("cookie"),
+            apikey=site_info.get("apikey"),
+            token=site_info.get("token"),
+            index_html=html_text,
+            session=session,
+            ua=site_info.get("ua"),
+            proxy=site_info.get("proxy"),
+            page_concurrency=self._page_concurrency)
+
+    def query_history(self, apikey: str, start: str = None, end: str = None, site: str = None) -> schemas.Response:
+        """
+        按日期范围查询站点历史数据，可由API调用
+        """
+        if apikey != settings.API_TOKEN:
+            return schemas.Response(success=False, message="API密钥错误")
+        return schemas.Response(success=True, data=self._history.range(start=start, end=end, site=site))
+
     def refresh_by_domain(self, domain: str, apikey: str) -> schemas.Response:
         """
         刷新一个站点数据，可由API调用
@@ -1277,7 +1368,6 @@ class SiteStatistic(_PluginBase):
         site_url = site_info.get('url')
         if not site_url:
             return None
-        unread_msg_notify = True
         try:
             site_user_info: ISiteUserInfo = self.build(site_info=site_info)
             if site_user_info:
@@ -1285,42 +1375,34 @@ class SiteStatistic(_PluginBase):
                 # 开始解析
                 site_user_info.parse()
                 logger.debug(f"站点 {site_name} 解析完成")
+                return self.__update_site_data(site_info=site_info, site_user_info=site_user_info)
 
-                # 获取不到数据时，仅返回错误信息，不做历史数据更新
-                if site_user_info.err_msg:
-                    self._sites_data.update({site_name: {"err_msg": site_user_info.err_msg}})
-                    return None
-
-                if self._sitemsg:
-                    # 发送通知，存在未读消息
-                    self.__notify_unread_msg(site_name, site_user_info, unread_msg_notify)
-
-                # 分享率接近1时，发送消息提醒
-                if site_user_info.ratio and float(site_user_info.ratio) < 1:
-                    self.post_message(mtype=NotificationType.SiteMessage,
-                                      title=f"【站点分享率低预警】",
-                                      text=f"站点 {site_user_info.site_name} 分享率 {site_user_info.ratio}，请注意！")
+        except Exception as e:
+            import traceback
+            logger.error(f"站点 {site_name} 获取流量数据失败：{str(e)}")
+            logger.error(traceback.format_exc())
+        return None
 
-                self._sites_data.update(
-                    {
-                        site_name: {
-                            "upload": site_user_info.upload,
-                            "username": site_user_info.username,
-                            "user_level": site_user_info.user_level,
-                            "join_at": site_user_info.join_at,
-                            "download": site_user_info.download,
-                            "ratio": site_user_info.ratio,
-                            "seeding": site_user_info.seeding,
-                            "seeding_size": site_user_info.seeding_size,
-                            "leeching": site_user_info.leeching,
-                            "bonus": site_user_info.bonus,
-                            "url": site_url,
-                            "err_msg": site_user_info.err_msg,
-                            "message_unread": site_user_info.message_unread,
-                            "updated_at": datetime.now().strftime('%Y-%m-%d')
-                        }
-                    })
-                return site_user_info
+    async def __refresh_site_data_async(self, site_info: CommentedMap,
+                                        engine: AsyncRefreshEngine) -> Optional[ISiteUserInfo]:
+        """
+        通过异步刷新引擎更新单个站点数据，渲染模式、使用socks代理的站点及不支持异步的解析模型在线程池中同步处理
+        """
+        site_name = site_info.get('name')
+        if not site_info.get('url'):
+            return None
+        if site_info.get("render") or (site_info.get("proxy") and not engine.supports_proxy()):
+            return await engine.run_sync(self.__refresh_site_data, site_info)
+        try:
+            site_user_info: ISiteUserInfo = await self.__build_async(site_info=site_info, engine=engine)
+            if site_user_info:
+                logger.debug(f"站点 {site_name} 开始以 {site_user_info.site_schema()} 模型解析")
+                if site_user_info.async_fetch:
+                    await site_user_info.parse_async(engine)
+                else:
+                    await engine.run_sync(site_user_info.parse)
+                logger.debug(f"站点 {site_name} 解析完成")
+                return self.__update_site_data(site_info=site_info, site_user_info=site_user_info)
 
         except Exception as e:
             import traceback
@@ -1328,6 +1410,48 @@ class SiteStatistic(_PluginBase):
             logger.error(traceback.format_exc())
         return None
 
+    def __update_site_data(self, site_info: CommentedMap, site_user_info: ISiteUserInfo) -> Optional[ISiteUserInfo]:
+        """
+        保存解析后的站点数据，发送未读消息及分享率通知
+        """
+        site_name = site_info.get('name')
+        unread_msg_notify = True
+        # 获取不到数据时，仅返回错误信息，不做历史数据更新
+        if site_user_info.err_msg:
+            self._sites_data.update({site_name: {"err_msg": site_user_info.err_msg}})
+            return None
+
+        if self._sitemsg:
+            # 发送通知，存在未读消息
+            self.__notify_unread_msg(site_name, site_user_info, unread_msg_notify)
+
+        # 分享率接近1时，发送消息提醒
+        if site_user_info.ratio and float(site_user_info.ratio) < 1:
+            self.post_message(mtype=NotificationType.SiteMessage,
+                              title=f"【站点分享率低预警】",
+                              text=f"站点 {site_user_info.site_name} 分享率 {site_user_info.ratio}，请注意！")
+
+        self._sites_data.update(
+            {
+                site_name: {
+                    "upload": site_user_info.upload,
+                    "username": site_user_info.username,
+                    "user_level": site_user_info.user_level,
+                    "join_at": site_user_info.join_at,
+                    "download": site_user_info.download,
+                    "ratio": site_user_info.ratio,
+                    "seeding": site_user_info.seeding,
+                    "seeding_size": site_user_info.seeding_size,
+                    "leeching": site_user_info.leeching,
+                    "bonus": site_user_info.bonus,
+                    "url": site_info.get('url'),
+                    "err_msg": site_user_info.err_msg,
+                    "message_unread": site_user_info.message_unread,
+                    "updated_at": datetime.now().strftime('%Y-%m-%d')
+                }
+            })
+        return site_user_info
+
     def __notify_unread_msg(self, site_name: str, site_user_info: ISiteUserInfo, unread_msg_notify: bool):
         if site_user_info.message_unread <= 0:
             return
@@ -1391,15 +1515,22 @@ class SiteStatistic(_PluginBase):
             today_date = datetime.now().strftime('%Y-%m-%d')
             if self._statistic_type == "add" or not self._remove_failed:
                 if last_update_time := self.get_data("last_update_time"):
-                    yesterday_sites_data = self.get_data(last_update_time) or {}
+                    yesterday_sites_data = self._history.get_day(last_update_time)
 
             if not self._remove_failed and yesterday_sites_data:
                 site_names = [site.get("name") for site in refresh_sites]
                 self._sites_data = {k: v for k, v in yesterday_sites_data.items() if k in site_names}
 
             # 并发刷新
-            with ThreadPool(min(len(refresh_sites), int(self._queue_cnt or 5))) as p:
-                p.map(self.__refresh_site_data, refresh_sites)
+            if self._async_refresh and async_available():
+                engine = AsyncRefreshEngine(site_concurrency=self._page_concurrency,
+                                            sync_workers=min(len(refresh_sites), int(self._queue_cnt or 5)))
+                engine.run(lambda site: self.__refresh_site_data_async(site, engine), refresh_sites)
+            else:
+                if self._async_refresh:
+                    logger.warn("未安装aiohttp，无法异步刷新，使用多线程刷新站点数据")
+                with ThreadPool(min(len(refresh_sites), int(self._queue_cnt or 5))) as p:
+                    p.map(self.__refresh_site_data, refresh_sites)
 
             # 通知刷新完成
             if self._notify:
@@ -1443,7 +1574,7 @@ class SiteStatistic(_PluginBase):
                                       title="站点数据统计", text="\n".join(sorted_messages))
 
             # 保存数据
-            self.save_data(today_date, self._sites_data)
+            self._history.save_day(today_date, self._sites_data)
 
             # 更新时间
             self.save_data("last_update_time", today_date)
@@ -1454,6 +1585,30 @@ class SiteStatistic(_PluginBase):
 
             logger.info("站点数据刷新完成")
 
+    def __migrate_history(self):
+        """
+        将旧版本按日期保存的站点数据一次性迁移到时间序列存储中
+        """
+        if not self._history.is_empty():
+            return
+        data_list: List[PluginData] = self.get_data(key=None)
+        if not data_list:
+            return
+        data_list = [data for data in data_list if re.match(r"\d{4}-\d{2}-\d{2}$", data.key)]
+        if not data_list:
+            return
+        logger.info(f"开始迁移站点历史数据，共 {len(data_list)} 天 ...")
+        for data in data_list:
+            try:
+                value = json.loads(data.value) if isinstance(data.value, str) else data.value
+                if not isinstance(value, dict):
+                    continue
+                self._history.save_day(data.key, value)
+                self.del_data(key=data.key)
+            except Exception as e:
+                logger.error(f"迁移站点历史数据 {data.key} 失败：{str(e)}")
+        logger.info("站点历史数据迁移完成")
+
     def __custom_sites(self) -> List[Any]:
         custom_sites = []
         custom_sites_config = self.get_config("CustomSites")
@@ -1470,6 +1625,8 @@ class SiteStatistic(_PluginBase):
             "sitemsg": self._sitemsg,
             "queue_cnt": self._queue_cnt,
             "remove_failed": self._remove_failed,
+            "page_concurrency": self._page_concurrency,
+            "async_refresh": self._async_refresh,
             "statistic_type": self._statistic_type,
             "statistic_sites": self._statistic_sites,
             "dashboard_type": self._dashboard_type
@@ -0,0 +1,155 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from requests.compat import chardet
+
+from app.core.config import settings
+from app.log import logger
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+def async_available() -> bool:
+    """
+    是否可以使用异步刷新（依赖aiohttp）
+    """
+    return aiohttp is not None
+
+
+class AsyncResponse:
+    """
+    异步请求的响应，提供与requests.Response一致的status_code、encoding、apparent_encoding、text、json()
+    """
+
+    def __init__(self, status_code: int, content: bytes, encoding: Optional[str] = None):
+        self.status_code = status_code
+        self.content = content
+        self.encoding = encoding
+
+    def __bool__(self):
+        return self.status_code < 400
+
+    @property
+    def apparent_encoding(self) -> str:
+        return chardet.detect(self.content)["encoding"] or "utf-8"
+
+    @property
+    def text(self) -> str:
+        if not self.content:
+            return ""
+        return self.content.decode(self.encoding or self.apparent_encoding, errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+
+class AsyncRefreshEngine:
+    """
+    异步刷新引擎，所有站点共用一个连接池，同一主机的连接保持复用
+    单个站点的并发请求数由站点信号量控制，无法异步处理的站点在线程池中同步处理
+    """
+
+    def __init__(self, site_concurrency: int, sync_workers: int, connection_limit: int = 100):
+        """
+        :param site_concurrency: 单个站点的最大并发请求数
+        :param sync_workers: 同步处理站点的线程数
+        :param connection_limit: 连接池最大连接数
+        """
+        self._site_concurrency = max(int(site_concurrency or 1), 1)
+        self._sync_workers = max(int(sync_workers or 1), 1)
+        self._connection_limit = connection_limit
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def run(self, func: Callable[[Any], Awaitable[Any]], items: Iterable[Any]) -> List[Any]:
+        """
+        并发执行所有任务，任务异常时对应结果为异常对象
+        :param func: 异步任务
+        :param items: 任务参数
+        """
+        self._executor = ThreadPoolExecutor(max_workers=self._sync_workers)
+        try:
+            return asyncio.run(self.__run(func, items))
+        finally:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            self._semaphores = {}
+
+    async def __run(self, func: Callable[[Any], Awaitable[Any]], items: Iterable[Any]) -> List[Any]:
+        connector = aiohttp.TCPConnector(limit=self._connection_limit, ssl=False, ttl_dns_cache=300)
+        async with aiohttp.ClientSession(connector=connector,
+                                         cookie_jar=aiohttp.CookieJar(unsafe=True)) as session:
+            self._session = session
+            try:
+                return await asyncio.gather(*[func(item) for item in items], return_exceptions=True)
+            finally:
+                self._session = None
+
+    async def run_sync(self, func: Callable, *args) -> Any:
+        """
+        在线程池中执行同步方法
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    @staticmethod
+    def proxy_url() -> Optional[str]:
+        """
+        异步请求使用的代理地址
+        """
+        proxies = settings.PROXY or {}
+        return proxies.get("https") or proxies.get("http")
+
+    def supports_proxy(self) -> bool:
+        """
+        是否支持当前代理，aiohttp仅支持http代理，socks代理的站点需同步处理
+        """
+        proxy = self.proxy_url()
+        return not proxy or proxy.startswith("http")
+
+    def __semaphore(self, site: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(site)
+        if semaphore is None:
+            semaphore = self._semaphores[site] = asyncio.Semaphore(self._site_concurrency)
+        return semaphore
+
+    async def fetch(self, site: str, url: str, cookies: Optional[str] = None, headers: Optional[dict] = None,
+                    ua: Optional[str] = None, proxy: bool = False, data: Any = None, json_data: Any = None,
+                    timeout: int = 20) -> Optional[AsyncResponse]:
+        """
+        请求页面，有请求参数时使用POST
+        :param site: 站点，同一站点的请求受站点信号量限制
+        :param url: 地址
+        :param cookies: Cookie字符串
+        :param headers: 请求头
+        :param ua: User-Agent，请求头中没有时使用
+        :param proxy: 是否使用代理
+        :param data: 表单参数
+        :param json_data: json参数
+        :param timeout: 超时时间（秒）
+        :return: 响应，请求失败时返回None
+        """
+        req_headers = dict(headers or {})
+        req_headers.setdefault("User-Agent", ua or settings.USER_AGENT)
+        if cookies:
+            req_headers["Cookie"] = cookies
+        method = "POST" if data is not None or json_data is not None else "GET"
+        async with self.__semaphore(site):
+            try:
+                async with self._session.request(method, url,
+                                                 headers=req_headers,
+                                                 data=data,
+                                                 json=json_data,
+                                                 proxy=self.proxy_url() if proxy else None,
+                                                 timeout=aiohttp.ClientTimeout(total=timeout)) as res:
+                    return AsyncResponse(status_code=res.status,
+                                         content=await res.read(),
+                                         encoding=res.charset)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.debug(f"{url} 请求失败：{str(e) or type(e).__name__}")
+                return None
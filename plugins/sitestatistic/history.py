@@ -0,0 +1,136 @@
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Any
+
+from app.log import logger
+
+
+class SiteHistoryStore:
+    """
+    站点数据时间序列存储，每个站点每天一条记录，上传量等数值单独成列便于按日期范围查询
+    """
+
+    def __init__(self, db_path: Path):
+        self._db_path = str(db_path)
+        self._lock = threading.Lock()
+        self.__init_db()
+
+    @contextmanager
+    def __connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def __init_db(self):
+        with self.__connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS samples (
+                    date TEXT NOT NULL,
+                    site TEXT NOT NULL,
+                    upload INTEGER NOT NULL DEFAULT 0,
+                    download INTEGER NOT NULL DEFAULT 0,
+                    bonus REAL NOT NULL DEFAULT 0,
+                    seeding INTEGER NOT NULL DEFAULT 0,
+                    seeding_size INTEGER NOT NULL DEFAULT 0,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (date, site)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_samples_site_date ON samples (site, date)")
+
+    @staticmethod
+    def __number(value: Any, convert=int):
+        try:
+            return convert(float(str(value).replace(",", ""))) if value not in (None, "") else 0
+        except (ValueError, TypeError):
+            return 0
+
+    def is_empty(self) -> bool:
+        """
+        是否没有任何数据
+        """
+        with self.__connect() as conn:
+            return conn.execute("SELECT 1 FROM samples LIMIT 1").fetchone() is None
+
+    def save_day(self, date: str, sites_data: Dict[str, dict]):
+        """
+        保存某一天所有站点的数据，覆盖当天已有数据
+        """
+        rows = [(date, site,
+                 self.__number(data.get("upload")),
+                 self.__number(data.get("download")),
+                 self.__number(data.get("bonus"), float),
+                 self.__number(data.get("seeding")),
+                 self.__number(data.get("seeding_size")),
+                 json.dumps(data, ensure_ascii=False))
+                for site, data in (sites_data or {}).items() if isinstance(data, dict)]
+        with self._lock:
+            with self.__connect() as conn:
+                conn.execute("DELETE FROM samples WHERE date = ?", (date,))
+                if rows:
+                    conn.executemany("INSERT INTO samples "
+                                     "(date, site, upload, download, bonus, seeding, seeding_size, data) "
+                                     "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def get_day(self, date: str) -> Dict[str, dict]:
+        """
+        获取某一天所有站点的数据
+        """
+        with self.__connect() as conn:
+            rows = conn.execute("SELECT site, data FROM samples WHERE date = ?", (date,)).fetchall()
+        return self.__to_sites_data(rows)
+
+    def latest(self, n: int = 1) -> List[Tuple[str, Dict[str, dict]]]:
+        """
+        获取最近n天的站点数据，按日期倒序
+        """
+        with self.__connect() as conn:
+            dates = [row[0] for row in conn.execute("SELECT DISTINCT date FROM samples ORDER BY date DESC LIMIT ?",
+                                                    (n,))]
+            if not dates:
+                return []
+            rows = conn.execute(f"SELECT date, site, data FROM samples WHERE date IN ({','.join('?' * len(dates))})",
+                                dates).fetchall()
+        days: Dict[str, list] = {date: [] for date in dates}
+        for date, site, data in rows:
+            days[date].append((site, data))
+        return [(date, self.__to_sites_data(days[date])) for date in dates]
+
+    def range(self, start: Optional[str] = None, end: Optional[str] = None,
+              site: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        按日期范围查询数值数据，日期格式为YYYY-MM-DD，包含起止日期
+        """
+        conditions, params = [], []
+        if start:
+            conditions.append("date >= ?")
+            params.append(start)
+        if end:
+            conditions.append("date <= ?")
+            params.append(end)
+        if site:
+            conditions.append("site = ?")
+            params.append(site)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.__connect() as conn:
+            rows = conn.execute(f"SELECT date, site, upload, download, bonus, seeding, seeding_size "
+                                f"FROM samples {where} ORDER BY date, site", params).fetchall()
+        return [{"date": date, "site": site_name, "upload": upload, "download": download, "bonus": bonus,
+                 "seeding": seeding, "seeding_size": seeding_size}
+                for date, site_name, upload, download, bonus, seeding, seeding_size in rows]
+
+    @staticmethod
+    def __to_sites_data(rows) -> Dict[str, dict]:
+        sites_data = {}
+        for site, data in rows:
+            try:
+                sites_data[site] = json.loads(data)
+            except Exception as e:
+                logger.error(f"站点数据解析失败：{site} - {str(e)}")
+        return sites_data
@@ -1,11 +1,16 @@
 # -*- coding: utf-8 -*-
+import asyncio
 import json
 import re
+import threading
 from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
 from enum import Enum
-from typing import Optional
+from multiprocessing.dummy import Pool as ThreadPool
+from typing import Any, Dict, Generator, List, NamedTuple, Optional, Tuple, Union
 from urllib.parse import urljoin, urlsplit
 
+from lxml import etree
 from requests import Session
 
 from app.core.config import settings
@@ -16,6 +21,28 @@ from app.utils.site import SiteUtils
 
 SITE_BASE_ORDER = 1000
 
+# 每个线程缓存的已解析页面数量
+HTML_CACHE_SIZE = 8
+
+# 已解析页面缓存，按线程隔离，避免lxml文档跨线程共享
+_html_cache = threading.local()
+
+
+class PageRequest(NamedTuple):
+    """
+    解析过程中需要请求的页面
+    """
+    # 网页地址
+    url: str
+    # post参数
+    params: Optional[dict] = None
+    # 额外的请求头
+    headers: Optional[dict] = None
+
+
+# 解析步骤，产出需要请求的页面（并发获取时为列表），接收页面内容（并发获取时为列表）
+PageSteps = Generator[Union[PageRequest, List[PageRequest]], Union[str, List[str]], None]
+
 
 # 站点框架
 class SiteSchema(Enum):
@@ -43,6 +70,10 @@ class ISiteUserInfo(metaclass=ABCMeta):
     order = SITE_BASE_ORDER
     # 请求模式 cookie/apikey
     request_mode = "cookie"
+    # 站点首页必然包含的特征文本（任一），为空时总是执行match，用于match需要解析页面时在完整匹配前快速排除不可能的解析模型
+    match_keywords: Tuple[str, ...] = ()
+    # 是否支持异步刷新，解析方法中直接请求页面的解析模型需设为False
+    async_fetch = True
 
     def __init__(self, site_name: str,
                  url: str,
@@ -53,7 +84,8 @@ class ISiteUserInfo(metaclass=ABCMeta):
                  session: Session = None,
                  ua: str = None,
                  emulate: bool = False,
-                 proxy: bool = None):
+                 proxy: bool = None,
+                 page_concurrency: int = 1):
         super().__init__()
         # 站点信息
         self.site_name = None
@@ -129,6 +161,10 @@ class ISiteUserInfo(metaclass=ABCMeta):
 
         self._emulate = emulate
         self._proxy = proxy
+        # 单站点并发请求数，大于1时并发获取做种分页，1为逐页获取
+        self._page_concurrency = max(int(page_concurrency or 1), 1)
+        # 已处理干扰部分的页面，随解析器释放
+        self._prepared_html: Dict[str, str] = {}
 
     def site_schema(self) -> SiteSchema:
         """
@@ -146,11 +182,106 @@ class ISiteUserInfo(metaclass=ABCMeta):
         """
         pass
 
+    @classmethod
+    def quick_match(cls, html_text: str) -> bool:
+        """
+        根据特征文本快速判断是否可能匹配当前解析模型
+        :param html_text: 站点首页html
+        :return: 是否可能匹配
+        """
+        if not cls.match_keywords:
+            return True
+        return any(keyword in html_text for keyword in cls.match_keywords)
+
+    @staticmethod
+    def _parse_html(html_text: str):
+        """
+        解析html为lxml文档，同一线程内相同页面只解析一次
+        """
+        if not html_text:
+            return etree.HTML(html_text)
+        cache: Optional[OrderedDict] = getattr(_html_cache, "documents", None)
+        if cache is None:
+            cache = _html_cache.documents = OrderedDict()
+        if html_text in cache:
+            cache.move_to_end(html_text)
+            return cache[html_text]
+        html = etree.HTML(html_text)
+        cache[html_text] = html
+        if len(cache) > HTML_CACHE_SIZE:
+            cache.popitem(last=False)
+        return html
+
+    @staticmethod
+    def _clear_html_cache():
+        """
+        清理当前线程已解析页面缓存
+        """
+        cache: Optional[OrderedDict] = getattr(_html_cache, "documents", None)
+        if cache:
+            cache.clear()
+
     def parse(self):
         """
         解析站点信息
         :return:
         """
+        try:
+            steps = self._parse_pages()
+            request = self._next_request(steps)
+            while request is not None:
+                request = self._next_request(steps, self._fetch_pages(request))
+        finally:
+            # 解析完成或失败后均释放缓存的页面
+            self._prepared_html.clear()
+            self._clear_html_cache()
+
+    async def parse_async(self, engine):
+        """
+        通过异步刷新引擎解析站点信息，分页并发数由引擎的站点信号量控制
+        :param engine: AsyncRefreshEngine
+        """
+        try:
+            steps = self._parse_pages()
+            request = self._next_request(steps)
+            while request is not None:
+                if isinstance(request, list):
+                    content = list(await asyncio.gather(
+                        *[self._get_page_content_async(engine, page) for page in request]))
+                else:
+                    content = await self._get_page_content_async(engine, request)
+                request = self._next_request(steps, content)
+        finally:
+            self._prepared_html.clear()
+            self._clear_html_cache()
+
+    @staticmethod
+    def _next_request(steps: Generator, content: Any = None) -> Union[PageRequest, List[PageRequest], None]:
+        """
+        将页面内容交给解析步骤，获取下一个需要请求的页面，解析结束时返回None
+        """
+        try:
+            return steps.send(content)
+        except StopIteration:
+            return None
+
+    def _fetch_pages(self, request: Union[PageRequest, List[PageRequest]]) -> Union[str, List[str]]:
+        """
+        同步获取页面，多个页面时按分页并发数并发获取
+        """
+        if not isinstance(request, list):
+            return self._get_page_content(url=request.url, params=request.params, headers=request.headers)
+        logger.debug(f"{self.site_name} 并发获取做种分页 {len(request)} 页")
+        with ThreadPool(min(len(request), self._page_concurrency)) as p:
+            return p.map(lambda page: self._get_page_content(url=page.url,
+                                                             params=page.params,
+                                                             headers=page.headers),
+                         request)
+
+    def _parse_pages(self) -> PageSteps:
+        """
+        依次解析站点各页面，需要请求页面时产出PageRequest（并发获取时为列表），接收页面内容
+        """
         # 检查是否已经登录
         if not self._parse_logged_in(self._index_html):
             return
@@ -159,39 +290,33 @@ class ISiteUserInfo(metaclass=ABCMeta):
         # 解析用户基础信息
         if self._user_basic_page:
             self._parse_user_base_info(
-                self._get_page_content(
-                    url=urljoin(self._base_url, self._user_basic_page),
-                    params=self._user_basic_params,
-                    headers=self._user_basic_headers
-                )
+                (yield PageRequest(url=urljoin(self._base_url, self._user_basic_page),
+                                   params=self._user_basic_params,
+                                   headers=self._user_basic_headers))
             )
         else:
             self._parse_user_base_info(self._index_html)
         # 解析用户详细信息
         if self._user_detail_page:
             self._parse_user_detail_info(
-                self._get_page_content(
-                    url=urljoin(self._base_url, self._user_detail_page),
-                    params=self._user_detail_params,
-                    headers=self._user_detail_headers
-                )
+                (yield PageRequest(url=urljoin(self._base_url, self._user_detail_page),
+                                   params=self._user_detail_params,
+                                   headers=self._user_detail_headers))
             )
         # 解析用户未读消息
-        self._pase_unread_msgs()
+        yield from self._pase_unread_msgs()
         # 解析用户上传、下载、分享率等信息
         if self._user_traffic_page:
             self._parse_user_traffic_info(
-                self._get_page_content(
-                    url=urljoin(self._base_url, self._user_traffic_page),
-                    params=self._user_traffic_params,
-                    headers=self._user_traffic_headers
-                )
+                (yield PageRequest(url=urljoin(self._base_url, self._user_traffic_page),
+                                   params=self._user_traffic_params,
+                                   headers=self._user_traffic_headers))
             )
         # 解析用户做种信息
-        self._parse_seeding_pages()
+        yield from self._parse_seeding_pages()
         self.seeding_info = json.dumps(self.seeding_info)
 
-    def _pase_unread_msgs(self):
+    def _pase_unread_msgs(self) -> PageSteps:
         """
         解析所有未读消息标题和内容
         :return:
@@ -204,19 +329,15 @@ class ISiteUserInfo(metaclass=ABCMeta):
                     continue
                 msg_links = []
                 next_page = self._parse_message_unread_links(
-                    self._get_page_content(
-                        url=urljoin(self._base_url, link),
-                        params=self._mail_unread_params,
-                        headers=self._mail_unread_headers
-                    ),
+                    (yield PageRequest(url=urljoin(self._base_url, link),
+                                       params=self._mail_unread_params,
+                                       headers=self._mail_unread_headers)),
                     msg_links)
                 while next_page:
                     next_page = self._parse_message_unread_links(
-                        self._get_page_content(
-                            url=urljoin(self._base_url, next_page),
-                            params=self._mail_unread_params,
-                            headers=self._mail_unread_headers
-                        ),
+                        (yield PageRequest(url=urljoin(self._base_url, next_page),
+                                           params=self._mail_unread_params,
+                                           headers=self._mail_unread_headers)),
                         msg_links
                     )
                 unread_msg_links.extend(msg_links)
@@ -227,45 +348,66 @@ class ISiteUserInfo(metaclass=ABCMeta):
         for msg_link in unread_msg_links:
             logger.debug(f"{self.site_name} 信息链接 {msg_link}")
             head, date, content = self._parse_message_content(
-                self._get_page_content(
-                    urljoin(self._base_url, msg_link),
-                    params=self._mail_content_params,
-                    headers=self._mail_content_headers
-                )
+                (yield PageRequest(url=urljoin(self._base_url, msg_link),
+                                   params=self._mail_content_params,
+                                   headers=self._mail_content_headers))
             )
             logger.debug(f"{self.site_name} 标题 {head} 时间 {date} 内容 {content}")
             self.message_unread_contents.append((head, date, content))
 
-    def _parse_seeding_pages(self):
+    def _parse_seeding_pages(self) -> PageSteps:
         """
         解析做种页面
         """
         if self._torrent_seeding_page:
             # 第一页
             next_page = self._parse_user_torrent_seeding_info(
-                self._get_page_content(
-                    url=urljoin(self._base_url, self._torrent_seeding_page),
-                    params=self._torrent_seeding_params,
-                    headers=self._torrent_seeding_headers
-                )
+                (yield PageRequest(url=urljoin(self._base_url, self._torrent_seeding_page),
+                                   params=self._torrent_seeding_params,
+                                   headers=self._torrent_seeding_headers))
             )
 
             # 其他页处理
+            base_url = urljoin(self._base_url, self._torrent_seeding_page)
             while next_page is not None and next_page is not False:
-                next_page = self._parse_user_torrent_seeding_info(
-                    self._get_page_content(
-                        url=urljoin(urljoin(self._base_url, self._torrent_seeding_page), next_page),
-                        params=self._torrent_seeding_params,
-                        headers=self._torrent_seeding_headers
-                    ),
-                    multi_page=True)
+                html_text = yield PageRequest(url=urljoin(base_url, next_page),
+                                              params=self._torrent_seeding_params,
+                                              headers=self._torrent_seeding_headers)
+                current_page = next_page
+                next_page = self._parse_user_torrent_seeding_info(html_text, multi_page=True)
+                if not next_page or self._page_concurrency <= 1:
+                    continue
+                # 并发获取分页栏中可见的分页，分页栏只显示部分页码时，继续从最后一页的下页获取
+                page_urls = self._get_seeding_page_urls(html_text=html_text, current_page=current_page,
+                                                        next_page=next_page)
+                if not page_urls:
+                    continue
+                pages = yield [PageRequest(url=urljoin(base_url, page_url),
+                                           params=self._torrent_seeding_params,
+                                           headers=self._torrent_seeding_headers) for page_url in page_urls]
+                # 按分页顺序依次解析
+                for page_html in pages:
+                    next_page = self._parse_user_torrent_seeding_info(page_html, multi_page=True)
 
-    @staticmethod
-    def _prepare_html_text(html_text):
+    def _get_seeding_page_urls(self, html_text: str, current_page: str, next_page: str) -> Optional[List[str]]:
         """
-        处理掉HTML中的干扰部分
+        根据当前做种分页的分页栏获取后续分页地址，无法确定页码时返回None，逐页获取
+        :param html_text: 当前分页内容
+        :param current_page: 当前分页地址
+        :param next_page: 下页地址
+        :return: 下页至分页栏中最大页码的分页地址
         """
-        return re.sub(r"#\d+", "", re.sub(r"\d+px", "", html_text))
+        return None
+
+    def _prepare_html_text(self, html_text):
+        """
+        处理掉HTML中的干扰部分，同一解析器内相同页面只处理一次
+        """
+        prepared = self._prepared_html.get(html_text)
+        if prepared is None:
+            prepared = re.sub(r"#\d+", "", re.sub(r"\d+px", "", html_text))
+            self._prepared_html[html_text] = prepared
+        return prepared
 
     @abstractmethod
     def _parse_message_unread_links(self, html_text: str, msg_links: list) -> Optional[str]:
@@ -276,15 +418,12 @@ class ISiteUserInfo(metaclass=ABCMeta):
         """
         pass
 
-    def _get_page_content(self, url: str, params: dict = None, headers: dict = None):
+    def _get_request_headers(self, headers: dict = None) -> Optional[dict]:
         """
-        :param url: 网页地址
-        :param params: post参数
+        生成页面请求头
         :param headers: 额外的请求头
-        :return:
         """
         req_headers = None
-        proxies = settings.PROXY if self._proxy else None
         if self._ua or headers or self._addition_headers:
             req_headers = {
                 "User-Agent": f"{self._ua}"
@@ -298,6 +437,40 @@ class ISiteUserInfo(metaclass=ABCMeta):
                 })
             if self._addition_headers:
                 req_headers.update(self._addition_headers)
+        return req_headers
+
+    def _get_response_text(self, res, req_headers: Optional[dict]) -> str:
+        """
+        获取响应内容
+        :param res: requests.Response或AsyncResponse
+        :param req_headers: 请求头
+        """
+        if res is not None and res.status_code in (200, 500, 403):
+            if req_headers and "application/json" in str(req_headers.get("Accept")):
+                return json.dumps(res.json())
+            else:
+                # 如果cloudflare 有防护，尝试使用浏览器仿真
+                if under_challenge(res.text):
+                    logger.warn(
+                        f"{self.site_name} 检测到Cloudflare，请更新Cookie和UA")
+                    return ""
+                if re.search(r"charset=\"?utf-8\"?", res.text, re.IGNORECASE):
+                    res.encoding = "utf-8"
+                else:
+                    res.encoding = res.apparent_encoding
+                return res.text
+
+        return ""
+
+    def _get_page_content(self, url: str, params: dict = None, headers: dict = None):
+        """
+        :param url: 网页地址
+        :param params: post参数
+        :param headers: 额外的请求头
+        :return:
+        """
+        req_headers = self._get_request_headers(headers)
+        proxies = settings.PROXY if self._proxy else None
 
         if self.request_mode == "apikey":
             # 使用apikey请求，通过请求头传递
@@ -327,22 +500,32 @@ class ISiteUserInfo(metaclass=ABCMeta):
                                timeout=60,
                                proxies=proxies,
                                headers=req_headers).get_res(url=url)
-        if res is not None and res.status_code in (200, 500, 403):
-            if req_headers and "application/json" in str(req_headers.get("Accept")):
-                return json.dumps(res.json())
-            else:
-                # 如果cloudflare 有防护，尝试使用浏览器仿真
-                if under_challenge(res.text):
-                    logger.warn(
-                        f"{self.site_name} 检测到Cloudflare，请更新Cookie和UA")
-                    return ""
-                if re.search(r"charset=\"?utf-8\"?", res.text, re.IGNORECASE):
-                    res.encoding = "utf-8"
-                else:
-                    res.encoding = res.apparent_encoding
-                return res.text
+        return self._get_response_text(res, req_headers)
 
-        return ""
+    async def _get_page_content_async(self, engine, request: PageRequest) -> str:
+        """
+        通过异步刷新引擎获取页面内容
+        :param engine: AsyncRefreshEngine
+        :param request: 页面请求
+        """
+        req_headers = self._get_request_headers(request.headers)
+        cookie = None if self.request_mode == "apikey" else self._site_cookie
+        json_data, data = None, None
+        if request.params:
+            if req_headers.get("Content-Type") == "application/json":
+                json_data = request.params
+            else:
+                data = request.params
+        res = await engine.fetch(site=self.site_domain,
+                                 url=request.url,
+                                 cookies=cookie,
+                                 headers=req_headers,
+                                 ua=self._ua,
+                                 proxy=self._proxy,
+                                 data=data,
+                                 json_data=json_data,
+                                 timeout=60)
+        return self._get_response_text(res, req_headers)
 
     @abstractmethod
     def _parse_site_page(self, html_text: str):
@@ -2,8 +2,6 @@
 import re
 from typing import Optional
 
-from lxml import etree
-
 from app.plugins.sitestatistic.siteuserinfo import ISiteUserInfo, SITE_BASE_ORDER, SiteSchema
 from app.utils.string import StringUtils
 
@@ -11,10 +9,11 @@ from app.utils.string import StringUtils
 class FileListSiteUserInfo(ISiteUserInfo):
     schema = SiteSchema.FileList
     order = SITE_BASE_ORDER + 50
+    match_keywords = ("FileList",)
 
     @classmethod
     def match(cls, html_text: str) -> bool:
-        html = etree.HTML(html_text)
+        html = cls._parse_html(html_text)
         if not html:
             return False
 
@@ -33,7 +32,7 @@ class FileListSiteUserInfo(ISiteUserInfo):
 
     def _parse_user_base_info(self, html_text: str):
         html_text = self._prepare_html_text(html_text)
-        html = etree.HTML(html_text)
+        html = self._parse_html(html_text)
 
         ret = html.xpath(f'//a[contains(@href, "userdetails") and contains(@href, "{self.userid}")]//text()')
         if ret:
@@ -49,7 +48,7 @@ class FileListSiteUserInfo(ISiteUserInfo):
 
     def _parse_user_detail_info(self, html_text: str):
         html_text = self._prepare_html_text(html_text)
-        html = etree.HTML(html_text)
+        html = self._parse_html(html_text)
 
         upload_html = html.xpath('//table//tr/td[text()="Uploaded"]/following-sibling::td//text()')
         if upload_html:
@@ -89,7 +88,7 @@ class FileListSiteUserInfo(ISiteUserInfo):
         :param multi_page: 是否多页数据
         :return: 下页地址
         """
-        html = etree.HTML(html_text)
+        html = self._parse_html(html_text)
         if not html:
             return None
 
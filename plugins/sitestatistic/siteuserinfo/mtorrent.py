@@ -3,8 +3,6 @@ import json
 from typing import Optional, Tuple
 from urllib.parse import urljoin
 
-from lxml import etree
-
 from app.log import logger
 from app.plugins.sitestatistic.siteuserinfo import ISiteUserInfo, SITE_BASE_ORDER, SiteSchema
 from app.utils.string import StringUtils
@@ -13,7 +11,10 @@ from app.utils.string import StringUtils
 class MTorrentSiteUserInfo(ISiteUserInfo):
     schema = SiteSchema.MTorrent
     order = SITE_BASE_ORDER + 60
+    match_keywords = ("M-Team",)
     request_mode = "apikey"
+    # 解析做种信息、未读消息时直接请求接口，使用同步刷新
+    async_fetch = False
 
     # 用户级别字典
     MTeam_sysRoleList = {
@@ -39,7 +40,7 @@ class MTorrentSiteUserInfo(ISiteUserInfo):
 
     @classmethod
     def match(cls, html_text: str) -> bool:
-        html = etree.HTML(html_text)
+        html = cls._parse_html(html_text)
         if not html:
             return False
         if html.xpath("//title/text()") and "M-Team" in html.xpath("//title/text()")[0]:
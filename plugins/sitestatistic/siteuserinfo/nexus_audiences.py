@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 from urllib.parse import urljoin
 
-from app.plugins.sitestatistic.siteuserinfo import SITE_BASE_ORDER, SiteSchema
+from app.plugins.sitestatistic.siteuserinfo import PageSteps, SITE_BASE_ORDER, SiteSchema
 from app.plugins.sitestatistic.siteuserinfo.nexus_php import NexusPhpSiteUserInfo
 
 
@@ -17,6 +17,6 @@ class NexusAudiencesSiteUserInfo(NexusPhpSiteUserInfo):
         super()._parse_site_page(html_text)
         self._torrent_seeding_page = f"usertorrentlist.php?userid={self.userid}&type=seeding"
 
-    def _parse_seeding_pages(self):
+    def _parse_seeding_pages(self) -> PageSteps:
         self._torrent_seeding_headers = {"Referer": urljoin(self._base_url, self._user_detail_page)}
-        super()._parse_seeding_pages()
+        yield from super()._parse_seeding_pages()
@@ -1,8 +1,7 @@
 # -*- coding: utf-8 -*-
 import re
-from typing import Optional
-
-from lxml import etree
+from typing import Optional, List
+from urllib.parse import urlsplit
 
 from app.log import logger
 from app.plugins.sitestatistic.siteuserinfo import ISiteUserInfo, SITE_BASE_ORDER, SiteSchema
@@ -43,7 +42,7 @@ class NexusPhpSiteUserInfo(ISiteUserInfo):
         :param html_text:
         :return:
         """
-        html = etree.HTML(html_text)
+        html = self._parse_html(html_text)
         if not html:
             return
 
@@ -70,7 +69,7 @@ class NexusPhpSiteUserInfo(ISiteUserInfo):
 
         self._parse_message_unread(html_text)
 
-        html = etree.HTML(html_text)
+        html = self._parse_html(html_text)
         if not html:
             return
 
@@ -107,7 +106,7 @@ class NexusPhpSiteUserInfo(ISiteUserInfo):
         leeching_match = re.search(r"(Torrents leeching|下载中)[\u4E00-\u9FA5\D\s]+(\d+)[\s\S]+<", html_text)
         self.leeching = StringUtils.str_int(leeching_match.group(2)) if leeching_match and leeching_match.group(
             2).strip() else 0
-        html = etree.HTML(html_text)
+        html = self._parse_html(html_text)
         has_ucoin, self.bonus = self._parse_ucoin(html)
         if has_ucoin:
             return
@@ -164,7 +163,7 @@ class NexusPhpSiteUserInfo(ISiteUserInfo):
         :param multi_page: 是否多页数据
         :return: 下页地址
         """
-        html = etree.HTML(str(html_text).replace(r'\/', '/'))
+        html = self._parse_html(str(html_text).replace(r'\/', '/'))
         if not html:
             return None
 
@@ -226,13 +225,35 @@ class NexusPhpSiteUserInfo(ISiteUserInfo):
 
         return next_page
 
+    def _get_seeding_page_urls(self, html_text: str, current_page: str, next_page: str) -> Optional[List[str]]:
+        """
+        根据分页栏中的最大页码生成下页至该页的分页地址
+        """
+        next_page_match = re.search(r"[?&]page=(\d+)", next_page)
+        if not next_page_match:
+            return None
+        html = self._parse_html(str(html_text).replace(r'\/', '/'))
+        if not html:
+            return None
+        next_page_path = urlsplit(next_page).path
+        page_numbers = [int(page_number)
+                        for href in html.xpath('//a[contains(@href, "page=")]/@href')
+                        if urlsplit(href).path == next_page_path
+                        for page_number in re.findall(r"[?&]page=(\d+)", href)]
+        next_page_number = int(next_page_match.group(1))
+        last_page_number = max(page_numbers, default=next_page_number)
+        if last_page_number <= next_page_number:
+            return None
+        return [re.sub(r"([?&])page=\d+", rf"\g<1>page={page_number}", next_page, count=1)
+                for page_number in range(next_page_number, last_page_number + 1)]
+
     def _parse_user_detail_info(self, html_text: str):
         """
         解析用户额外信息，加入时间，等级
         :param html_text:
         :return:
         """
-        html = etree.HTML(html_text)
+        html = self._parse_html(html_text)
         if not html:
             return
 
@@ -355,7 +376,7 @@ class NexusPhpSiteUserInfo(ISiteUserInfo):
                     break
 
     def _parse_message_unread_links(self, html_text: str, msg_links: list) -> Optional[str]:
-        html = etree.HTML(html_text)
+        html = self._parse_html(html_text)
         if not html:
             return None
 
@@ -370,7 +391,7 @@ class NexusPhpSiteUserInfo(ISiteUserInfo):
         return next_page
 
     def _parse_message_content(self, html_text):
-        html = etree.HTML(html_text)
+        html = self._parse_html(html_text)
         if not html:
             return None, None, None
         # 标题
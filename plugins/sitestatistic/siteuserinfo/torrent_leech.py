@@ -2,8 +2,6 @@
 import re
 from typing import Optional
 
-from lxml import etree
-
 from app.plugins.sitestatistic.siteuserinfo import ISiteUserInfo, SITE_BASE_ORDER, SiteSchema
 from app.utils.string import StringUtils
 
@@ -36,7 +34,7 @@ class TorrentLeechSiteUserInfo(ISiteUserInfo):
         :return:
         """
         html_text = self._prepare_html_text(html_text)
-        html = etree.HTML(html_text)
+        html = self._parse_html(html_text)
         upload_html = html.xpath('//div[contains(@class,"profile-uploaded")]//span/text()')
         if upload_html:
             self.upload = StringUtils.num_filesize(upload_html[0])
@@ -71,7 +69,7 @@ class TorrentLeechSiteUserInfo(ISiteUserInfo):
         :param multi_page: 是否多页数据
         :return: 下页地址
         """
-        html = etree.HTML(html_text)
+        html = self._parse_html(html_text)
         if not html:
             return None
 
@@ -25,7 +25,9 @@ from app.db.transferhistory_oper import TransferHistoryOper
 from app.log import logger
 from app.modules.qbittorrent import Qbittorrent
 from app.plugins import _PluginBase
+from app.plugins.vcbanimemonitor.releasecache import ReleaseCache
 from app.plugins.vcbanimemonitor.remeta import ReMeta
+from app.plugins.vcbanimemonitor.syncmanifest import SyncManifest
 from app.schemas import Notification, NotificationType, TransferInfo
 from app.schemas.types import EventType, MediaType, SystemConfigKey
 from app.utils.string import StringUtils
@@ -76,7 +78,7 @@ class VCBAnimeMonitor(_PluginBase):
     # 插件图标
     plugin_icon = "vcbmonitor.png"
     # 插件版本
-    plugin_version = "1.8.2.2"
+    plugin_version = "1.8.7"
     # 插件作者
     plugin_author = "pixel@qingwa"
     # 作者主页
@@ -118,6 +120,14 @@ class VCBAnimeMonitor(_PluginBase):
     # 存储源目录转移方式
     _transferconf: Dict[str, Optional[str]] = {}
     _medias = {}
+    # 按目录批量整理
+    _batch = False
+    # 增量全量同步，跳过已处理且未变化的文件
+    _resume = True
+    _clear_manifest = False
+    # 发布级识别结果缓存
+    _release_cache_ttl = 3600
+    _release_cache = ReleaseCache(ttl=_release_cache_ttl)
     # 退出事件
     _event = threading.Event()
 
@@ -146,6 +156,18 @@ class VCBAnimeMonitor(_PluginBase):
             self._scrape = config.get("scrape")
             self._switch_ova = config.get("ova")
             self._torrents_path = config.get("torrents_path") or ""
+            self._batch = config.get("batch")
+            self._resume = config.get("resume", True)
+            self._clear_manifest = config.get("clear_manifest")
+
+        # 旧版本的同步清单数据库
+        (self.get_data_path() / "sync.db").unlink(missing_ok=True)
+        # 清除全量同步清单
+        if self._clear_manifest:
+            SyncManifest(self).clear()
+            logger.info("全量同步清单已清除")
+            self._clear_manifest = False
+            self.__update_config()
 
         # 停止现有任务
         self.stop_service()
@@ -293,7 +315,10 @@ class VCBAnimeMonitor(_PluginBase):
             "size": self._size,
             "scrape": self._scrape,
             "ova": self._switch_ova,
-            "torrents_path": self._torrents_path
+            "torrents_path": self._torrents_path,
+            "batch": self._batch,
+            "resume": self._resume,
+            "clear_manifest": self._clear_manifest
         })
 
     def __save_data(self, key: str, value: Any):
@@ -307,17 +332,101 @@ class VCBAnimeMonitor(_PluginBase):
         立即运行一次，全量同步目录中所有文件
         """
         logger.info("开始全量同步监控目录 ...")
-        # 清空历史的ova记录
-        self.plugindata.truncate()
+        manifest = SyncManifest(self)
+        if self._resume:
+            # 增量同步，保留ova记录，跳过已处理且未变化的文件
+            manifest.load()
+        else:
+            # 清空历史的ova记录
+            self.plugindata.truncate()
+            manifest.clear()
 
         # 遍历所有监控目录
         for mon_path in self._dirconf.keys():
             # 遍历目录下所有文件
-            for file_path in SystemUtils.list_files(Path(mon_path), settings.RMT_MEDIAEXT):
-                self.__handle_file(event_path=str(file_path), mon_path=mon_path)
+            files = SystemUtils.list_files(Path(mon_path), settings.RMT_MEDIAEXT)
+            # 只处理新增或变化的文件
+            changed_files = [file_path for file_path in files if manifest.changed(str(file_path))]
+            logger.info(f"监控目录 {mon_path} 共 {len(files)} 个文件，"
+                        f"需要处理 {len(changed_files)} 个，跳过未变化文件 {len(files) - len(changed_files)} 个")
+            if self._batch:
+                self.__handle_batch(files=changed_files, mon_path=mon_path, manifest=manifest)
+                continue
+            for file_path in changed_files:
+                self.__sync_file(event_path=str(file_path), mon_path=mon_path, manifest=manifest)
 
         logger.info("全量同步监控目录完成！")
 
+    def __sync_file(self, event_path: str, mon_path: str, manifest: SyncManifest):
+        """
+        全量同步一个文件，记录处理结果，同步中断后再次运行时跳过
+        """
+        stat = manifest.changed(event_path)
+        if not stat:
+            return
+        result = self.__handle_file(event_path=event_path, mon_path=mon_path)
+        # 处理失败的文件不记录，下次同步时重新处理
+        if result and result != "fail":
+            manifest.record(path=event_path, size=stat[0], mtime=stat[1], result=result)
+
+    def __handle_batch(self, files: List[Path], mon_path: str, manifest: SyncManifest):
+        """
+        按目录批量整理，先解析目录下所有文件，再按季度、集数顺序整理
+        """
+        folders: Dict[Path, List[Path]] = {}
+        for file_path in files:
+            folders.setdefault(file_path.parent, []).append(file_path)
+        for folder, folder_files in folders.items():
+            parsed = []
+            for file_path in folder_files:
+                season, episode = None, None
+                if 'VCB-Studio' in file_path.stem:
+                    try:
+                        file_meta = ReMeta(ova_switch=self._switch_ova,
+                                           release_cache=self._release_cache).handel_file(file_path=file_path)
+                        season, episode = file_meta.begin_season, file_meta.begin_episode
+                    except Exception as e:
+                        logger.debug(f"{file_path.name} 解析失败：{str(e)}")
+                parsed.append((season if season is not None else 999,
+                               episode if episode is not None else 9999,
+                               str(file_path)))
+            parsed.sort()
+            seasons = sorted({season for season, _, _ in parsed if season != 999})
+            logger.info(f"批量整理目录 {folder}：共 {len(parsed)} 个文件，季度：{seasons or '未识别'}")
+            for _, _, event_path in parsed:
+                self.__sync_file(event_path=event_path, mon_path=mon_path, manifest=manifest)
+
+    def __recognize_release(self, file_path: Path, file_meta, download_history) -> Optional[MediaInfo]:
+        """
+        识别媒体信息并获取图片，同一发布的文件共用识别结果
+        """
+
+        def __recognize() -> Optional[MediaInfo]:
+            if download_history and download_history.tmdbid:
+                mediainfo = self.mediaChain.recognize_media(mtype=MediaType(download_history.type),
+                                                            tmdbid=download_history.tmdbid,
+                                                            doubanid=download_history.doubanid)
+            else:
+                mediainfo = self.mediaChain.recognize_by_meta(file_meta)
+            if not mediainfo:
+                return None
+            # 如果未开启新增已入库媒体是否跟随TMDB信息变化则根据tmdbid查询之前的title
+            if not settings.SCRAP_FOLLOW_TMDB:
+                transfer_history = self.transferhis.get_by_type_tmdbid(tmdbid=mediainfo.tmdb_id,
+                                                                       mtype=mediainfo.type.value)
+                if transfer_history:
+                    mediainfo.title = transfer_history.title
+            # 更新媒体图片
+            self.chain.obtain_images(mediainfo=mediainfo)
+            return mediainfo
+
+        if download_history and download_history.tmdbid:
+            key = ("tmdb", download_history.type, download_history.tmdbid, download_history.doubanid)
+        else:
+            key = ("meta", str(file_path.parent), file_meta.name, file_meta.year, file_meta.type,
+                   file_meta.begin_season, file_meta.tmdbid)
+        return self._release_cache.get(key, __recognize)
+
     def event_handler(self, event, mon_path: str, text: str, event_path: str):
         """
         处理文件变化
@@ -331,11 +440,12 @@ class VCBAnimeMonitor(_PluginBase):
             logger.debug("文件%s：%s" % (text, event_path))
             self.__handle_file(event_path=event_path, mon_path=mon_path)
 
-    def __handle_file(self, event_path: str, mon_path: str):
+    def __handle_file(self, event_path: str, mon_path: str) -> Optional[str]:
         """
         同步一个文件
         :param event_path: 事件文件路径
         :param mon_path: 监控目录
+        :return: 处理结果 success/fail/processed/ignored，未处理或出错时返回None
         """
         file_path = Path(event_path)
         try:
@@ -346,7 +456,7 @@ class VCBAnimeMonitor(_PluginBase):
                 transfer_history = self.transferhis.get_by_src(event_path)
                 if transfer_history:
                     logger.debug("文件已处理过：%s" % event_path)
-                    return
+                    return "processed"
 
                 # 回收站及隐藏的文件不处理
                 if event_path.find('/@Recycle/') != -1 \
@@ -390,18 +500,18 @@ class VCBAnimeMonitor(_PluginBase):
                 # 查询历史记录，已转移的不处理
                 if self.transferhis.get_by_src(str(file_path)):
                     logger.info(f"{file_path} 已整理过")
-                    return
+                    return "processed"
 
                 # 元数据
                 if file_path.parent.name.lower() in ["sps", "scans", "cds", "previews", "extras"]:
                     logger.warn("位于特典或其他特殊目录下，跳过处理")
-                    return
+                    return "ignored"
 
                 if 'VCB-Studio' not in file_path.stem.strip():
                     logger.warn("不属于VCB的作品，不处理！")
-                    return
+                    return "ignored"
 
-                remeta = ReMeta(ova_switch=self._switch_ova)
+                remeta = ReMeta(ova_switch=self._switch_ova, release_cache=self._release_cache)
                 file_meta = remeta.handel_file(file_path=file_path)
                 if file_meta:
                     if not file_meta.name:
@@ -454,12 +564,8 @@ class VCBAnimeMonitor(_PluginBase):
                         download_history = self.downloadhis.get_by_hash(download_file.download_hash)
 
                 # 识别媒体信息
-                if download_history and download_history.tmdbid:
-                    mediainfo: MediaInfo = self.mediaChain.recognize_media(mtype=MediaType(download_history.type),
-                                                                           tmdbid=download_history.tmdbid,
-                                                                           doubanid=download_history.doubanid)
-                else:
-                    mediainfo: MediaInfo = self.mediaChain.recognize_by_meta(file_meta)
+                mediainfo: MediaInfo = self.__recognize_release(file_path=file_path, file_meta=file_meta,
+                                                                download_history=download_history)
 
                 if not mediainfo:
                     logger.warn(f'未识别到媒体信息，标题：{file_meta.name}')
@@ -476,23 +582,16 @@ class VCBAnimeMonitor(_PluginBase):
                             title=f"{file_path.name} 未识别到媒体信息，无法入库！\n"
                                   f"回复：```\n/redo {his.id} [tmdbid]|[类型]\n``` 手动识别转移。"
                         ))
-                    return
+                    return "fail"
 
-                # 如果未开启新增已入库媒体是否跟随TMDB信息变化则根据tmdbid查询之前的title
-                if not settings.SCRAP_FOLLOW_TMDB:
-                    transfer_history = self.transferhis.get_by_type_tmdbid(tmdbid=mediainfo.tmdb_id,
-                                                                           mtype=mediainfo.type.value)
-                    if transfer_history:
-                        mediainfo.title = transfer_history.title
                 logger.info(f"{file_path.name} 识别为：{mediainfo.type.value} {mediainfo.title_year}")
 
-                # 更新媒体图片
-                self.chain.obtain_images(mediainfo=mediainfo)
-
                 # 获取集数据
                 if mediainfo.type == MediaType.TV:
-                    episodes_info = self.tmdbchain.tmdb_episodes(tmdbid=mediainfo.tmdb_id,
-                                                                 season=file_meta.begin_season or 1)
+                    episodes_info = self._release_cache.get(
+                        ("episodes", mediainfo.tmdb_id, file_meta.begin_season or 1),
+                        lambda: self.tmdbchain.tmdb_episodes(tmdbid=mediainfo.tmdb_id,
+                                                             season=file_meta.begin_season or 1))
                 else:
                     episodes_info = None
 
@@ -532,7 +631,7 @@ class VCBAnimeMonitor(_PluginBase):
                             text=f"原因：{transferinfo.message or '未知'}",
                             image=mediainfo.get_message_image()
                         ))
-                    return
+                    return "fail"
 
                 # 新增转移成功历史记录
                 self.transferhis.add_success(
@@ -626,9 +725,11 @@ class VCBAnimeMonitor(_PluginBase):
                         if not files:
                             logger.warn(f"移动模式，删除空目录：{file_dir}")
                             shutil.rmtree(file_dir, ignore_errors=True)
+                return "success"
 
         except Exception as e:
             logger.error("目录监控发生错误：%s - %s" % (str(e), traceback.format_exc()))
+        return None
 
     def torrent_event(self, event, mon_path: str, text: str):
         """
@@ -862,6 +963,54 @@ class VCBAnimeMonitor(_PluginBase):
                                         }
                                     }
                                 ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 4
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VSwitch',
+                                        'props': {
+                                            'model': 'batch',
+                                            'label': '按目录批量整理',
+                                        }
+                                    }
+                                ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 4
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VSwitch',
+                                        'props': {
+                                            'model': 'resume',
+                                            'label': '全量同步跳过已处理文件',
+                                        }
+                                    }
+                                ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 4
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VSwitch',
+                                        'props': {
+                                            'model': 'clear_manifest',
+                                            'label': '清除全量同步清单',
+                                        }
+                                    }
+                                ]
                             }
                         ]
                     },
@@ -1098,6 +1247,9 @@ class VCBAnimeMonitor(_PluginBase):
             "size": 0,
             "ova": False,
             "torrents_path": "",
+            "batch": False,
+            "resume": True,
+            "clear_manifest": False,
         }
 
     def get_page(self) -> List[dict]:
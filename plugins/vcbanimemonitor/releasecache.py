@@ -0,0 +1,40 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class ReleaseCache:
+    """
+    发布级识别结果缓存，同一发布（目录+剧集标题）的所有文件共用一次TMDB查询结果，过期后重新查询
+    """
+
+    def __init__(self, ttl: int = 3600):
+        """
+        :param ttl: 缓存有效期（秒）
+        """
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        # 键 -> (过期时间, 值)
+        self._items: Dict[Hashable, Tuple[float, Any]] = {}
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        获取缓存，不存在或已过期时调用loader查询并缓存结果，空结果不缓存，下次重新查询
+        """
+        now = time.time()
+        with self._lock:
+            item = self._items.get(key)
+            if item and item[0] > now:
+                return item[1]
+        value = loader()
+        with self._lock:
+            # 清理过期的缓存
+            for expired_key in [k for k, (expire, _) in self._items.items() if expire <= now]:
+                del self._items[expired_key]
+            if value:
+                self._items[key] = (now + self._ttl, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
@@ -2,11 +2,12 @@ import concurrent
 import re
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Tuple
 from app.chain.media import MediaChain
 from app.chain.tmdb import TmdbChain
 from app.core.metainfo import MetaInfoPath
 from app.log import logger
+from app.plugins.vcbanimemonitor.releasecache import ReleaseCache
 from app.schemas import MediaType
 
 season_patterns = [
@@ -67,8 +68,12 @@ blocked_words = ["vcb-studio", "360p", "480p", "720p", "1080p", "2160p", "hdr",
 
 class ReMeta:
 
-    def __init__(self, ova_switch: bool = False, custom_season_patterns: list[dict] = None):
+    def __init__(self, ova_switch: bool = False, custom_season_patterns: list[dict] = None,
+                 release_cache: ReleaseCache = None):
         self.meta = None
+        # 发布级缓存，同一目录下同一剧集的文件共用最终季查询结果
+        self.release_cache = release_cache
+        self.folder = ""
         # TODO:自定义季度匹配规则
         self.custom_season_patterns = custom_season_patterns
         self.season_patterns = season_patterns
@@ -88,6 +93,7 @@ class ReMeta:
 
     def handel_file(self, file_path: Path):
         file_name = file_path.stem.strip().lower()
+        self.folder = str(file_path.parent)
         self.vcb_meta.original_title = file_name
         if not self.is_tv(file_name):
             logger.warn(
@@ -206,36 +212,48 @@ class ReMeta:
         self.vcb_meta.ep_title = result
 
     def handle_final_season(self):
+        if self.release_cache:
+            def __search():
+                result = self.search_final_season(self.vcb_meta.title)
+                # 未找到对应媒体时返回空结果，不缓存
+                return result if result[0] else None
+
+            tmdb_id, season = self.release_cache.get(("final_season", self.folder, self.vcb_meta.title),
+                                                     __search) or (None, 1)
+        else:
+            tmdb_id, season = self.search_final_season(self.vcb_meta.title)
+        if tmdb_id:
+            self.vcb_meta.tmdb_id = tmdb_id
+        self.vcb_meta.season = season
 
-        _, medias = MediaChain().search(title=self.vcb_meta.title)
+    @staticmethod
+    def search_final_season(title: str) -> Tuple[Optional[int], int]:
+        """
+        查询最终季对应的媒体及季度
+        :return: TMDB ID，季度
+        """
+        _, medias = MediaChain().search(title=title)
         if not medias:
             logger.warning("匹配到最终季时无法找到对应的媒体信息！季度返回默认值：1")
-            self.vcb_meta.season = 1
-            return
+            return None, 1
 
         filter_medias = [media for media in medias if media.type == MediaType.TV]
         if not filter_medias:
             logger.warning("匹配到最终季时无法找到对应的媒体信息！季度返回默认值：1")
-            self.vcb_meta.season = 1
-            return
+            return None, 1
         medias = [media for media in filter_medias if media.popularity or media.vote_average]
         if not medias:
             logger.warning("匹配到最终季时无法找到对应的媒体信息！季度返回默认值：1")
-            self.vcb_meta.season = 1
-            return
+            return None, 1
         # 获取欢迎度最高或者评分最高的媒体
         medias_sorted = sorted(medias, key=lambda x: x.popularity or x.vote_average, reverse=True)[0]
-        self.vcb_meta.tmdb_id = medias_sorted.tmdb_id
         if medias_sorted.tmdb_id:
             seasons_info = TmdbChain().tmdb_seasons(tmdbid=medias_sorted.tmdb_id)
             if seasons_info:
-                self.vcb_meta.season = len(seasons_info)
-                logger.info(f"获取到最终季度，季度为{self.vcb_meta.season}")
-                return
+                logger.info(f"获取到最终季度，季度为{len(seasons_info)}")
+                return medias_sorted.tmdb_id, len(seasons_info)
         logger.warning("无法获取到最终季度信息，季度返回默认值：1")
-        self.vcb_meta.season = 1
-
-
+        return medias_sorted.tmdb_id, 1
 
     def parse_movie(self):
         logger.info("开始尝试剧场版模式解析")
@@ -0,0 +1,81 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from app.plugins import _PluginBase
+
+
+class SyncManifest:
+    """
+    全量同步清单，按目录保存在插件数据中，记录已处理文件的大小、修改时间及处理结果
+    每处理一个文件立即记录，同步中断后再次运行时跳过已处理且未变化的文件
+    """
+
+    # 插件数据键前缀，存储方式见README常见问题11
+    _prefix = "sync:"
+
+    def __init__(self, plugin: _PluginBase):
+        self._plugin = plugin
+        self._lock = threading.Lock()
+        # 文件 -> (大小, 修改时间)
+        self._entries: Dict[str, Tuple[int, float]] = {}
+
+    def __items(self):
+        for data in self._plugin.get_data(key=None) or []:
+            if not data.key.startswith(self._prefix):
+                continue
+            try:
+                value = json.loads(data.value) if isinstance(data.value, str) else data.value
+            except ValueError:
+                continue
+            if isinstance(value, dict):
+                yield data.key, value
+
+    def load(self):
+        """
+        加载清单，处理失败的文件不计入，下次同步时重新处理
+        """
+        entries = {}
+        for key, value in self.__items():
+            directory = key[len(self._prefix):]
+            for name, (size, mtime, result, _) in value.items():
+                if result != "fail":
+                    entries[os.path.join(directory, name)] = (size, mtime)
+        self._entries = entries
+
+    def changed(self, path: str) -> Optional[Tuple[int, float]]:
+        """
+        文件是否为新增或已变化
+        :return: 需要处理时返回文件的(大小, 修改时间)，已处理且未变化或文件不存在时返回None
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        current = (stat.st_size, stat.st_mtime)
+        if self._entries.get(path) == current:
+            return None
+        return current
+
+    def record(self, path: str, size: int, mtime: float, result: str):
+        """
+        记录文件处理结果
+        """
+        directory, name = os.path.split(path)
+        key = f"{self._prefix}{directory}"
+        with self._lock:
+            value = self._plugin.get_data(key) or {}
+            value[name] = [size, mtime, result, time.time()]
+            self._plugin.save_data(key, value)
+            self._entries[path] = (size, mtime)
+
+    def clear(self):
+        """
+        清空清单
+        """
+        with self._lock:
+            for key, _ in list(self.__items()):
+                self._plugin.del_data(key=key)
+            self._entries = {}